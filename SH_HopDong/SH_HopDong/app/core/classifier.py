@@ -0,0 +1,177 @@
+"""Contract type classification driven by the contract_types table.
+
+Every ContractType contributes weighted phrases: the parts of its name
+(NAME_WEIGHT; "Bảo mật (NDA)" gives "bảo mật" and "NDA"), each line of its
+keywords column (KEYWORD_WEIGHT, or "phrase: weight") and the comma-separated
+parts of its description (DESCRIPTION_WEIGHT), without a leading "Hợp đồng" or
+"Thỏa thuận". A phrase shared by several types counts for each of them divided
+by the number of types sharing it, so generic words ("dịch vụ") weigh little.
+
+All phrases are compiled into one word-level Aho-Corasick automaton
+(app.core.matching) that scans the head of the document (HEAD_LINES lines, as
+parser._detect_type) once, however many types exist. Where matches overlap
+only the longest counts: "Hợp đồng mua bán bất động sản" scores the phrase
+"mua bán bất động sản", not "mua bán" as well. Each phrase counts once in the
+title line, TITLE_BONUS times, and once in the rest of the head. The best type
+wins if its score reaches MIN_SCORE.
+
+The classifier is cached per process and rebuilt when the table changes:
+invalidate() after an edit through /types, and in any process (ingest workers)
+after a check of count / max id / max updated_at, at most every SYNC_SECONDS.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.matching import Automaton, normalize
+from app.db import models
+
+TYPE_SOURCE_AUTO = "auto"  # Contract.contract_type_source when the classifier chose the type
+
+HEAD_LINES = 60
+NAME_WEIGHT = 3.0
+KEYWORD_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+TITLE_BONUS = 3.0
+MIN_SCORE = 2.0
+SYNC_SECONDS = 2.0
+
+_MIN_PHRASE_CHARS = 3
+_NAME_PARTS = re.compile(r"[()/,;]")
+_GENERIC_PREFIXES = (["hop", "dong"], ["thoa", "thuan"])
+
+
+@dataclass
+class TypeMatch:
+    type_id: int
+    name: str
+    description: Optional[str]
+    score: float
+
+
+def head_text(text: str) -> str:
+    """The part of a document the classifier reads."""
+    return "\n".join(text.splitlines()[:HEAD_LINES])
+
+
+def _phrase(text: str) -> List[str]:
+    words = normalize(text)
+    for prefix in _GENERIC_PREFIXES:
+        if words[:len(prefix)] == prefix and len(words) > len(prefix):
+            words = words[len(prefix):]
+    return words if sum(len(word) for word in words) >= _MIN_PHRASE_CHARS else []
+
+
+def type_phrases(name: str, description: Optional[str], keywords: Optional[str]) -> List[Tuple[List[str], float]]:
+    """(phrase words, weight) of one type; a phrase appears once, with its highest weight."""
+    weights: Dict[Tuple[str, ...], float] = {}
+
+    def add(text: str, weight: float) -> None:
+        words = tuple(_phrase(text))
+        if words and weight > weights.get(words, 0.0):
+            weights[words] = weight
+
+    for part in _NAME_PARTS.split(name or ""):
+        add(part, NAME_WEIGHT)
+    for part in (description or "").split(","):
+        add(part, DESCRIPTION_WEIGHT)
+    for line in (keywords or "").splitlines():
+        phrase, sep, weight = line.rpartition(":")
+        try:
+            add(phrase, float(weight)) if sep else add(line, KEYWORD_WEIGHT)
+        except ValueError:
+            add(line, KEYWORD_WEIGHT)
+    return [(list(words), weight) for words, weight in weights.items()]
+
+
+class TypeClassifier:
+    """Scores the configured types against the head of a document (see the module docstring)."""
+
+    def __init__(self, types: List[Tuple[int, str, Optional[str], Optional[str]]]):
+        """types: (id, name, description, keywords) rows."""
+        self.types = {type_id: (name, description) for type_id, name, description, _ in types}
+        targets: Dict[Tuple[str, ...], List[Tuple[int, float]]] = {}
+        for type_id, name, description, keywords in types:
+            for words, weight in type_phrases(name, description, keywords):
+                targets.setdefault(tuple(words), []).append((type_id, weight))
+        # phrase index -> ((type id, weight / number of types sharing the phrase), ...)
+        self.targets = [tuple((type_id, weight / len(items)) for type_id, weight in items) for items in targets.values()]
+        self.automaton = Automaton(
+            (list(words), (index, len(words))) for index, words in enumerate(targets)
+        )
+
+    def classify(self, head: str, title: Optional[str] = None) -> Optional[TypeMatch]:
+        words: List[str] = []
+        title_span = (0, 0)
+        title = (title or "").strip()
+        for line in head.splitlines():
+            line_words = normalize(line)
+            if title and title_span == (0, 0) and line.strip() == title:
+                title_span = (len(words), len(words) + len(line_words))
+            words += line_words
+
+        # Longest match first at each start; a match inside the last kept one is dropped
+        matches = sorted(((end - size, end, index) for end, (index, size) in self.automaton.search(words)),
+                         key=lambda m: (m[0], -m[1]))
+        scores: Dict[int, float] = {}
+        counted = set()
+        covered = 0
+        for start, end, index in matches:
+            if end <= covered:
+                continue
+            covered = end
+            in_title = title_span[0] <= start and end <= title_span[1]
+            if (index, in_title) in counted:
+                continue
+            counted.add((index, in_title))
+            for type_id, weight in self.targets[index]:
+                scores[type_id] = scores.get(type_id, 0.0) + weight * (TITLE_BONUS if in_title else 1.0)
+        if not scores:
+            return None
+        # Ties go to the lower id, so the result does not depend on dict order
+        type_id, score = max(scores.items(), key=lambda item: (item[1], -item[0]))
+        if score < MIN_SCORE:
+            return None
+        name, description = self.types[type_id]
+        return TypeMatch(type_id, name, description, score)
+
+
+_classifier: Optional[TypeClassifier] = None
+_signature: Optional[tuple] = None
+_checked = 0.0
+_lock = threading.Lock()
+
+
+def invalidate() -> None:
+    """Make the next get_classifier in this process re-read the table (after /types changes it)."""
+    global _classifier, _signature
+    with _lock:
+        _classifier = _signature = None
+
+
+def get_classifier(db: Session) -> TypeClassifier:
+    """The process-wide classifier, rebuilt when contract_types has changed."""
+    global _classifier, _signature, _checked
+    if _classifier is not None and time.monotonic() - _checked < SYNC_SECONDS:
+        return _classifier
+    with _lock:
+        contract_type = models.ContractType
+        signature = tuple(db.query(
+            func.count(contract_type.id), func.max(contract_type.id), func.max(contract_type.updated_at)
+        ).one())
+        if _classifier is None or signature != _signature:
+            rows = db.query(contract_type.id, contract_type.name, contract_type.description, contract_type.keywords).all()
+            _classifier = TypeClassifier([tuple(row) for row in rows])
+            _signature = signature
+        _checked = time.monotonic()
+        return _classifier
+
+
+def classify_contract(db: Session, head: str, title: Optional[str] = None) -> Optional[TypeMatch]:
+    """Best configured type for the head of a contract, or None."""
+    return get_classifier(db).classify(head, title)
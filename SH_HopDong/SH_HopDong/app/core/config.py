@@ -12,7 +12,54 @@ class Settings:
     # OCR Settings
     tesseract_path: str = os.getenv("TESSERACT_PATH", r"C:\\Program Files\\Tesseract-OCR\\tesseract.exe")
     default_lang: str = os.getenv("TESS_LANG", "vie+eng")
-    
+    ocr_backend: str = os.getenv("OCR_BACKEND", "auto")  # auto, tesserocr (C API, giữ model trong bộ nhớ), pytesseract
+    tessdata_path: str = os.getenv("TESSDATA_PREFIX", "")  # thư mục tessdata cho tesserocr (để trống = mặc định)
+    ocr_workers: int = int(os.getenv("OCR_WORKERS", "1"))  # >1 = OCR các trang song song bằng process pool
+    ocr_cache_max_mb: int = int(os.getenv("OCR_CACHE_MAX_MB", "512"))  # 0 = tắt cache kết quả OCR
+    ocr_checkpoint_dir: str = os.getenv("OCR_CHECKPOINT_DIR", "")  # để trống = <project>/checkpoints
+    # DPI thích ứng: render ở ocr_low_dpi, chỉ render lại ở ocr_high_dpi khi độ tin cậy < ngưỡng
+    ocr_confidence_check: bool = os.getenv("OCR_CONFIDENCE_CHECK", "1") == "1"
+    ocr_confidence_threshold: int = int(os.getenv("OCR_CONFIDENCE_THRESHOLD", "70"))
+    ocr_low_dpi: int = int(os.getenv("OCR_LOW_DPI", "200"))
+    ocr_high_dpi: int = int(os.getenv("OCR_HIGH_DPI", "300"))
+    # lang="auto": chọn một model (vie hoặc eng) theo text layer các trang lân cận hoặc OCR thử một dải ảnh
+    # ở ocr_probe_dpi; độ tin cậy thấp thì OCR lại bằng model kết hợp ocr_auto_langs
+    ocr_auto_langs: str = os.getenv("OCR_AUTO_LANGS", "vie+eng")
+    ocr_probe_dpi: int = int(os.getenv("OCR_PROBE_DPI", "150"))
+    ocr_lang_hint_pages: int = int(os.getenv("OCR_LANG_HINT_PAGES", "2"))
+    # Tiền xử lý ảnh chụp/scan trước OCR (app.core.preprocess): none, basic (thu nhỏ, cắt lề, chỉnh nghiêng),
+    # advanced (+ nhị phân hóa); OCR_PREPROCESS_STEPS ghi đè danh sách bước, vd "downscale,crop"
+    ocr_preprocess: bool = os.getenv("OCR_PREPROCESS", "1") == "1"
+    ocr_image_processing: str = os.getenv("OCR_IMAGE_PROCESSING", "basic")
+    ocr_preprocess_steps: str = os.getenv("OCR_PREPROCESS_STEPS", "")
+    ocr_target_dpi: int = int(os.getenv("OCR_TARGET_DPI", "300"))
+    # Text layer PDF: điểm < ngưỡng thì OCR lại cả trang; ảnh không có chữ phủ lên (>= tỉ lệ diện tích trang) thì OCR riêng vùng đó
+    text_layer_min_quality: float = float(os.getenv("TEXT_LAYER_MIN_QUALITY", "0.7"))
+    ocr_region_min_area: float = float(os.getenv("OCR_REGION_MIN_AREA", "0.05"))
+    # Giới hạn thời gian: mỗi trang / cả tài liệu (giây, 0 = không giới hạn); quá hạn thì dừng tesseract
+    ocr_page_timeout_seconds: int = int(os.getenv("OCR_PAGE_TIMEOUT_SECONDS", "60"))
+    ocr_timeout_seconds: int = int(os.getenv("OCR_TIMEOUT_SECONDS", "300"))
+
+    # Ảnh thu nhỏ / xem trước từng trang (app.core.renditions); RENDITION_EAGER = loại tạo sẵn khi xử lý
+    # hợp đồng (thumb, preview, "thumb,preview"), để trống = chỉ tạo khi trang được xem lần đầu
+    rendition_dir: str = os.getenv("RENDITION_DIR", "")  # để trống = <project>/renditions
+    rendition_eager: str = os.getenv("RENDITION_EAGER", "thumb")
+
+    # Upload
+    max_upload_mb: int = int(os.getenv("MAX_UPLOAD_MB", "200"))  # giới hạn mỗi lần tải lên; 0 = không giới hạn
+
+    # Ingestion queue
+    ingest_workers: int = int(os.getenv("INGEST_WORKERS", "1"))  # 0 = không chạy worker trong app, dùng python -m app.worker
+    # Xử lý hai giai đoạn: OCR + phân tích ngay N trang đầu khi tải lên (tiêu đề, loại, các bên), phần còn lại chạy nền; 0 = tắt
+    ingest_preview_pages: int = int(os.getenv("INGEST_PREVIEW_PAGES", "2"))
+    # Giới hạn thời gian (giây) của giai đoạn xem nhanh trong request; trang chưa xong để worker OCR lại
+    ingest_preview_timeout_seconds: int = int(os.getenv("INGEST_PREVIEW_TIMEOUT_SECONDS", "20"))
+    job_max_attempts: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    job_retry_base_seconds: int = int(os.getenv("JOB_RETRY_BASE_SECONDS", "30"))
+    job_retry_max_seconds: int = int(os.getenv("JOB_RETRY_MAX_SECONDS", "3600"))
+    job_lease_seconds: int = int(os.getenv("JOB_LEASE_SECONDS", "120"))
+    job_poll_seconds: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+
     # Database Settings
     database_type: str = os.getenv("DATABASE_TYPE", "sqlserver")  # sqlserver or sqlite
     
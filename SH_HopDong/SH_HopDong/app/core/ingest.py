@@ -0,0 +1,246 @@
+import os
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from docx import Document
+from sqlalchemy.orm import Session
+
+from app.core.classifier import TYPE_SOURCE_AUTO, classify_contract, head_text
+from app.core.config import settings
+from app.core.metrics import IngestStats
+from app.core.ocr import (
+    PageResult,
+    clear_checkpoints,
+    extract_page_from_image,
+    extract_pages_from_pdf,
+    extract_pages_from_tiff,
+    join_pages,
+)
+from app.core.ocr_cache import get_cached_result, is_cached, store_result
+from app.core.parser import PARSER_VERSION, parse_contract_text, segment_clauses
+from app.core.partners import link_contract
+from app.core.renditions import eager_kinds, render_renditions
+from app.core.timing import StageTimer
+from app.db import crud, models
+
+PDF_EXTENSIONS = [".pdf"]
+TIFF_EXTENSIONS = [".tif", ".tiff"]
+IMAGE_EXTENSIONS = [".png", ".jpg", ".jpeg", ".bmp"] + TIFF_EXTENSIONS
+ALLOWED_EXTENSIONS = PDF_EXTENSIONS + IMAGE_EXTENSIONS
+
+# Contract.ingest_phase
+PHASE_PREVIEW = "preview"  # chỉ các trang đầu đã được OCR và phân tích, phần còn lại đang chạy nền
+PHASE_COMPLETE = "complete"
+
+
+def extract_pages(
+    path: str,
+    lang: Optional[str] = None,
+    doc_hash: Optional[str] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    max_pages: Optional[int] = None,
+    timeout: Optional[float] = None,
+) -> List[PageResult]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        return extract_pages_from_pdf(path, lang=lang, doc_hash=doc_hash, timeout=timeout, should_stop=should_stop,
+                                      max_pages=max_pages)
+    if ext in TIFF_EXTENSIONS:
+        # Máy scan xuất TIFF nhiều trang: mỗi frame là một trang
+        return extract_pages_from_tiff(path, lang=lang, doc_hash=doc_hash, timeout=timeout, should_stop=should_stop,
+                                       max_pages=max_pages)
+    if ext in IMAGE_EXTENSIONS:
+        return [extract_page_from_image(path, lang=lang, timeout=timeout)]
+    return []
+
+
+def page_summary(pages: List[PageResult]) -> List[dict]:
+    """Per-page OCR metadata (source, DPI, confidence) without the text and timings."""
+    return [{k: v for k, v in p.to_dict().items() if k not in ("text", "timings")} for p in pages]
+
+
+def _parse(db: Session, contract: models.Contract, text: str, stats: StageTimer) -> dict:
+    try:
+        with stats.stage("parse"):
+            parsed = parse_contract_text(text)
+            clauses = segment_clauses(text)
+    except Exception as e:
+        print(f"Parse Error for {contract.original_filename}: {str(e)}")
+        parsed = {"title": contract.original_filename, "content": text}
+        clauses = []
+    apply_contract_type(db, contract, parsed, head_text(text))
+    with stats.stage("parse"):
+        link_contract(db, contract, parsed.get("parties"))
+        apply_clauses(contract, clauses)
+    return parsed
+
+
+def apply_contract_type(db: Session, contract: models.Contract, parsed: dict, head: Optional[str] = None) -> None:
+    """A type chosen at upload overrides the detected one; without one, the types
+    configured in contract_types are matched against the head of the text.
+
+    The classifier's choice is stored in contract_type_id too, marked with
+    contract_type_source = "auto" so a later parse may revise it. When no
+    configured type matches, the parser's own type stays in parsed_json.
+    """
+    if contract.contract_type_id and contract.contract_type_source != TYPE_SOURCE_AUTO:
+        try:
+            contract_type_obj = crud.get_contract_type(db, contract.contract_type_id)
+            if contract_type_obj:
+                parsed["type"] = str(contract.contract_type_id)
+                parsed["type_label"] = contract_type_obj.name
+                parsed["type_description"] = contract_type_obj.description
+        except Exception as e:
+            print(f"Error getting contract type {contract.contract_type_id}: {str(e)}")
+            parsed["type"] = str(contract.contract_type_id)
+            parsed["type_label"] = f"Contract Type {contract.contract_type_id}"
+        return
+    if head is None:
+        return
+    try:
+        match = classify_contract(db, head, parsed.get("title"))
+    except Exception as e:
+        print(f"Classifier Error for {contract.original_filename}: {str(e)}")
+        return
+    if match is None:
+        if contract.contract_type_source == TYPE_SOURCE_AUTO:
+            contract.contract_type_id = None
+            contract.contract_type_source = None
+        return
+    contract.contract_type_id = match.type_id
+    contract.contract_type_source = TYPE_SOURCE_AUTO
+    parsed["type"] = str(match.type_id)
+    parsed["type_label"] = match.name
+    parsed["type_description"] = match.description
+    parsed["type_score"] = round(match.score, 2)
+
+
+def apply_parsed(contract: models.Contract, parsed: dict, ocr_pages: Optional[List[dict]]) -> None:
+    """Store a parse result on the contract, stamped with PARSER_VERSION, and the columns derived from it.
+
+    Shared by ingestion and app.reparse, so a re-parse leaves a contract
+    exactly as a fresh ingestion with the current parser would.
+    """
+    parsed["ocr_pages"] = ocr_pages
+    parsed["parser_version"] = PARSER_VERSION
+    contract.parsed_json = parsed
+    contract.parser_version = PARSER_VERSION
+    contract.amount_value = parsed.get("amount_value")
+    contract.amount_currency = parsed.get("amount_currency")
+    contract.effective_date = _iso_datetime(parsed.get("effective_on"))
+    contract.expiration_date = _iso_datetime(parsed.get("expiration_date"))
+
+
+def apply_clauses(contract: models.Contract, clauses: List[dict]) -> None:
+    """Replace the contract's contract_clauses rows with segment_clauses output."""
+    contract.clauses = [models.ContractClause(**clause) for clause in clauses]
+
+
+def _iso_datetime(value: Optional[str]) -> Optional[datetime]:
+    """The parser's ISO dates ("2025-01-31") as datetimes for the DateTime columns."""
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def process_preview(
+    db: Session,
+    contract: models.Contract,
+    lang: Optional[str] = None,
+    pages: Optional[int] = None,
+    stats: Optional[StageTimer] = None,
+) -> bool:
+    """Phase one of ingestion: OCR and parse only the first pages (ingest_preview_pages).
+
+    Title, type and parties are found near the top of a contract, so this fills
+    them in within seconds while process_contract handles the whole document in
+    the background. The pages are checkpointed under the file hash, so the
+    background run does not OCR them again. The preview has its own time budget,
+    ingest_preview_timeout_seconds; pages it cuts short are not checkpointed and
+    are OCR'd again in the background. Returns False when there is nothing to
+    preview: disabled, a single image, or a file already in the OCR cache.
+    """
+    pages = settings.ingest_preview_pages if pages is None else pages
+    lang = lang or settings.default_lang
+    ext = os.path.splitext(contract.original_path)[1].lower()
+    if pages <= 0 or not contract.file_hash or ext not in PDF_EXTENSIONS + TIFF_EXTENSIONS:
+        return False
+    if is_cached(db, contract.file_hash, lang):
+        return False
+    stats = stats if stats is not None else StageTimer()
+    first = extract_pages(contract.original_path, lang=lang, doc_hash=contract.file_hash, max_pages=pages,
+                          timeout=settings.ingest_preview_timeout_seconds)
+    for page in first:
+        stats.merge(page.timings)
+    parsed = _parse(db, contract, join_pages(first), stats)
+    apply_parsed(contract, parsed, page_summary(first))
+    contract.ingest_phase = PHASE_PREVIEW
+    with stats.stage("db"):
+        db.commit()
+        db.refresh(contract)
+    return True
+
+
+def process_contract(
+    db: Session,
+    contract: models.Contract,
+    lang: Optional[str] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    stats: Optional[IngestStats] = None,
+) -> models.Contract:
+    """Run OCR -> .txt -> .docx -> parse for a saved upload and mark the contract processed
+    (phase two of ingestion when process_preview ran first; its parse is replaced).
+
+    OCR errors propagate so the job queue can retry the contract later; pages
+    that ran out of time are recorded in ocr_pages with status degraded/failed.
+    should_stop is checked between pages (OcrCancelled when it returns True).
+    Renditions in RENDITION_EAGER are rendered along the way (timed as "render").
+    Wall/CPU time per stage, pages and cache use are added to stats.
+    """
+    lang = lang or settings.default_lang
+    stats = stats if stats is not None else IngestStats()
+    # File tải lên lại (cùng hash) dùng kết quả OCR đã lưu
+    cached = get_cached_result(db, contract.file_hash, lang)
+    if cached is not None:
+        text, ocr_pages = cached
+        stats.cache_hit = True
+    else:
+        pages = extract_pages(contract.original_path, lang=lang, doc_hash=contract.file_hash, should_stop=should_stop)
+        for page in pages:
+            stats.merge(page.timings)
+        text = join_pages(pages)
+        ocr_pages = page_summary(pages)
+        incomplete = [p.index + 1 for p in pages if p.status != "ok"]
+        if incomplete:
+            # Không cache kết quả thiếu trang, lần tải lên sau sẽ OCR lại
+            print(f"OCR timeout for {contract.original_filename}: pages {incomplete} degraded/failed")
+        else:
+            store_result(db, contract.file_hash, lang, text, ocr_pages)
+        clear_checkpoints(contract.file_hash)
+    stats.set_pages(ocr_pages)
+
+    with stats.stage("txt"):
+        with open(contract.text_path, "w", encoding="utf-8") as f_txt:
+            f_txt.write(text)
+
+    with stats.stage("docx"):
+        document = Document()
+        document.add_paragraph(text)
+        document.save(contract.docx_path)
+
+    kinds = eager_kinds()
+    if kinds:
+        # Ảnh thu nhỏ các trang cho trang chi tiết; lỗi ở đây không làm hỏng hợp đồng
+        with stats.stage("render"):
+            render_renditions(contract, kinds)
+
+    parsed = _parse(db, contract, text, stats)
+    apply_parsed(contract, parsed, ocr_pages)
+
+    contract.status = "processed"
+    contract.ingest_phase = PHASE_COMPLETE
+    with stats.stage("db"):
+        db.commit()
+        db.refresh(contract)
+    return contract
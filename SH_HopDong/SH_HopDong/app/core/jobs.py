@@ -0,0 +1,280 @@
+"""Durable ingestion queue backed by the ingest_jobs table.
+
+Jobs are claimed with a conditional UPDATE (status 'queued' -> 'running'), so
+several worker processes can share one table. A running job carries a lease
+(locked_at) that its worker renews; if the worker dies, the lease runs out and
+the job counts as a failed attempt: it is retried after a backoff, or marked
+failed once max_attempts is reached, so interrupted work resumes after a
+restart but a document that keeps killing its worker does not loop forever.
+
+Cancelling a running job sets cancel_requested; the worker's lease thread picks
+it up and OCR stops before the next page.
+"""
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import false, or_, true
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ingest import process_contract
+from app.core.metrics import IngestStats, file_size, record_ingest
+from app.core.ocr import OcrCancelled
+from app.core.timing import cpu_seconds
+from app.db import crud, models
+from app.db.base import SessionLocal
+
+
+def _now() -> datetime:
+    return datetime.now()
+
+
+def backoff_seconds(attempts: int) -> int:
+    return min(settings.job_retry_base_seconds * 2 ** max(attempts - 1, 0), settings.job_retry_max_seconds)
+
+
+def enqueue_contract(
+    db: Session,
+    contract: models.Contract,
+    lang: Optional[str] = None,
+    timings: Optional[Dict[str, List[float]]] = None,
+) -> models.IngestJob:
+    """timings ({stage: [wall s, CPU s]}) is the work done in the request, i.e. writing the
+    upload and the preview phase; it is recorded with the first attempt."""
+    payload = {"lang": lang}
+    if timings:
+        payload["timings"] = timings
+    return crud.create_ingest_job(db, contract.id, payload=payload, max_attempts=settings.job_max_attempts)
+
+
+def requeue_stale_jobs(db: Session) -> int:
+    """Retry (with backoff) or fail running jobs whose worker stopped renewing its lease."""
+    now = _now()
+    expired = now - timedelta(seconds=settings.job_lease_seconds)
+    stale = db.query(models.IngestJob).filter(models.IngestJob.status == "running", models.IngestJob.locked_at < expired)
+    # Job đã yêu cầu hủy thì không đưa lại vào hàng đợi
+    for job in stale.filter(models.IngestJob.cancel_requested == true()).all():
+        _mark_cancelled(job)
+    count = 0
+    not_cancelled = or_(models.IngestJob.cancel_requested.is_(None), models.IngestJob.cancel_requested == false())
+    for job in stale.filter(not_cancelled).all():
+        values = _failure(job, "Lease expired (worker stopped)", now)
+        # Conditional, so a job another worker already put back and claimed again is left alone
+        updated = (
+            db.query(models.IngestJob)
+            .filter(models.IngestJob.id == job.id, models.IngestJob.status == "running",
+                    models.IngestJob.locked_at == job.locked_at)
+            .update(values, synchronize_session=False)
+        )
+        if updated and values["status"] == "failed" and job.contract is not None:
+            job.contract.status = "failed"
+        count += updated
+    db.commit()
+    return count
+
+
+def claim_next_job(db: Session, worker_id: str) -> Optional[models.IngestJob]:
+    now = _now()
+    candidates = (
+        db.query(models.IngestJob.id)
+        .filter(models.IngestJob.status == "queued", models.IngestJob.next_run_at <= now)
+        .order_by(models.IngestJob.next_run_at, models.IngestJob.id)
+        .limit(5)
+        .all()
+    )
+    for (job_id,) in candidates:
+        claimed = (
+            db.query(models.IngestJob)
+            .filter(models.IngestJob.id == job_id, models.IngestJob.status == "queued")
+            .update(
+                {
+                    "status": "running",
+                    "locked_by": worker_id,
+                    "locked_at": now,
+                    "attempts": models.IngestJob.attempts + 1,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+        if claimed:
+            return crud.get_ingest_job(db, job_id)
+    return None
+
+
+def complete_job(db: Session, job: models.IngestJob) -> None:
+    job.status = "done"
+    job.locked_by = None
+    job.locked_at = None
+    job.last_error = None
+    job.finished_at = _now()
+    db.commit()
+
+
+def _failure(job: models.IngestJob, error: str, now: datetime) -> Dict:
+    """Column values for a failed attempt: a retry after backoff, or failed after max_attempts."""
+    values = {"last_error": error, "locked_by": None, "locked_at": None}
+    if job.attempts >= job.max_attempts:
+        values.update(status="failed", finished_at=now)
+    else:
+        values.update(status="queued", next_run_at=now + timedelta(seconds=backoff_seconds(job.attempts)))
+    return values
+
+
+def fail_job(db: Session, job: models.IngestJob, error: str) -> None:
+    """Schedule a retry with exponential backoff, or give up after max_attempts."""
+    for name, value in _failure(job, error, _now()).items():
+        setattr(job, name, value)
+    if job.status == "failed" and job.contract is not None:
+        job.contract.status = "failed"
+    db.commit()
+
+
+def _mark_cancelled(job: models.IngestJob) -> None:
+    job.status = "cancelled"
+    job.locked_by = None
+    job.locked_at = None
+    job.finished_at = _now()
+    if job.contract is not None:
+        job.contract.status = "cancelled"
+
+
+def cancel_job(db: Session, job: models.IngestJob) -> models.IngestJob:
+    """Cancel a queued job at once; a running one stops before its next page."""
+    if job.status == "queued":
+        _mark_cancelled(job)
+    elif job.status == "running":
+        job.cancel_requested = True
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+class _LeaseKeeper(threading.Thread):
+    """Renews the job lease while OCR runs and watches for cancellation, using its own session."""
+
+    def __init__(self, job_id: int, worker_id: str):
+        super().__init__(daemon=True)
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.stopped = threading.Event()
+        self.cancelled = threading.Event()
+
+    def run(self) -> None:
+        interval = max(min(settings.job_lease_seconds / 3, settings.job_poll_seconds), 1)
+        while not self.stopped.wait(interval):
+            db = SessionLocal()
+            try:
+                job = db.query(models.IngestJob).filter(
+                    models.IngestJob.id == self.job_id,
+                    models.IngestJob.locked_by == self.worker_id,
+                )
+                job.update({"locked_at": _now()}, synchronize_session=False)
+                db.commit()
+                if job.with_entities(models.IngestJob.cancel_requested).scalar():
+                    self.cancelled.set()
+            except Exception as e:
+                print(f"Lease renew error for job {self.job_id}: {str(e)}")
+            finally:
+                db.close()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+def run_job(db: Session, job: models.IngestJob, worker_id: str) -> None:
+    contract = job.contract
+    if contract is None:
+        fail_job(db, job, "Contract no longer exists")
+        return
+    payload = job.payload or {}
+    stats = IngestStats()
+    stats.bytes = file_size(contract.original_path)
+    if job.attempts == 1:
+        stats.merge(payload.get("timings"))
+    contract_id = contract.id
+    wall, cpu = time.perf_counter(), cpu_seconds()
+    lease = _LeaseKeeper(job.id, worker_id)
+    lease.start()
+    try:
+        process_contract(db, contract, lang=payload.get("lang"), should_stop=lease.cancelled.is_set, stats=stats)
+    except OcrCancelled as e:
+        db.rollback()
+        print(f"Ingest job {job.id} cancelled ({contract.original_filename}): {str(e)}")
+        job.last_error = str(e)
+        _mark_cancelled(job)
+        db.commit()
+        outcome = "cancelled"
+    except Exception as e:
+        db.rollback()
+        print(f"Ingest Error for job {job.id} ({contract.original_filename}): {str(e)}")
+        traceback.print_exc()
+        fail_job(db, job, f"{type(e).__name__}: {e}")
+        outcome = "failed" if job.status == "failed" else "retry"
+    else:
+        complete_job(db, job)
+        outcome = "processed"
+    finally:
+        lease.stop()
+    record_ingest(db, stats, outcome, time.perf_counter() - wall, cpu_seconds() - cpu,
+                  contract_id=contract_id, job_id=job.id)
+
+
+def run_worker(stop_event=None, worker_id: Optional[str] = None) -> None:
+    """Worker loop: claim a job, run it, repeat until stop_event is set."""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    print(f"Ingest worker {worker_id} started")
+    while stop_event is None or not stop_event.is_set():
+        db = SessionLocal()
+        try:
+            requeue_stale_jobs(db)
+            job = claim_next_job(db, worker_id)
+            if job is not None:
+                run_job(db, job, worker_id)
+                continue
+        except Exception as e:
+            print(f"Ingest worker {worker_id} error: {str(e)}")
+        finally:
+            db.close()
+        if stop_event is not None:
+            stop_event.wait(settings.job_poll_seconds)
+        else:
+            time.sleep(settings.job_poll_seconds)
+    print(f"Ingest worker {worker_id} stopped")
+
+
+class WorkerPool:
+    """Starts ingest workers as separate processes (spawn, so it also works on Windows).
+
+    The processes are not daemonic because a worker may open its own OCR process pool.
+    """
+
+    def __init__(self, count: int):
+        self.count = count
+        self._ctx = multiprocessing.get_context("spawn")
+        self._stop = self._ctx.Event()
+        self._procs: List[multiprocessing.Process] = []
+
+    def start(self) -> None:
+        for i in range(self.count):
+            proc = self._ctx.Process(target=run_worker, args=(self._stop,), name=f"ingest-worker-{i}")
+            proc.start()
+            self._procs.append(proc)
+
+    def join(self) -> None:
+        for proc in self._procs:
+            proc.join()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        for proc in self._procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
@@ -0,0 +1,79 @@
+"""Word-level multi-pattern matching shared by partner linking and type classification.
+
+Text and patterns are normalized the same way (lowercase, no diacritics,
+punctuation dropped) and split into words; an Aho-Corasick automaton over those
+words finds every pattern in one left-to-right pass, whatever the number of
+patterns, and matches always fall on word boundaries ("ABC" does not match
+inside "ABCD").
+"""
+import re
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from app.core.parser import strip_diacritics
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(text: str) -> List[str]:
+    """Words of text as matched: "Công ty TNHH A.B.C" -> ["cong", "ty", "tnhh", "a", "b", "c"]."""
+    return _WORD.findall(strip_diacritics(text))
+
+
+class Automaton:
+    """Aho-Corasick automaton over word sequences.
+
+    Transitions live in one dict keyed by (state, word) instead of a dict per
+    state, which keeps tens of thousands of patterns to a few tens of MB.
+    """
+
+    __slots__ = ("goto", "fail", "out", "size")
+
+    def __init__(self, patterns: Iterable[Tuple[List[str], Any]]):
+        goto: Dict[Tuple[int, str], int] = {}
+        children: List[List[str]] = [[]]  # only needed to build the fail links
+        out: List[tuple] = [()]
+        size = 0
+        for words, payload in patterns:
+            state = 0
+            for word in words:
+                nxt = goto.get((state, word))
+                if nxt is None:
+                    nxt = len(children)
+                    goto[state, word] = nxt
+                    children[state].append(word)
+                    children.append([])
+                    out.append(())
+                state = nxt
+            out[state] += (payload,)
+            size += 1
+
+        # Breadth-first, so the fail target of a state is always complete before it
+        fail = [0] * len(children)
+        queue = deque(goto[0, word] for word in children[0])
+        while queue:
+            state = queue.popleft()
+            for word in children[state]:
+                child = goto[state, word]
+                queue.append(child)
+                target = fail[state]
+                while target and (target, word) not in goto:
+                    target = fail[target]
+                target = goto.get((target, word), 0)
+                fail[child] = target
+                if out[target]:
+                    out[child] += out[target]
+        self.goto, self.fail, self.out, self.size = goto, fail, out, size
+
+    def search(self, words: List[str]) -> Iterator[Tuple[int, Any]]:
+        """(end, payload) for every occurrence; the pattern ends at words[end - 1]."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for end, word in enumerate(words, 1):
+            nxt = goto.get((state, word))
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto.get((state, word))
+            state = nxt or 0
+            for payload in out[state]:
+                yield end, payload
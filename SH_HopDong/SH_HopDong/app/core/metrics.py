@@ -0,0 +1,197 @@
+"""Ingestion timings: one ingest_timings row per job attempt, and the aggregates
+shown on /settings/ocr.
+
+Each row holds wall and CPU milliseconds for every stage in STAGES plus the
+attempt's end-to-end time, page count, file size and outcome. Render and OCR are
+summed over pages, so with a process pool they add up to more than wall_ms;
+they answer "where does the work go", wall_ms answers "how long did it take".
+All statistics are computed with aggregate queries over an index on created_at.
+"""
+import math
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, false, func
+from sqlalchemy.orm import Query, Session
+
+from app.core.timing import StageTimer
+from app.db import models
+
+STAGES = ("upload", "render", "ocr", "txt", "docx", "parse", "db")
+STAGE_LABELS = {
+    "upload": "Ghi file tải lên",
+    "render": "Render trang / đọc text layer",
+    "ocr": "Nhận dạng OCR",
+    "txt": "Ghi .txt",
+    "docx": "Tạo .docx",
+    "parse": "Phân tích nội dung",
+    "db": "Lưu CSDL",
+}
+FINAL_OUTCOMES = ("processed", "failed")
+PERCENTILES = (50, 95, 99)
+DAILY_DAYS = 7
+
+
+class IngestStats(StageTimer):
+    """Stage timer of one ingest attempt plus what was processed."""
+
+    def __init__(self):
+        super().__init__()
+        self.pages = 0
+        self.bytes = 0
+        self.cache_hit = False
+        self.confidence: Optional[float] = None
+
+    def set_pages(self, pages: List[dict]) -> None:
+        self.pages = len(pages)
+        confidences = [p["confidence"] for p in pages if p.get("confidence") is not None]
+        self.confidence = round(sum(confidences) / len(confidences), 1) if confidences else None
+
+
+def _ms(seconds: float) -> int:
+    return int(round(seconds * 1000))
+
+
+def record_ingest(
+    db: Session,
+    stats: IngestStats,
+    outcome: str,
+    wall: float,
+    cpu: float,
+    contract_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+) -> None:
+    """Store the timings of one attempt; never lets a metrics error fail the job."""
+    row = models.IngestTiming(
+        contract_id=contract_id,
+        job_id=job_id,
+        outcome=outcome,
+        cache_hit=stats.cache_hit,
+        pages=stats.pages,
+        bytes=stats.bytes,
+        confidence=stats.confidence,
+        wall_ms=_ms(wall),
+        cpu_ms=_ms(cpu),
+        created_at=datetime.now(),
+    )
+    for stage in STAGES:
+        wall_s, cpu_s = stats.totals.get(stage, (0.0, 0.0))
+        setattr(row, f"{stage}_ms", _ms(wall_s))
+        setattr(row, f"{stage}_cpu_ms", _ms(cpu_s))
+    try:
+        db.add(row)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Metrics Error for contract {contract_id}: {str(e)}")
+
+
+def file_size(path: Optional[str]) -> int:
+    try:
+        return os.path.getsize(path) if path else 0
+    except OSError:
+        return 0
+
+
+def _between(db: Session, start: datetime, end: datetime) -> Query:
+    return db.query(models.IngestTiming).filter(
+        models.IngestTiming.created_at >= start,
+        models.IngestTiming.created_at < end,
+    )
+
+
+def _window(db: Session, start: datetime, end: datetime) -> dict:
+    T = models.IngestTiming
+    processed = T.outcome == "processed"
+    total, success, pages = (
+        _between(db, start, end)
+        .filter(T.outcome.in_(FINAL_OUTCOMES))
+        .with_entities(
+            func.count(T.id),
+            func.sum(case((processed, 1), else_=0)),
+            func.sum(case((processed, T.pages), else_=0)),
+        )
+        .one()
+    )
+    total, success, pages = total or 0, int(success or 0), int(pages or 0)
+    return {
+        "total": total,
+        "success": success,
+        "failed": total - success,
+        "success_rate": round(100.0 * success / total, 1) if total else 0.0,
+        "pages": pages,
+    }
+
+
+def _percentile(query: Query, column, count: int, percent: int) -> Optional[int]:
+    """Nearest-rank percentile via ORDER BY ... OFFSET, without loading the rows."""
+    if not count:
+        return None
+    offset = max(math.ceil(percent / 100 * count) - 1, 0)
+    return query.with_entities(column).order_by(column).offset(offset).limit(1).scalar()
+
+
+def _stage_breakdown(query: Query, count: int) -> List[dict]:
+    T = models.IngestTiming
+    columns = []
+    for stage in STAGES:
+        columns += [func.sum(getattr(T, f"{stage}_ms")), func.sum(getattr(T, f"{stage}_cpu_ms"))]
+    sums = [int(v or 0) for v in query.with_entities(*columns).one()]
+    total_wall = sum(sums[0::2]) or 1
+    return [
+        {
+            "stage": stage,
+            "label": STAGE_LABELS[stage],
+            "avg_ms": round(sums[2 * i] / count, 1) if count else 0.0,
+            "avg_cpu_ms": round(sums[2 * i + 1] / count, 1) if count else 0.0,
+            "share": round(100.0 * sums[2 * i] / total_wall, 1),
+        }
+        for i, stage in enumerate(STAGES)
+    ]
+
+
+def ingest_overview(db: Session, now: Optional[datetime] = None) -> Dict[str, object]:
+    """Today / this month / last DAILY_DAYS days of ingestion, plus latency and stage costs for the month."""
+    T = models.IngestTiming
+    now = now or datetime.now()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    month = today.replace(day=1)
+    end = today + timedelta(days=1)
+
+    today_stats = _window(db, today, end)
+    month_stats = _window(db, month, end)
+    daily = []
+    for offset in range(DAILY_DAYS - 1, -1, -1):
+        day = today - timedelta(days=offset)
+        daily.append({"date": day.date().isoformat(), **_window(db, day, day + timedelta(days=1))})
+
+    processed = _between(db, month, end).filter(T.outcome == "processed")
+    count, avg_wall, avg_confidence = processed.with_entities(
+        func.count(T.id), func.avg(T.wall_ms), func.avg(T.confidence)
+    ).one()
+    count = count or 0
+    # Tốc độ OCR thực tế: bỏ các lần lấy từ cache
+    ocr_pages, ocr_wall = processed.filter(T.cache_hit == false()).with_entities(
+        func.sum(T.pages), func.sum(T.wall_ms)
+    ).one()
+    latency = {}
+    for p in PERCENTILES:
+        value = _percentile(processed, T.wall_ms, count, p)
+        latency[f"p{p}"] = round(value / 1000, 2) if value is not None else None
+
+    return {
+        "today_processed": today_stats["total"],
+        "today_success": today_stats["success"],
+        "today_failed": today_stats["failed"],
+        "today_pages": today_stats["pages"],
+        "month_total": month_stats["total"],
+        "month_success_rate": month_stats["success_rate"],
+        "month_pages": month_stats["pages"],
+        "avg_processing_time": round(float(avg_wall) / 1000, 2) if avg_wall is not None else 0.0,
+        "latency_seconds": latency,
+        "pages_per_minute": round(ocr_pages * 60000 / ocr_wall, 1) if ocr_pages and ocr_wall else 0.0,
+        "avg_confidence": round(float(avg_confidence), 1) if avg_confidence is not None else None,
+        "daily": daily,
+        "stages": _stage_breakdown(processed, count),
+    }
@@ -1,41 +1,812 @@
+import hashlib
+import json
 import os
-from typing import Optional
-from io import BytesIO
+import re
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+from functools import partial, wraps
+from typing import Callable, Dict, List, Optional, Tuple
 
 import fitz  # PyMuPDF
 from PIL import Image
 import pytesseract
 
 from app.core.config import settings
+from app.core.preprocess import enabled_steps, prepare_image
+from app.core.text_layer import TextLayerAssessment, assess_page, detect_language
+from app.core.timing import StageTimer
 
 
 if settings.tesseract_path and os.path.exists(settings.tesseract_path):
     pytesseract.pytesseract.tesseract_cmd = settings.tesseract_path
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+CHECKPOINT_DIR = settings.ocr_checkpoint_dir or os.path.join(PROJECT_ROOT, "checkpoints")
 
-def extract_text_from_image(image_path: str, lang: Optional[str] = None) -> str:
+
+# Tăng khi thay đổi pipeline làm thay đổi kết quả OCR (vô hiệu hóa cache cũ)
+OCR_PIPELINE_VERSION = 5
+
+# lang value that lets the pipeline pick the tesseract model per page (see _resolve_lang)
+LANG_AUTO = "auto"
+# Horizontal band (share of the page height) OCR'd by the language probe: below the letterhead
+_PROBE_BAND = (0.15, 0.45)
+
+_engine_description: Optional[str] = None
+_engine_version: Optional[str] = None
+_backend: Optional["OcrBackend"] = None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+# How often the parallel path checks should_stop while pages are running
+_CANCEL_POLL_SECONDS = 1.0
+
+
+@dataclass
+class PageResult:
+    """Text of one page plus how it was obtained (recorded per contract)."""
+    index: int
+    text: str
+    source: str = "ocr"  # "text" = text layer của PDF, "ocr" = tesseract, "ocr_regions" = text layer + OCR vùng ảnh
+    dpi: Optional[int] = None
+    confidence: Optional[float] = None
+    quality: Optional[float] = None  # điểm chất lượng text layer (0-1), None nếu trang không có chữ
+    status: str = "ok"  # "degraded" = hết thời gian, giữ kết quả kém hơn; "failed" = hết thời gian, trang trống
+    error: Optional[str] = None
+    lang: Optional[str] = None  # model tesseract đã dùng (với lang="auto" là model được chọn)
+    timings: Optional[Dict[str, List[float]]] = None  # {"render"|"ocr": [wall s, CPU s]} của lần xử lý này
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class OcrTimeout(RuntimeError):
+    """An OCR call ran past its page or document time budget; tesseract was stopped."""
+
+
+class OcrCancelled(RuntimeError):
+    """OCR was stopped between pages because the job was cancelled."""
+
+
+class OcrBackend:
+    """Recognizes text in a PIL image (mode L or RGB).
+
+    timeout is in seconds (None = no limit); on overrun the recognition is
+    stopped and OcrTimeout raised.
+    """
+    name = "base"
+
+    def version(self) -> str:
+        raise NotImplementedError
+
+    def image_to_string(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> Tuple[str, Optional[float]]:
+        """Return (text, mean word confidence 0-100 or None if no words)."""
+        raise NotImplementedError
+
+
+class PytesseractBackend(OcrBackend):
+    """Fallback: one tesseract subprocess per call, models reloaded every time."""
+    name = "pytesseract"
+
+    def version(self) -> str:
+        return str(pytesseract.get_tesseract_version())
+
+    def _call(self, func, image: Image.Image, lang: str, timeout: Optional[float], **kwargs):
+        try:
+            # pytesseract kills the tesseract process when the timeout expires
+            return func(image, lang=lang, timeout=timeout or 0, **kwargs)
+        except RuntimeError as e:
+            if str(e) == "Tesseract process timeout":
+                raise OcrTimeout(f"tesseract exceeded {timeout:.0f}s") from e
+            raise
+
+    def image_to_string(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> str:
+        return self._call(pytesseract.image_to_string, image, lang, timeout)
+
+    def image_to_data(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> Tuple[str, Optional[float]]:
+        data = self._call(pytesseract.image_to_data, image, lang, timeout, output_type=pytesseract.Output.DICT)
+        return _data_to_text(data), _mean_confidence(data)
+
+
+class TesserocrBackend(OcrBackend):
+    """Tesseract C API via tesserocr.
+
+    One PyTessBaseAPI is kept per language for the life of the process, so each
+    (pool) worker loads the traineddata once instead of once per page.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self._apis = {}
+
+    def version(self) -> str:
+        return self._tesserocr.tesseract_version().split()[1]
+
+    def _api(self, lang: str):
+        api = self._apis.get(lang)
+        if api is None:
+            kwargs = {"lang": lang}
+            if settings.tessdata_path:
+                kwargs["path"] = settings.tessdata_path
+            api = self._tesserocr.PyTessBaseAPI(**kwargs)
+            self._apis[lang] = api
+        return api
+
+    def _set_image(self, api, image: Image.Image) -> None:
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        bpp = 1 if image.mode == "L" else 3
+        # raw pixels straight into tesseract, no file or image encoding
+        api.SetImageBytes(image.tobytes(), image.width, image.height, bpp, bpp * image.width)
+        dpi = image.info.get("dpi")
+        if dpi:
+            api.SetSourceResolution(int(dpi[0]))
+
+    def _recognize(self, api, timeout: Optional[float]) -> None:
+        if timeout is None:
+            return  # GetUTF8Text recognizes on demand
+        # Recognize returns False when tesseract's own deadline monitor cancelled it
+        if not api.Recognize(max(int(timeout * 1000), 1)):
+            raise OcrTimeout(f"tesseract exceeded {timeout:.0f}s")
+
+    def image_to_string(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> str:
+        api = self._api(lang)
+        try:
+            self._set_image(api, image)
+            self._recognize(api, timeout)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image: Image.Image, lang: str, timeout: Optional[float] = None) -> Tuple[str, Optional[float]]:
+        api = self._api(lang)
+        try:
+            self._set_image(api, image)
+            self._recognize(api, timeout)
+            text = api.GetUTF8Text()
+            confs = [c for c in api.AllWordConfidences() if c >= 0]
+        finally:
+            api.Clear()
+        return text, (round(sum(confs) / len(confs), 1) if confs else None)
+
+
+def get_backend() -> OcrBackend:
+    """Per-process OCR backend chosen by settings.ocr_backend (auto/tesserocr/pytesseract)."""
+    global _backend
+    if _backend is None:
+        choice = settings.ocr_backend.lower()
+        if choice in ("auto", "tesserocr"):
+            try:
+                _backend = TesserocrBackend()
+            except ImportError:
+                if choice == "tesserocr":
+                    print("OCR backend tesserocr không khả dụng, dùng pytesseract")
+        if _backend is None:
+            _backend = PytesseractBackend()
+    return _backend
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared OCR process pool, (re)creating it when the size changes."""
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+        _pool = ProcessPoolExecutor(max_workers=workers)
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown(wait=True)
+    _pool = None
+    _pool_workers = 0
+
+
+def engine_description() -> str:
+    """Readable OCR engine + pipeline settings, e.g. for benchmark metadata."""
+    global _engine_description
+    if _engine_description is None:
+        backend = get_backend()
+        try:
+            tess = backend.version()
+        except Exception:
+            tess = "unknown"
+        if settings.ocr_confidence_check:
+            mode = f"a{settings.ocr_low_dpi}-{settings.ocr_high_dpi}-{settings.ocr_confidence_threshold}"
+        else:
+            mode = f"d{settings.ocr_high_dpi}"
+        layer = f"q{settings.text_layer_min_quality}-{settings.ocr_region_min_area}"
+        auto = f"l{settings.ocr_auto_langs}-{settings.ocr_probe_dpi}-{settings.ocr_lang_hint_pages}"
+        prep = f"i{'.'.join(enabled_steps()) or 'none'}-{settings.ocr_target_dpi}"
+        _engine_description = f"{backend.name}-{tess}/p{OCR_PIPELINE_VERSION}/{mode}/{layer}/{auto}/{prep}"
+    return _engine_description
+
+
+def engine_version() -> str:
+    """Identify the OCR engine + pipeline so cached results are not reused across upgrades.
+
+    A SHA-1 of engine_description(): the description grows with every pipeline
+    setting, the digest always fits OcrCacheEntry.engine_version and cache_key.
+    """
+    global _engine_version
+    if _engine_version is None:
+        _engine_version = hashlib.sha1(engine_description().encode("utf-8")).hexdigest()
+    return _engine_version
+
+
+def _checkpoint_dir(doc_hash: str, lang: str) -> str:
+    variant = re.sub(r"[^A-Za-z0-9_.+-]", "_", f"{lang}-{engine_version()}")
+    return os.path.join(CHECKPOINT_DIR, doc_hash, variant)
+
+
+def _load_checkpoints(directory: str) -> Dict[int, PageResult]:
+    pages = {}
+    if not os.path.isdir(directory):
+        return pages
+    for name in os.listdir(directory):
+        stem, ext = os.path.splitext(name)
+        if ext == ".json" and stem.isdigit():
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                pages[int(stem)] = PageResult(**json.load(f))
+    return pages
+
+
+def _save_checkpoint(directory: str, result: PageResult) -> None:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{result.index}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        # timings belong to the attempt that did the work, a resumed run must not count them again
+        json.dump({k: v for k, v in result.to_dict().items() if k != "timings"}, f, ensure_ascii=False)
+    os.replace(tmp, path)  # atomic, so a killed worker never leaves half a page
+
+
+def clear_checkpoints(doc_hash: Optional[str]) -> None:
+    if doc_hash:
+        shutil.rmtree(os.path.join(CHECKPOINT_DIR, doc_hash), ignore_errors=True)
+
+
+def document_deadline(timeout: Optional[float] = None) -> Optional[float]:
+    """Absolute (time.time()) end of a document's OCR budget; timeout defaults to settings.ocr_timeout_seconds."""
+    timeout = settings.ocr_timeout_seconds if timeout is None else timeout
+    return time.time() + timeout if timeout and timeout > 0 else None
+
+
+def _page_deadline(doc_deadline: Optional[float]) -> Optional[float]:
+    """Deadline for a page starting now: ocr_page_timeout_seconds, capped by the document budget."""
+    deadline = time.time() + settings.ocr_page_timeout_seconds if settings.ocr_page_timeout_seconds > 0 else None
+    if doc_deadline is not None:
+        deadline = doc_deadline if deadline is None else min(deadline, doc_deadline)
+    return deadline
+
+
+def _remaining(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    left = deadline - time.time()
+    if left <= 0:
+        raise OcrTimeout("time budget exhausted")
+    return left
+
+
+def _failed_page(index: int, error: Exception, **fields) -> PageResult:
+    return PageResult(index=index, text="", status="failed", error=str(error), **fields)
+
+
+# Timer of the page being processed in this process (None outside _with_timings)
+_page_timer: Optional[StageTimer] = None
+
+
+def _timed(stage: str):
+    return _page_timer.stage(stage) if _page_timer is not None else nullcontext()
+
+
+def _with_timings(func: Callable[..., PageResult]) -> Callable[..., PageResult]:
+    """Record the render/OCR time spent inside func in the returned PageResult.timings."""
+    @wraps(func)
+    def wrapper(*args, **kwargs) -> PageResult:
+        global _page_timer
+        outer, _page_timer = _page_timer, StageTimer()
+        try:
+            result = func(*args, **kwargs)
+            result.timings = _page_timer.to_dict()
+        finally:
+            timer, _page_timer = _page_timer, outer
+        if outer is not None:
+            outer.merge(timer.totals)
+        return result
+    return wrapper
+
+
+def extract_text_from_image(image_path: str, lang: Optional[str] = None, deadline: Optional[float] = None) -> str:
     lang = lang or settings.default_lang
     image = Image.open(image_path)
-    if image.mode not in ("L", "RGB"):
-        image = image.convert("RGB")
-    text = pytesseract.image_to_string(image, lang=lang)
+    if getattr(image, "n_frames", 1) > 1:
+        # TIFF nhiều trang: OCR lần lượt từng frame thay vì chỉ frame đầu
+        image.close()
+        return join_pages(extract_pages_from_tiff(image_path, lang=lang))
+    if lang == LANG_AUTO:
+        with image:
+            return _ocr_image_page(image, 0, lang, deadline).text.strip()
+    steps = enabled_steps()
+    with _timed("render"):
+        if steps:
+            image, _ = prepare_image(image, steps)
+        elif image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+        else:
+            image.load()
+    image.format = "PPM"  # pytesseract ghi file tạm dạng raw thay vì nén lại PNG/JPEG
+    with _timed("ocr"):
+        text = get_backend().image_to_string(image, lang, timeout=_remaining(deadline))
     return text.strip()
 
 
-def extract_text_from_pdf(pdf_path: str, lang: Optional[str] = None) -> str:
+@_with_timings
+def extract_page_from_image(image_path: str, lang: Optional[str] = None, timeout: Optional[float] = None) -> PageResult:
+    """OCR a single-page image within the page/document time budget, with the same
+    confidence check and DPI escalation as a scanned PDF page."""
     lang = lang or settings.default_lang
-    doc = fitz.open(pdf_path)
-    parts = []
-    for page in doc:
-        text = page.get_text().strip()
-        if text:
-            parts.append(text)
+    deadline = _page_deadline(document_deadline(timeout))
+    try:
+        with Image.open(image_path) as image:
+            if getattr(image, "n_frames", 1) == 1:
+                return _ocr_image_page(image, 0, lang, deadline)
+        # Multi-frame TIFF: every frame, joined
+        return PageResult(index=0, text=extract_text_from_image(image_path, lang, deadline), lang=lang)
+    except OcrTimeout as e:
+        return _failed_page(0, e)
+
+
+def _ocr_rendered(page: "fitz.Page", dpi: int, ocr: Callable, lang: str, clip: Optional[fitz.Rect] = None):
+    """Render a page (or just its clip rectangle) in grayscale and run ocr(image, lang) on it without copying pixels.
+
+    The PIL image is a view over the pixmap's sample buffer (no PNG encode/decode) and
+    is tagged PPM so pytesseract writes a raw dump for tesseract. Both are dropped
+    before returning, so the page buffer is freed as soon as the page is done.
+    """
+    with _timed("render"):
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False, clip=clip)
+        image = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    image.format = "PPM"
+    image.info["dpi"] = (dpi, dpi)
+    try:
+        with _timed("ocr"):
+            return ocr(image, lang)
+    finally:
+        # the image must go first: it holds an export of the pixmap buffer
+        del image
+        del pix
+
+
+def _frame_dpi(frame: Image.Image) -> int:
+    """Scan resolution of the current TIFF frame; untagged scans are assumed to be at ocr_high_dpi."""
+    try:
+        dpi = int(round(float(frame.info["dpi"][0])))
+    except (KeyError, TypeError, ValueError, IndexError):
+        return settings.ocr_high_dpi
+    # PIL reports (1, 1) when the resolution tag is missing
+    return dpi if dpi >= 72 else settings.ocr_high_dpi
+
+
+def _ocr_frame(frame: Image.Image, native_dpi: int, dpi: int, ocr: Callable, lang: str):
+    """Decode the current frame of a multi-page image and run ocr(image, lang) on it.
+
+    Frames are only ever downscaled (to dpi), never upscaled past the scan resolution.
+    Only this one decoded frame is held in memory.
+    """
+    with _timed("render"):
+        image = frame.convert("L" if frame.mode in ("1", "L", "LA", "I", "I;16") else "RGB")
+        if dpi < native_dpi:
+            scale = dpi / native_dpi
+            image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+    image.format = "PPM"
+    image.info["dpi"] = (min(dpi, native_dpi),) * 2
+    try:
+        with _timed("ocr"):
+            return ocr(image, lang)
+    finally:
+        del image
+
+
+def _data_to_text(data: dict) -> str:
+    """Rebuild plain text from image_to_data output: words -> lines -> paragraphs."""
+    paragraphs: List[List[str]] = []
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    order: List[Tuple[int, int, int]] = []
+    for i, word in enumerate(data.get("text", [])):
+        word = str(word).strip()
+        if not word:
             continue
-        pix = page.get_pixmap(dpi=300)
-        img_bytes = pix.tobytes("png")
-        image = Image.open(BytesIO(img_bytes))
-        if image.mode not in ("L", "RGB"):
-            image = image.convert("RGB")
-        parts.append(pytesseract.image_to_string(image, lang=lang))
-    doc.close()
-    return "\n\n".join(p.strip() for p in parts if p and p.strip()) 
\ No newline at end of file
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        if key not in lines:
+            lines[key] = []
+            order.append(key)
+        lines[key].append(word)
+    current = None
+    for key in order:
+        if key[:2] != current:
+            paragraphs.append([])
+            current = key[:2]
+        paragraphs[-1].append(" ".join(lines[key]))
+    return "\n\n".join("\n".join(p) for p in paragraphs)
+
+
+def _mean_confidence(data: dict) -> Optional[float]:
+    confs = [
+        float(c) for c, w in zip(data.get("conf", []), data.get("text", []))
+        if str(w).strip() and float(c) >= 0
+    ]
+    return round(sum(confs) / len(confs), 1) if confs else None
+
+
+def _ocr_with_confidence(image: Image.Image, lang: str, deadline: Optional[float] = None) -> Tuple[str, Optional[float]]:
+    return get_backend().image_to_data(image, lang, timeout=_remaining(deadline))
+
+
+def _ocr_plain(image: Image.Image, lang: str, deadline: Optional[float] = None) -> str:
+    return get_backend().image_to_string(image, lang, timeout=_remaining(deadline))
+
+
+def _ocr_pass(render: Callable, index: int, dpi: int, lang: str, deadline: Optional[float]) -> PageResult:
+    text, confidence = render(dpi, partial(_ocr_with_confidence, deadline=deadline), lang)
+    return PageResult(index=index, text=text, dpi=dpi, confidence=confidence, lang=lang)
+
+
+def _low_confidence(result: PageResult) -> bool:
+    return result.confidence is None or result.confidence < settings.ocr_confidence_threshold
+
+
+def _better(current: PageResult, candidate: PageResult) -> PageResult:
+    if current.confidence is None or (candidate.confidence is not None and candidate.confidence >= current.confidence):
+        return candidate
+    return current
+
+
+def _ocr_page(render: Callable, index: int, lang: str, max_dpi: Optional[int] = None,
+              deadline: Optional[float] = None, fallback_lang: Optional[str] = None) -> PageResult:
+    """OCR an image-only page; render(dpi, ocr, lang) rasterizes it and returns ocr's result.
+
+    In adaptive mode the page is first rendered at ocr_low_dpi and only re-rendered
+    at ocr_high_dpi when tesseract's mean word confidence is below the threshold.
+    max_dpi caps both for sources with a fixed resolution (scanned image frames).
+    With fallback_lang (lang="auto"), a low-confidence first pass is retried with
+    that combined model before the DPI is raised; the better result is kept.
+
+    Raises OcrTimeout if the first pass misses the deadline; a timed-out retry
+    keeps the result so far, marked "degraded".
+    """
+    high = min(settings.ocr_high_dpi, max_dpi) if max_dpi else settings.ocr_high_dpi
+    if not settings.ocr_confidence_check:
+        text = render(high, partial(_ocr_plain, deadline=deadline), lang)
+        return PageResult(index=index, text=text, dpi=high, lang=lang)
+
+    low = min(settings.ocr_low_dpi, high)
+    result = _ocr_pass(render, index, low, lang, deadline)
+    retries = []
+    if fallback_lang and fallback_lang != lang:
+        retries.append(lambda: _ocr_pass(render, index, low, fallback_lang, deadline))
+    if high > low:
+        # render lại với model cho kết quả tốt hơn ở bước trước
+        retries.append(lambda: _ocr_pass(render, index, high, result.lang, deadline))
+    for retry in retries:
+        if not _low_confidence(result):
+            break
+        try:
+            result = _better(result, retry())
+        except OcrTimeout as e:
+            result.status = "degraded"
+            result.error = str(e)
+            break
+    return result
+
+
+def _pick_lang(text: str) -> Optional[str]:
+    """Single model for text that is clearly one language, if it is part of ocr_auto_langs."""
+    lang = detect_language(text)
+    return lang if lang in settings.ocr_auto_langs.split("+") else None
+
+
+def _ocr_probe(image: Image.Image, lang: str, deadline: Optional[float] = None) -> str:
+    """OCR only a band of the page: a few lines are enough to tell the language."""
+    band = image.crop((0, int(image.height * _PROBE_BAND[0]), image.width, int(image.height * _PROBE_BAND[1])))
+    band.format = "PPM"
+    band.info["dpi"] = image.info.get("dpi")
+    return _ocr_plain(band, lang, deadline)
+
+
+def _resolve_lang(lang: str, render: Callable, max_dpi: Optional[int] = None, deadline: Optional[float] = None,
+                  hint: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """(model for the first pass, fallback model) for a page.
+
+    Explicit languages are used as given. For lang="auto" the page's language
+    comes from hint (text layer of a nearby page) or else from a probe: a band of
+    the page OCR'd at ocr_probe_dpi with the first model of ocr_auto_langs. A
+    clear answer runs that single model with ocr_auto_langs as fallback; mixed or
+    unclear pages go straight to ocr_auto_langs.
+    """
+    if lang != LANG_AUTO:
+        return lang, None
+    combined = settings.ocr_auto_langs
+    if hint is None:
+        dpi = min(settings.ocr_probe_dpi, max_dpi) if max_dpi else settings.ocr_probe_dpi
+        hint = _pick_lang(render(dpi, partial(_ocr_probe, deadline=deadline), combined.split("+")[0]))
+    return (hint, combined) if hint and hint != combined else (combined, None)
+
+
+def _ocr_regions(page: "fitz.Page", index: int, lang: str, layer: TextLayerAssessment,
+                 deadline: Optional[float] = None) -> PageResult:
+    """Keep the page's text layer and OCR only the image regions it does not cover.
+
+    Text blocks and OCR'd regions are merged in reading order (top to bottom, left to right).
+    Regions that run out of time are left out and the page is marked "degraded".
+    """
+    items = [(b[1], b[0], b[4].strip()) for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+    dpis, confidences, errors = [], [], []
+    # lang="auto": vùng ảnh quá nhỏ để dò, dùng ngôn ngữ của chính text layer trang này
+    lang, fallback = _resolve_lang(lang, None, hint=_pick_lang(layer.text) or settings.ocr_auto_langs)
+    for rect in layer.regions:
+        try:
+            region = _ocr_page(partial(_ocr_rendered, page, clip=rect), index, lang, deadline=deadline,
+                               fallback_lang=fallback)
+        except OcrTimeout as e:
+            errors.append(str(e))
+            continue
+        items.append((rect.y0, rect.x0, region.text.strip()))
+        dpis.append(region.dpi)
+        if region.status != "ok":
+            errors.append(region.error)
+        if region.confidence is not None:
+            confidences.append(region.confidence)
+    items.sort(key=lambda item: (item[0], item[1]))
+    return PageResult(
+        index=index,
+        text="\n".join(text for _, _, text in items if text),
+        source="ocr_regions",
+        dpi=max(dpis) if dpis else None,
+        confidence=round(sum(confidences) / len(confidences), 1) if confidences else None,
+        quality=layer.quality,
+        lang=lang,
+        status="degraded" if errors else "ok",
+        error=errors[0] if errors else None,
+    )
+
+
+@_with_timings
+def _ocr_pdf_plan(page: "fitz.Page", index: int, lang: str, layer: TextLayerAssessment,
+                  doc_deadline: Optional[float] = None, hint: Optional[str] = None) -> PageResult:
+    deadline = _page_deadline(doc_deadline)
+    if layer.decision == "ocr_regions":
+        return _ocr_regions(page, index, lang, layer, deadline)
+    quality = layer.quality if layer.text else None
+    render = partial(_ocr_rendered, page)
+    try:
+        lang, fallback = _resolve_lang(lang, render, deadline=deadline, hint=hint)
+        result = _ocr_page(render, index, lang, deadline=deadline, fallback_lang=fallback)
+    except OcrTimeout as e:
+        if layer.text:
+            # Hết thời gian: dùng tạm text layer chất lượng thấp còn hơn bỏ trống trang
+            return PageResult(index=index, text=layer.text, source="text", quality=quality,
+                              status="degraded", error=str(e))
+        return _failed_page(index, e, quality=quality)
+    result.quality = quality
+    return result
+
+
+def _ocr_pdf_page(pdf_path: str, index: int, lang: str, doc_deadline: Optional[float] = None,
+                  hint: Optional[str] = None) -> PageResult:
+    """Worker entry point: fitz documents can't be pickled, so each task reopens the
+    file (and re-assesses the page, which is cheap next to OCR)."""
+    with fitz.open(pdf_path) as doc:
+        page = doc[index]
+        return _ocr_pdf_plan(page, index, lang, assess_page(page), doc_deadline, hint)
+
+
+def _ocr_image_page(image: Image.Image, index: int, lang: str, deadline: Optional[float] = None) -> PageResult:
+    """OCR the current frame of an image, never above its scan resolution.
+
+    With preprocessing enabled the frame is decoded, downscaled, cropped and
+    deskewed once here, and every OCR pass works on that smaller image.
+    """
+    native = _frame_dpi(image)
+    steps = enabled_steps()
+    if steps:
+        with _timed("render"):
+            image, native = prepare_image(image, steps)
+    render = partial(_ocr_frame, image, native)
+    lang, fallback = _resolve_lang(lang, render, native, deadline)
+    return _ocr_page(render, index, lang, max_dpi=native, deadline=deadline, fallback_lang=fallback)
+
+
+@_with_timings
+def _ocr_tiff_frame(image: Image.Image, index: int, lang: str, doc_deadline: Optional[float] = None) -> PageResult:
+    image.seek(index)  # only walks the IFD chain; pixels are decoded in _ocr_frame
+    try:
+        return _ocr_image_page(image, index, lang, _page_deadline(doc_deadline))
+    except OcrTimeout as e:
+        return _failed_page(index, e)
+
+
+def _ocr_tiff_page(tiff_path: str, index: int, lang: str, doc_deadline: Optional[float] = None,
+                   hint: Optional[str] = None) -> PageResult:
+    """Worker entry point for one frame of a multi-page TIFF (no text layer, so hint is unused)."""
+    with Image.open(tiff_path) as image:
+        return _ocr_tiff_frame(image, index, lang, doc_deadline)
+
+
+def join_pages(pages: List[PageResult]) -> str:
+    return "\n\n".join(p.text.strip() for p in pages if p.text and p.text.strip())
+
+
+def extract_text_from_pdf(
+    pdf_path: str,
+    lang: Optional[str] = None,
+    workers: Optional[int] = None,
+    doc_hash: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> str:
+    return join_pages(extract_pages_from_pdf(pdf_path, lang=lang, workers=workers, doc_hash=doc_hash, timeout=timeout))
+
+
+def extract_pages_from_pdf(
+    pdf_path: str,
+    lang: Optional[str] = None,
+    workers: Optional[int] = None,
+    doc_hash: Optional[str] = None,
+    timeout: Optional[float] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    max_pages: Optional[int] = None,
+) -> List[PageResult]:
+    """OCR a PDF page by page (only the first max_pages pages if given).
+
+    Each page's text layer is scored first (see app.core.text_layer): a good layer
+    is used as is, a broken one is replaced by OCR, and image regions the layer
+    does not cover are OCR'd on their own. The decision is kept in PageResult.source.
+
+    With doc_hash, every OCR'd page is checkpointed as soon as it finishes, so a
+    retry after a crash or timeout only OCRs the pages that are still missing.
+
+    Every page gets ocr_page_timeout_seconds and the whole document timeout
+    seconds (default settings.ocr_timeout_seconds); pages that overrun come back
+    "degraded" or "failed" instead of failing the document. should_stop is polled
+    between pages and raises OcrCancelled when it returns True.
+
+    With lang="auto", scanned pages take their language from the usable text
+    layer of a page at most ocr_lang_hint_pages away, or probe it (see _resolve_lang).
+    """
+    lang = lang or settings.default_lang
+    workers = settings.ocr_workers if workers is None else workers
+    doc_deadline = document_deadline(timeout)
+    checkpoint = _checkpoint_dir(doc_hash, lang) if doc_hash else None
+    done = _load_checkpoints(checkpoint) if checkpoint else {}
+    with fitz.open(pdf_path) as doc:
+        count = doc.page_count if max_pages is None else min(max_pages, doc.page_count)
+        parts = [None] * count
+        pending = []
+        plans: Dict[int, TextLayerAssessment] = {}
+        layer_langs: Dict[int, Optional[str]] = {}
+        for index in range(count):
+            page = doc[index]
+            timer = StageTimer()
+            with timer.stage("render"):
+                layer = assess_page(page)
+                if lang == LANG_AUTO and layer.decision != "ocr":
+                    layer_langs[index] = _pick_lang(layer.text)
+            if layer.decision == "text":
+                parts[index] = PageResult(index=index, text=layer.text, source="text", quality=layer.quality,
+                                          timings=timer.to_dict())
+            elif index in done:
+                parts[index] = done[index]
+            else:
+                pending.append(index)
+                plans[index] = layer
+        hints = {index: _nearest_hint(layer_langs, index) for index in pending} if layer_langs else {}
+        if not _use_pool(workers, pending):
+            _ocr_sequential(parts, pending, checkpoint, should_stop,
+                            lambda index: _ocr_pdf_plan(doc[index], index, lang, plans[index], doc_deadline,
+                                                        hints.get(index)))
+            return parts
+    _ocr_parallel(parts, pending, checkpoint, should_stop, workers, _ocr_pdf_page, pdf_path, lang, doc_deadline, hints)
+    return parts
+
+
+def _nearest_hint(layer_langs: Dict[int, Optional[str]], index: int) -> Optional[str]:
+    """Language of the closest page with a usable text layer, within ocr_lang_hint_pages."""
+    for distance in range(1, settings.ocr_lang_hint_pages + 1):
+        for neighbour in (index - distance, index + distance):
+            if layer_langs.get(neighbour):
+                return layer_langs[neighbour]
+    return None
+
+
+def extract_pages_from_tiff(
+    tiff_path: str,
+    lang: Optional[str] = None,
+    workers: Optional[int] = None,
+    doc_hash: Optional[str] = None,
+    timeout: Optional[float] = None,
+    should_stop: Optional[Callable[[], bool]] = None,
+    max_pages: Optional[int] = None,
+) -> List[PageResult]:
+    """OCR a (multi-page) TIFF frame by frame, with the same checkpointing,
+    parallelism, time budgets, cancellation and max_pages as extract_pages_from_pdf.
+    Frames are decoded one at a time."""
+    lang = lang or settings.default_lang
+    workers = settings.ocr_workers if workers is None else workers
+    doc_deadline = document_deadline(timeout)
+    checkpoint = _checkpoint_dir(doc_hash, lang) if doc_hash else None
+    done = _load_checkpoints(checkpoint) if checkpoint else {}
+    with Image.open(tiff_path) as image:
+        count = getattr(image, "n_frames", 1)
+        if max_pages is not None:
+            count = min(max_pages, count)
+        parts = [done.get(index) for index in range(count)]
+        pending = [index for index in range(count) if parts[index] is None]
+        if not _use_pool(workers, pending):
+            _ocr_sequential(parts, pending, checkpoint, should_stop,
+                            lambda index: _ocr_tiff_frame(image, index, lang, doc_deadline))
+            return parts
+    _ocr_parallel(parts, pending, checkpoint, should_stop, workers, _ocr_tiff_page, tiff_path, lang, doc_deadline)
+    return parts
+
+
+def _use_pool(workers: int, pending: List[int]) -> bool:
+    return workers > 1 and len(pending) > 1
+
+
+def _keep(checkpoint: Optional[str], result: PageResult) -> None:
+    # Trang hết thời gian không được lưu, lần chạy lại sẽ OCR lại
+    if checkpoint and result.status == "ok":
+        _save_checkpoint(checkpoint, result)
+
+
+def _ocr_sequential(parts: List[Optional[PageResult]], pending: List[int], checkpoint: Optional[str],
+                    should_stop: Optional[Callable[[], bool]], ocr_index: Callable[[int], PageResult]) -> None:
+    for index in pending:
+        if should_stop is not None and should_stop():
+            raise OcrCancelled(f"cancelled before page {index + 1}")
+        parts[index] = ocr_index(index)
+        _keep(checkpoint, parts[index])
+
+
+def _ocr_parallel(parts: List[Optional[PageResult]], pending: List[int], checkpoint: Optional[str],
+                  should_stop: Optional[Callable[[], bool]], workers: int, task: Callable, path: str,
+                  lang: str, doc_deadline: Optional[float], hints: Optional[Dict[int, str]] = None) -> None:
+    """Run task(path, index, lang, doc_deadline, hint) for the pending pages on the shared process pool.
+
+    On cancellation, pages not started yet are dropped and the call returns right
+    away; pages already running finish in the background (bounded by their timeout).
+    """
+    pool = _get_pool(workers)
+    hints = hints or {}
+    futures = {pool.submit(task, path, index, lang, doc_deadline, hints.get(index)): index for index in pending}
+    running = set(futures)
+    errors = []
+    # Lưu từng trang ngay khi xong; trang lỗi không làm mất các trang khác
+    while running:
+        if should_stop is not None and should_stop():
+            for future in running:
+                future.cancel()
+            raise OcrCancelled(f"cancelled with {len(running)} pages left")
+        finished, running = wait(running, timeout=_CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+        for future in finished:
+            index = futures[future]
+            try:
+                parts[index] = future.result()
+            except Exception as e:
+                errors.append(e)
+                continue
+            _keep(checkpoint, parts[index])
+    if errors:
+        raise errors[0]
@@ -0,0 +1,139 @@
+"""Content-addressed OCR result cache.
+
+Entries are keyed by (SHA-256 of the uploaded file, lang, OCR engine version), so
+re-uploading the same file skips OCR. The cache is bounded by total text size and
+evicts least-recently-used entries; hit/miss/eviction counters live in the DB so
+every worker process contributes to the same numbers.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.ocr import engine_version
+from app.db import models
+
+
+def cache_key(file_hash: str, lang: str, version: str) -> str:
+    return f"{file_hash}:{lang}:{version}"
+
+
+def _bump(db: Session, **deltas: int) -> None:
+    updated = (
+        db.query(models.OcrCacheStats)
+        .filter(models.OcrCacheStats.id == 1)
+        .update({getattr(models.OcrCacheStats, k): getattr(models.OcrCacheStats, k) + v for k, v in deltas.items()},
+                synchronize_session=False)
+    )
+    if not updated:
+        counters = {"hits": 0, "misses": 0, "evictions": 0}
+        counters.update(deltas)
+        db.add(models.OcrCacheStats(id=1, **counters))
+
+
+def get_cached_result(db: Session, file_hash: Optional[str], lang: str) -> Optional[Tuple[str, List[dict]]]:
+    """Return (text, per-page OCR metadata) for a file OCR'd before, or None."""
+    if not file_hash or settings.ocr_cache_max_mb <= 0:
+        return None
+    key = cache_key(file_hash, lang, engine_version())
+    entry = db.query(models.OcrCacheEntry).filter(models.OcrCacheEntry.cache_key == key).first()
+    if entry is None:
+        _bump(db, misses=1)
+        db.commit()
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.now()
+    _bump(db, hits=1)
+    db.commit()
+    return entry.text, entry.pages_json or []
+
+
+def is_cached(db: Session, file_hash: Optional[str], lang: str) -> bool:
+    """Whether get_cached_result would hit, without counting a hit or miss."""
+    if not file_hash or settings.ocr_cache_max_mb <= 0:
+        return False
+    key = cache_key(file_hash, lang, engine_version())
+    return db.query(models.OcrCacheEntry.id).filter(models.OcrCacheEntry.cache_key == key).first() is not None
+
+
+def store_result(db: Session, file_hash: Optional[str], lang: str, text: str, pages: Optional[List[dict]] = None) -> None:
+    """Cache an OCR result. The cache is only an optimisation: a database error here is
+    logged and rolled back, never raised, so it cannot fail the ingestion."""
+    if not file_hash or settings.ocr_cache_max_mb <= 0:
+        return
+    version = engine_version()
+    key = cache_key(file_hash, lang, version)
+    try:
+        if db.query(models.OcrCacheEntry.id).filter(models.OcrCacheEntry.cache_key == key).first():
+            return
+        db.add(models.OcrCacheEntry(
+            cache_key=key,
+            file_hash=file_hash,
+            lang=lang,
+            engine_version=version,
+            text=text,
+            pages_json=pages,
+            size_bytes=len(text.encode("utf-8")),
+            hits=0,
+            last_used_at=datetime.now(),
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # another worker cached the same file first
+            db.rollback()
+            return
+        evict(db)
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"OCR cache write error for {file_hash[:12]}: {str(e)}")
+
+
+def evict(db: Session, max_bytes: Optional[int] = None) -> int:
+    """Drop least-recently-used entries until the cache fits in max_bytes."""
+    max_bytes = settings.ocr_cache_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    total = db.query(func.coalesce(func.sum(models.OcrCacheEntry.size_bytes), 0)).scalar()
+    removed = 0
+    while total > max_bytes:
+        oldest = (
+            db.query(models.OcrCacheEntry.id, models.OcrCacheEntry.size_bytes)
+            .order_by(models.OcrCacheEntry.last_used_at, models.OcrCacheEntry.id)
+            .limit(100)
+            .all()
+        )
+        if not oldest:
+            break
+        ids = []
+        for entry_id, size in oldest:
+            ids.append(entry_id)
+            total -= size
+            if total <= max_bytes:
+                break
+        db.query(models.OcrCacheEntry).filter(models.OcrCacheEntry.id.in_(ids)).delete(synchronize_session=False)
+        removed += len(ids)
+    if removed:
+        _bump(db, evictions=removed)
+    db.commit()
+    return removed
+
+
+def cache_stats(db: Session) -> Dict[str, float]:
+    row = db.query(models.OcrCacheStats).filter(models.OcrCacheStats.id == 1).first()
+    hits = row.hits if row else 0
+    misses = row.misses if row else 0
+    entries, size = db.query(
+        func.count(models.OcrCacheEntry.id),
+        func.coalesce(func.sum(models.OcrCacheEntry.size_bytes), 0),
+    ).one()
+    return {
+        "hits": hits,
+        "misses": misses,
+        "evictions": row.evictions if row else 0,
+        "hit_rate": round(100.0 * hits / (hits + misses), 1) if hits + misses else 0.0,
+        "entries": entries,
+        "size_bytes": int(size),
+        "max_bytes": settings.ocr_cache_max_mb * 1024 * 1024,
+    }
@@ -1,102 +1,695 @@
+"""Rule-based extraction of contract fields from OCR text.
+
+All patterns are compiled once at import. parse_contract_text splits the text
+into lines a single time (_Text) and every extractor reads that shared view:
+title, type and amount labels work line by line, while parties, dates, amounts,
+clauses and signatures, which may cross line breaks, are searched in the full
+text. Parties are found with one combined pattern in a single scan, and
+signatures from one scan for keyword offsets followed by a proximity merge.
+
+Besides the amount as written, the amount is normalized to an integer and a
+currency (amount_value, amount_currency): Vietnamese separators ("1.250.000,50"),
+scale words ("1,5 tỷ đồng") and amounts in words ("Bằng chữ: Một tỷ hai trăm
+triệu đồng") are understood, with the currency written after the figure or
+before it ("USD 25,000"); without one the currency is left empty. Likewise the
+term of the contract is resolved to ISO dates (effective_on, expiration_date)
+and an ISO 8601 duration ("P12M"): from "có hiệu lực từ ngày ...", "từ ngày ...
+đến ngày ...", "hết hạn ngày ...", or the start (the signing date "Hôm nay, ngày
+..." by default, never a date on a "Căn cứ" line) plus "thời hạn 12 tháng", the
+term ending the day before the same date one term later. Only the head, the tail
+and the lines around "hiệu lực" / "thời hạn" / "hết hạn" are searched for the term.
+
+segment_clauses, called next to parse_contract_text by ingestion, splits the
+text into "Điều N" clauses with character offsets and a category
+(CLAUSE_CATEGORIES) for the contract_clauses table.
+"""
+import calendar
+import functools
+import heapq
 import re
-from typing import Dict, List, Optional
+import unicodedata
+from datetime import date, timedelta
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from itertools import chain, islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Bump whenever a change to the rules can change the result for some text (including
+# segment_clauses, stored in contract_clauses, and the type classification of
+# app.core.classifier); contracts stored with an older version (or none) are
+# re-parsed by python -m app.reparse
+PARSER_VERSION = 9
+
+_TITLE = re.compile(r"\bH\s*Ợ\s*P\s*\s*Đ\s*Ồ\s*N\s*G\b|HOP DONG|HỢP ĐỒNG", re.IGNORECASE)
+_TITLE_LINES = 20
+
+# Checked in this order, the first type whose pattern occurs in the head wins
+_TYPES = [
+    ("mua_ban", re.compile(r"MUA\s*BÁN|MUA BAN", re.IGNORECASE)),
+    ("lao_dong", re.compile(r"LAO\s*ĐỘNG|LAO DONG", re.IGNORECASE)),
+    ("dich_vu", re.compile(r"DỊCH\s*VỤ|DICH VU", re.IGNORECASE)),
+    ("thue", re.compile(r"THUÊ|THUE|CHO\s*THUÊ|CHO THUE", re.IGNORECASE)),
+    ("hop_tac", re.compile(r"HỢP\s*TÁC|HOP TAC|LIÊN\s*KẾT|LIEN KET", re.IGNORECASE)),
+    ("bao_mat", re.compile(r"BẢO\s*MẬT|BAO MAT|NDA|NON-DISCLOSURE", re.IGNORECASE)),
+    ("nguyen_tac", re.compile(r"NGUYÊN\s*TẮC|NGUYEN TAC|KHUNG HỢP ĐỒNG|KHUNG HOP DONG", re.IGNORECASE)),
+]
+_TYPE_LINES = 60
+
+# One named group per party; no two of them can match at the same position
+_PARTY_PATTERNS = [
+    ("ben_a", r"B\s*Ê\s*N\s*A\b|Bên\s*A\b|Ben\s*A\b"),
+    ("ben_b", r"B\s*Ê\s*N\s*B\b|Bên\s*B\b|Ben\s*B\b"),
+    ("ben_mua", r"Bên\s*Mua\b|Ben\s*Mua\b"),
+    ("ben_ban", r"Bên\s*Bán\b|Ben\s*Ban\b"),
+]
+_PARTIES = re.compile("|".join(f"(?P<{key}>{pat})" for key, pat in _PARTY_PATTERNS), re.IGNORECASE)
+_PARTY_WINDOW = 1000  # a party block ends at the first blank line within this many characters
+
+_DATE_WORDS = re.compile(r"ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})", re.IGNORECASE)
+_DATE_NUMERIC = re.compile(r"\b(\d{1,2}[/-]\d{1,2}[/-]\d{4})\b")
+# Term patterns run on the lowercased text without IGNORECASE, several times faster
+# for Vietnamese; every alternative starts with a fixed word so the scan can skip ahead.
+# Day, month, year: "ngày 12 tháng 3 năm 2024", "12/03/2024", "ngày 12-03-2024"
+_DATE_FORMS = r"(?:ngày\s*)?(\d{1,2})\s*(?:tháng|[/.-])\s*(\d{1,2})\s*(?:năm|[/.-])\s*(\d{4})"
+_DATE_ANY = re.compile(_DATE_FORMS)
+_TERM_RANGE = re.compile(r"từ\s*" + _DATE_FORMS + r"[\s,]*(?:đến|tới)\s*(?:hết\s*)?" + _DATE_FORMS)
+# "có hiệu lực (kể) từ ngày", "ngày hiệu lực:", "bắt đầu từ"
+_EFFECTIVE = re.compile(r"(?:hiệu\s*lực\s*(?:kể\s*)?(?:từ|:)|bắt\s*đầu\s*(?:từ|vào))\s*" + _DATE_FORMS)
+# "có hiệu lực đến hết ngày", "(ngày) hết hạn:", "(ngày) kết thúc vào"
+_EXPIRATION = re.compile(
+    r"(?:hiệu\s*lực\s*(?:đến|tới)\s*(?:hết\s*)?|hết\s*hạn\s*(?:vào\s*)?:?|kết\s*thúc\s*(?:vào\s*)?:?)\s*" + _DATE_FORMS
+)
+# Signing date: "Hôm nay, ngày 05 tháng 03 năm 2024", "được lập (tại Hà Nội) ngày ...", "ký ngày ..."
+_SIGNED = re.compile(
+    r"(?:hôm\s*nay|lập|ký(?:\s*kết)?)(?:\s*tại\s[^\n,]{0,60}?)?[\s,]*(?:vào\s*)?" + _DATE_FORMS
+)
+# "Căn cứ Bộ luật Dân sự ... ngày 24 tháng 11 năm 2015": dates of the laws a contract is based on
+_LEGAL_BASIS = re.compile(r"[ \t]*(?:căn\s*cứ|can\s*cu)\b")
+_TERM_HEAD_LINES = 40  # where the signing date, or else an unlabelled date, is looked for
+# The term is only looked for in the head, the tail ("lập ngày ..." before the
+# signatures) and the lines around "hiệu lực" / "thời hạn" / "hết hạn", found by
+# single-word scans (a fixed prefix is the only fast regex scan); overlapping spans merge
+_TERM_TAIL_LINES = 20
+_TERM_ANCHORS = (re.compile("lực"), re.compile("hạn"))
+_TERM_WINDOW = 160  # characters after an anchor
+# "thời hạn hợp đồng là 12 (mười hai) tháng", "thời hạn hai năm"; not "thời hạn thanh toán"
+_DURATION = re.compile(
+    r"thời\s*hạn(?:\s*(?:của|hợp\s*đồng|thực\s*hiện|hiệu\s*lực|là|:))*\s*"
+    r"(\d{1,3}|[^\W\d_]+(?:\s+[^\W\d_]+){0,3}?)\s*(?:\([^)\n]{0,40}\)\s*)?(tháng|năm|ngày)\b"
+)
+_DURATION_UNITS = {"tháng": "M", "năm": "Y", "ngày": "D"}
+
+_AMOUNT_LABEL = re.compile(r"Giá\s*trị\s*hợp\s*đồng|Tổng\s*giá\s*trị", re.IGNORECASE)
+_AMOUNT_IN_LINE = re.compile(r"([0-9]{1,3}(?:[\.,][0-9]{3})*(?:[\.,][0-9]+)?)(\s*(VNĐ|VND|đ|đồng))?")
+_AMOUNT_ANY = re.compile(r"([0-9]{1,3}(?:[\.,][0-9]{3})+(?:[\.,][0-9]+)?)\s*(?:VNĐ|VND|đ|đồng)?")
+# What may follow the figure: a scale word, then a currency
+_AMOUNT_TAIL = re.compile(
+    r"\s*(?P<scale>tỷ|tỉ|triệu|nghìn|ngàn)?\s*(?P<currency>VNĐ|VND|đồng|đ\b|USD|US\$|\$|EUR|€)?", re.IGNORECASE
+)
+# Or a currency code or symbol right before it: "USD 25,000", "US$ 25.000", "€1.500"
+_AMOUNT_HEAD = re.compile(r"(?<![^\W\d_])(?P<currency>VNĐ|VND|USD|US\$|\$|EUR|€)\s*$", re.IGNORECASE)
+_AMOUNT_HEAD_CHARS = 8  # how far before the figure _AMOUNT_HEAD looks
+_AMOUNT_WORDS = re.compile(r"bằng\s*chữ\s*:?\s*([^\n()]+)", re.IGNORECASE)
+# amount_value after a label: a whole figure ("1250000000" is not cut into "125", "000"...)
+# that is an amount only with thousands separators, a scale word or a currency, so clause
+# numbers ("Điều 2. Giá trị hợp đồng"), percentages and counts are skipped
+_VALUE_FIGURE = re.compile(r"(?<![\w.,])(\d+(?:[.,]\d+)*)")
+_THOUSANDS = re.compile(r"\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*(?:[.,]\d+)?")
+_SCALES = {"tỷ": 10**9, "tỉ": 10**9, "triệu": 10**6, "nghìn": 1000, "ngàn": 1000}
+_CURRENCIES = {"vnđ": "VND", "vnd": "VND", "đồng": "VND", "đ": "VND", "usd": "USD", "us$": "USD", "$": "USD",
+               "eur": "EUR", "€": "EUR"}
+_MAX_AMOUNT = 10**18  # fits a BIGINT column; anything larger is an OCR artefact
+# Number words without diacritics ("mười" and "mươi" both become "muoi": ten, or times ten after a digit)
+_DIGIT_WORDS = {"khong": 0, "mot": 1, "hai": 2, "ba": 3, "bon": 4, "tu": 4, "nam": 5, "lam": 5,
+                "sau": 6, "bay": 7, "tam": 8, "chin": 9}
+_WORD_SCALES = {"nghin": 1000, "ngan": 1000, "trieu": 10**6}
+# Words a number in running text can start with ("tư", "lăm" only follow "mươi": "từ" is not four)
+_LEADING_NUMBER_WORDS = (set(_DIGIT_WORDS) - {"tu", "lam"}) | {"muoi"}
+_WORD_BILLION = ("ty", "ti")
+
+_CLAUSE = re.compile(r"(Điều\s+\d+[^\n]*)", re.IGNORECASE)
+_MAX_CLAUSES = 50
 
+# segment_clauses: a heading is "Điều N" at the start of a line, unlike a reference
+# in the running text ("theo Điều 5"); its number may skip at most
+# _CLAUSE_NUMBER_GAP numbers (headings lost by OCR), larger jumps are references too
+_CLAUSE_HEADING = re.compile(r"^[ \t]*((?:Điều|Dieu)[ \t]+(\d{1,3})\b[^\n]*)", re.IGNORECASE | re.MULTILINE)
+_CLAUSE_NUMBER_GAP = 3
+_HEADING_CHARS = 255
+_EXCERPT_CHARS = 500
 
-def _extract_title(text: str) -> Optional[str]:
-    lines = [l.strip() for l in text.splitlines() if l.strip()]
-    for i, line in enumerate(lines[:20]):
-        if re.search(r"\bH\s*Ợ\s*P\s*\s*Đ\s*Ồ\s*N\s*G\b|HOP DONG|HỢP ĐỒNG", line, flags=re.IGNORECASE):
+# (category, label, keywords) in priority order: the first category with a keyword
+# in the heading (whole words, without diacritics) wins, so "Giá trị hợp đồng và
+# phương thức thanh toán" is thanh_toan; no keyword gives "khac"
+CLAUSE_CATEGORIES = [
+    ("thanh_toan", "Thanh toán", ("thanh toan",)),
+    ("gia_tri", "Giá trị hợp đồng", ("gia tri", "gia ca", "don gia", "gia hop dong")),
+    ("doi_tuong", "Đối tượng / phạm vi", ("doi tuong", "noi dung", "pham vi", "hang hoa", "san pham")),
+    ("giao_nhan", "Giao nhận / nghiệm thu", ("giao hang", "giao nhan", "van chuyen", "ban giao", "nghiem thu")),
+    ("bao_hanh", "Bảo hành", ("bao hanh",)),
+    ("bao_mat", "Bảo mật", ("bao mat",)),
+    ("vi_pham", "Vi phạm / bồi thường", ("vi pham", "boi thuong")),
+    ("bat_kha_khang", "Bất khả kháng", ("bat kha khang",)),
+    ("cham_dut", "Chấm dứt / thanh lý", ("cham dut", "thanh ly", "don phuong")),
+    ("tranh_chap", "Giải quyết tranh chấp", ("tranh chap", "luat ap dung")),
+    ("thoi_han", "Thời hạn / hiệu lực", ("thoi han", "hieu luc", "thoi gian")),
+    ("quyen_nghia_vu", "Quyền và nghĩa vụ", ("quyen", "nghia vu", "trach nhiem")),
+    ("dieu_khoan_chung", "Điều khoản chung", ("dieu khoan chung", "cam ket", "dieu khoan cuoi")),
+]
+
+# Signature keywords and the parties they belong to; a party counts as signed when a
+# keyword ends at most _SIGN_WINDOW characters before the party starts, or the other way round.
+# The lookahead lists every possible first letter (case-folded), so the scan skips
+# ordinary text with a cheap character test instead of trying each alternative.
+_SIGN_KEYWORDS = re.compile(
+    r"(?=[ĐDKCB])(?:"
+    r"(?P<sign>Đại\s*diện|Dai\s*dien|Ký\s*tên|Ky\s*ten|Chữ\s*ký|Chu\s*ky|Đóng\s*dấu|Dong\s*dau)"
+    r"|(?P<ben_a>BÊN\s*A|Bên\s*A|Ben\s*A)"
+    r"|(?P<ben_b>BÊN\s*B|Bên\s*B|Ben\s*B))",
+    re.IGNORECASE,
+)
+_SIGN_WINDOW = 120
+# A keyword near a party mention, and a party mention near a keyword
+_SIGN_PARTNERS = {"sign": ("ben_a", "ben_b"), "ben_a": ("sign",), "ben_b": ("sign",)}
+
+
+class _Text:
+    """The text and its lines, split once and shared by all extractors."""
+
+    __slots__ = ("text", "lines")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.splitlines()
+
+
+def _extract_title(doc: _Text) -> Optional[str]:
+    seen = 0
+    for line in doc.lines:
+        line = line.strip()
+        if not line:
+            continue
+        if _TITLE.search(line):
             return line
+        seen += 1
+        if seen == _TITLE_LINES:
+            break
     return None
 
 
-def _detect_type(text: str) -> Dict[str, Optional[str]]:
-    candidates = [l.upper() for l in text.splitlines()[:60] if l.strip()]
-    head = "\n".join(candidates)
-    patterns = [
-        ("mua_ban", "MUA\s*BÁN|MUA BAN"),
-        ("lao_dong", "LAO\s*ĐỘNG|LAO DONG"),
-        ("dich_vu", "DỊCH\s*VỤ|DICH VU"),
-        ("thue", "THUÊ|THUE|CHO\s*THUÊ|CHO THUE"),
-        ("hop_tac", "HỢP\s*TÁC|HOP TAC|LIÊN\s*KẾT|LIEN KET"),
-        ("bao_mat", "BẢO\s*MẬT|BAO MAT|NDA|NON-DISCLOSURE"),
-        ("nguyen_tac", "NGUYÊN\s*TẮC|NGUYEN TAC|KHUNG HỢP ĐỒNG|KHUNG HOP DONG"),
-    ]
-    for slug, pat in patterns:
-        if re.search(pat, head, flags=re.IGNORECASE):
+def _detect_type(doc: _Text) -> Dict[str, Optional[str]]:
+    head = "\n".join(l.upper() for l in doc.lines[:_TYPE_LINES] if l.strip())
+    for slug, pattern in _TYPES:
+        if pattern.search(head):
             return {"type": slug, "type_label": slug.replace("_", " ").title()}
     return {"type": "khac", "type_label": "Khác"}
 
 
-def _extract_parties(text: str) -> Dict[str, str]:
+def _extract_parties(doc: _Text) -> Dict[str, str]:
+    text = doc.text
+    starts: Dict[str, int] = {}
+    pos = 0
+    while len(starts) < len(_PARTY_PATTERNS):
+        # Resume right after the previous start, not its end: "Bên B ÊN A" holds both parties
+        m = _PARTIES.search(text, pos)
+        if m is None:
+            break
+        starts.setdefault(m.lastgroup, m.start())
+        pos = m.start() + 1
     parties = {}
-    patterns = [
-        ("ben_a", r"B\s*Ê\s*N\s*A\b|Bên\s*A\b|Ben\s*A\b", 200),
-        ("ben_b", r"B\s*Ê\s*N\s*B\b|Bên\s*B\b|Ben\s*B\b", 200),
-        ("ben_mua", r"Bên\s*Mua\b|Ben\s*Mua\b", 200),
-        ("ben_ban", r"Bên\s*Bán\b|Ben\s*Ban\b", 200),
-    ]
-    for key, pat, window in patterns:
-        m = re.search(pat, text, flags=re.IGNORECASE)
-        if m:
-            start = m.start()
-            snippet = text[start:start + 1000]
-            block = snippet.split("\n\n")[0]
-            parties[key] = block.strip()
+    for key, _ in _PARTY_PATTERNS:
+        if key in starts:
+            start = starts[key]
+            end = text.find("\n\n", start, start + _PARTY_WINDOW)
+            parties[key] = text[start:end if end >= 0 else start + _PARTY_WINDOW].strip()
     return parties
 
 
-def _extract_effective_date(text: str) -> Optional[str]:
-    m = re.search(r"ngày\s+(\d{1,2})\s+tháng\s+(\d{1,2})\s+năm\s+(\d{4})", text, flags=re.IGNORECASE)
+def _extract_effective_date(doc: _Text) -> Optional[str]:
+    m = _DATE_WORDS.search(doc.text)
     if m:
         return m.group(0)
-    m = re.search(r"\b(\d{1,2}[/-]\d{1,2}[/-]\d{4})\b", text)
+    m = _DATE_NUMERIC.search(doc.text)
     if m:
         return m.group(1)
     return None
 
 
-def _extract_amount(text: str) -> Optional[str]:
-    lines = text.splitlines()
-    for line in lines:
-        if re.search(r"Giá\s*trị\s*hợp\s*đồng|Tổng\s*giá\s*trị", line, flags=re.IGNORECASE):
-            m = re.search(r"([0-9]{1,3}(?:[\.,][0-9]{3})*(?:[\.,][0-9]+)?)(\s*(VNĐ|VND|đ|đồng))?", line)
-            if m:
-                return m.group(0)
-    candidates = re.findall(r"[0-9]{1,3}(?:[\.,][0-9]{3})+(?:[\.,][0-9]+)?\s*(?:VNĐ|VND|đ|đồng)?", text)
-    if candidates:
-        return sorted(candidates, key=lambda s: len(re.sub(r"\D", "", s)), reverse=True)[0]
+def _parse_number(figure: str) -> Optional[Decimal]:
+    """"1.250.000" -> 1250000, "12.345.678,90" -> 12345678.90, "1,5" -> 1.5.
+
+    With both separators the last one is the decimal mark; a single separator
+    followed by exactly three digits, or a repeated one, groups thousands.
+    """
+    dots, commas = figure.count("."), figure.count(",")
+    decimal_mark = None
+    if dots and commas:
+        decimal_mark = "." if figure.rfind(".") > figure.rfind(",") else ","
+    elif dots + commas == 1:
+        mark = "." if dots else ","
+        if len(figure) - figure.rfind(mark) - 1 != 3:
+            decimal_mark = mark
+    if decimal_mark:
+        whole, fraction = figure.rsplit(decimal_mark, 1)
+        whole_digits = "".join(ch for ch in whole if ch.isdigit())
+        figure = f"{whole_digits or 0}.{fraction}"
+    else:
+        figure = "".join(ch for ch in figure if ch.isdigit())
+    try:
+        return Decimal(figure)
+    except InvalidOperation:
+        return None
+
+
+def _head_currency(text: str, start: int) -> Optional[str]:
+    """Currency written right before the figure starting at start, if any."""
+    head = _AMOUNT_HEAD.search(text, max(start - _AMOUNT_HEAD_CHARS, 0), start)
+    return _CURRENCIES[head.group("currency").lower()] if head else None
+
+
+def _figure_value(text: str, figure: str, start: int, end: int) -> Tuple[Optional[int], Optional[str]]:
+    """Value and currency of the figure at text[start:end], with the scale word and unit
+    that follow it, or a currency before it; the currency is None when neither gives one."""
+    number = _parse_number(figure)
+    if number is None:
+        return None, None
+    tail = _AMOUNT_TAIL.match(text, end)
+    if tail.group("scale"):
+        number *= _SCALES[tail.group("scale").lower()]
+    if tail.group("currency"):
+        currency = _CURRENCIES[tail.group("currency").lower()]
+    else:
+        currency = _head_currency(text, start)
+    value = int(number.to_integral_value(ROUND_HALF_UP))
+    return (value, currency) if value < _MAX_AMOUNT else (None, None)
+
+
+class _Fold(dict):
+    """str.translate table: each character without its combining marks, "đ" as "d".
+
+    Filled on first use of a character, so translate runs in C for characters
+    already seen; per character this equals NFD and dropping combining marks.
+    """
+
+    def __missing__(self, code: int) -> str:
+        decomposed = unicodedata.normalize("NFD", chr(code)).replace("đ", "d")
+        folded = self[code] = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+        return folded
+
+
+_FOLD = _Fold()
+
+
+def strip_diacritics(text: str) -> str:
+    """Lowercase text without Vietnamese diacritics ("Đồng" -> "dong")."""
+    return text.lower().translate(_FOLD)
+
+
+def words_to_number(words: str) -> Optional[int]:
+    """Value of a Vietnamese amount in words ("một tỷ hai trăm năm mươi triệu đồng chẵn").
+
+    Reads from the first number word up to the first word that is not one
+    ("đồng", "chẵn"...); None if there is no (non-zero) amount.
+    """
+    total = 0  # whole billions already read
+    below_billion = 0  # millions and thousands since the last "tỷ"
+    small = 0  # 0..999 being read
+    digit = None  # a digit word not yet multiplied
+    scale = 0  # the last scale word, for "rưỡi" (and a half)
+    seen = False
+    for word in re.findall(r"\w+", strip_diacritics(words)):
+        if word in _DIGIT_WORDS:
+            if digit is not None:
+                small += digit  # "hai mươi mốt": the previous digit was a unit
+            digit = _DIGIT_WORDS[word]
+        elif word in ("muoi", "chuc"):
+            small += (1 if digit is None else digit) * 10
+            digit = None
+        elif word == "tram":
+            small += (1 if digit is None else digit) * 100
+            digit = None
+        elif word in ("linh", "le") and seen:
+            pass
+        elif word == "ruoi" and scale:
+            if scale == 10**9:
+                total += scale // 2
+            else:
+                below_billion += scale // 2
+            scale = 0
+        elif word in _WORD_SCALES:
+            scale = _WORD_SCALES[word]
+            group = small + (digit or 0)
+            if not group and 0 < below_billion < scale:
+                below_billion *= scale  # "một nghìn triệu"
+            else:
+                below_billion += (group or 1) * scale
+            small, digit = 0, None
+        elif word in _WORD_BILLION:
+            total = (total + below_billion + small + (digit or 0) or 1) * 10**9
+            below_billion, small, digit, scale = 0, 0, None, 10**9
+        elif seen:
+            break
+        else:
+            continue
+        seen = True
+    if not seen:
+        return None
+    value = total + below_billion + small + (digit or 0)
+    return value if 0 < value < _MAX_AMOUNT else None
+
+
+def _words_currency(words: str) -> Optional[str]:
+    plain = strip_diacritics(words)
+    if "do la" in plain or "usd" in plain:
+        return "USD"
+    if "euro" in plain:
+        return "EUR"
+    return "VND" if "dong" in plain else None
+
+
+def _to_date(day: str, month: str, year: str) -> Optional[date]:
+    try:
+        value = date(int(year), int(month), int(day))
+    except ValueError:
+        return None
+    return value if 1900 <= value.year <= 2200 else None
+
+
+def _in_legal_basis(text: str, pos: int) -> bool:
+    """Whether pos is on a "Căn cứ ..." line of the lowercased text."""
+    return _LEGAL_BASIS.match(text, text.rfind("\n", 0, pos) + 1) is not None
+
+
+def _first_date(pattern: "re.Pattern[str]", text: str, group: int = 1) -> Optional[date]:
+    """First valid date captured by pattern, from the three groups starting at group,
+    outside "Căn cứ" lines."""
+    for m in pattern.finditer(text):
+        value = _to_date(*m.group(group, group + 1, group + 2))
+        if value and not _in_legal_basis(text, m.start()):
+            return value
+    return None
+
+
+def _first_range(text: str) -> Optional[Tuple[date, date]]:
+    """First valid "từ ... đến ..." range of the lowercased text, outside "Căn cứ" lines."""
+    for m in _TERM_RANGE.finditer(text):
+        start, end = _to_date(*m.group(1, 2, 3)), _to_date(*m.group(4, 5, 6))
+        if start and end and start <= end and not _in_legal_basis(text, m.start()):
+            return start, end
+    return None
+
+
+def _head_date(doc: _Text) -> Optional[date]:
+    """First date in the head of the document, outside "Căn cứ" lines."""
+    for line in islice(doc.lines, _TERM_HEAD_LINES):
+        line = line.lower()
+        if _LEGAL_BASIS.match(line):
+            continue
+        value = _first_date(_DATE_ANY, line)
+        if value:
+            return value
+    return None
+
+
+def _add_duration(start: date, count: int, unit: str) -> date:
+    if unit == "D":
+        return start + timedelta(days=count)
+    months = start.month - 1 + (count * 12 if unit == "Y" else count)
+    year, month = start.year + months // 12, months % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def _term_end(start: date, count: int, unit: str) -> date:
+    """Last day of a term starting on start: the day before the same date one term later,
+    or the end of that month when the date does not exist (29/02/2024 + 1 năm -> 28/02/2025)."""
+    end = _add_duration(start, count, unit)
+    if unit != "D" and end.day != start.day:
+        return end  # clamped to the month end, which is already the last day
+    return end - timedelta(days=1)
+
+
+def _extract_duration(text: str) -> Optional[Tuple[int, str]]:
+    """(count, unit) of the contract term in the lowercased text, unit being Y, M or D."""
+    for m in _DURATION.finditer(text):
+        count_text = m.group(1)
+        if count_text.isdigit():
+            count = int(count_text)
+        elif strip_diacritics(count_text.split()[0]) in _LEADING_NUMBER_WORDS:
+            count = words_to_number(count_text)
+        else:
+            continue
+        if count:
+            return count, _DURATION_UNITS[m.group(2)]
     return None
 
 
-def _extract_clauses(text: str) -> List[str]:
-    clause_heads = re.findall(r"(Điều\s+\d+[^\n]*)", text, flags=re.IGNORECASE)
-    return clause_heads[:50]
+# (key, words, search, unless): a search runs on a span only if the span contains one of
+# the words (not the first of their phrase, so lowercase as written) and not once all the
+# keys in unless are found
+_TERM_SEARCHES = (
+    ("effective", ("lực", "đầu"), functools.partial(_first_date, _EFFECTIVE), ()),
+    ("expiration", ("đến", "tới", "hết", "Hết", "thúc"), functools.partial(_first_date, _EXPIRATION), ()),
+    ("range", ("đến", "tới"), _first_range, ("effective", "expiration")),
+    ("signed", ("nay", "lập", "ký"), functools.partial(_first_date, _SIGNED), ("effective",)),
+    ("duration", ("hạn",), _extract_duration, ()),
+)
+
+
+def _line_start(text: str, lines: int) -> int:
+    """Offset after the first lines lines, from the end when lines is negative."""
+    pos = -1 if lines >= 0 else len(text)
+    for _ in range(abs(lines)):
+        pos = text.find("\n", pos + 1) if lines >= 0 else text.rfind("\n", 0, pos)
+        if pos < 0:
+            return len(text) if lines >= 0 else 0
+    return pos + 1
+
+
+def _term_spans(text: str) -> Iterator[str]:
+    """The parts of text that may state the term, in order and without overlap: the
+    head, the lines from each _TERM_ANCHORS match to _TERM_WINDOW characters after it,
+    and the tail."""
+    start, end = 0, _line_start(text, _TERM_HEAD_LINES)
+    # Lazy, so a search that stops early does not scan the rest of the text
+    anchors = heapq.merge(*((m.start() for m in anchor.finditer(text)) for anchor in _TERM_ANCHORS))
+    for pos in chain(anchors, [_line_start(text, -_TERM_TAIL_LINES)]):
+        if pos > end:
+            line = text.rfind("\n", 0, pos) + 1
+            if line > end:
+                yield text[start:end]
+                start = line
+        end = max(end, pos + _TERM_WINDOW)
+    yield text[start:]  # the tail runs to the end
 
 
-def _extract_signatures(text: str) -> Dict[str, bool]:
-    sign = r"(Đại\s*diện|Dai\s*dien|Ký\s*tên|Ky\s*ten|Chữ\s*ký|Chu\s*ky|Đóng\s*dấu|Dong\s*dau)"
-    ben_a = r"(BÊN\s*A|Bên\s*A|Ben\s*A)"
-    ben_b = r"(BÊN\s*B|Bên\s*B|Ben\s*B)"
-    window = 120
-    pat_a = rf"({sign}).{{0,{window}}}{ben_a}|{ben_a}.{{0,{window}}}({sign})"
-    pat_b = rf"({sign}).{{0,{window}}}{ben_b}|{ben_b}.{{0,{window}}}({sign})"
+def _extract_term(doc: _Text) -> Tuple[Optional[date], Optional[date], Optional[str]]:
+    """(effective, expiration, ISO duration) of the contract.
+
+    The start is an explicit "hiệu lực từ" date, else the start of a "từ ... đến
+    ..." range, else the signing date ("Hôm nay, ngày ...", "lập ngày ..."),
+    else the first date in the head of the text; the last two only when they
+    come before the end. Dates on "Căn cứ" lines (laws) are never used. The end
+    is an explicit "hết hạn" date, else the end of the range, else the start
+    plus the duration, the last day included, unless the start was only the
+    first date in the head: too uncertain to compute an end from.
+
+    Only _term_spans are read, up to the one where both the start and the end
+    (or the duration) are known: the term is stated in one place, and a later
+    "hết hạn" date does not override it.
+    """
+    # First match of each search in text order, up to the span where both the start and
+    # the end (or the duration) are known
+    found: Dict[str, object] = {}
+    for span in _term_spans(doc.text):
+        lowered = None  # only digits are read back, so offsets may shift
+        for key, words, search, unless in _TERM_SEARCHES:
+            if key in found or unless and all(other in found for other in unless):
+                continue
+            if not any(word in span for word in words):
+                continue
+            if lowered is None:
+                lowered = span.lower()
+            value = search(lowered)
+            if value:
+                found[key] = value
+        if found.keys() & {"effective", "range"} and found.keys() & {"expiration", "range", "duration"}:
+            break
+    effective, expiration, duration = found.get("effective"), found.get("expiration"), found.get("duration")
+    if "range" in found:
+        effective = effective or found["range"][0]
+        expiration = expiration or found["range"][1]
+    certain = True
+    if effective is None:
+        effective = found.get("signed")
+        if effective is None:
+            effective, certain = _head_date(doc), False
+        if effective and expiration and effective >= expiration:
+            effective = None  # the date found was the expiry itself
+    if expiration is None and effective and duration and certain:
+        expiration = _term_end(effective, *duration)
+    return effective, expiration, f"P{duration[0]}{duration[1]}" if duration else None
+
+
+def _labelled_value(text: str) -> Tuple[Optional[int], Optional[str]]:
+    """Value and currency of the first amount after a "Giá trị hợp đồng" label, on its line."""
+    for label in _AMOUNT_LABEL.finditer(text):
+        end = text.find("\n", label.end())
+        end = len(text) if end < 0 else end
+        for m in _VALUE_FIGURE.finditer(text, label.end(), end):
+            tail = _AMOUNT_TAIL.match(text, m.end(1), end)
+            if tail.group("scale") or tail.group("currency") or _THOUSANDS.fullmatch(m.group(1)) \
+                    or _head_currency(text, m.start(1)):
+                value, currency = _figure_value(text, m.group(1), m.start(1), m.end(1))
+                if value:
+                    return value, currency
+    return None, None
+
+
+def _extract_amount(doc: _Text) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+    """(amount as written, value, currency).
+
+    The string as written is the first figure on a "Giá trị hợp đồng" line, else
+    the figure with the most digits, as the legacy parser returned it (even a
+    clause number in a heading). The value comes from the first real amount after
+    a label (_labelled_value), else from the amount in words, else from the
+    figure with the most digits.
+    """
+    raw = None
+    for line in doc.lines:
+        if _AMOUNT_LABEL.search(line):
+            m = _AMOUNT_IN_LINE.search(line)
+            if m:
+                raw = m.group(0)
+                break
+    value, currency = _labelled_value(doc.text)
+    if raw is not None and value is not None:
+        return raw, value, currency
+    # Otherwise the figure with the most digits (the first one on a tie)
+    best, best_digits = None, -1
+    for m in _AMOUNT_ANY.finditer(doc.text):
+        digits = sum(map(str.isdecimal, m.group(0)))
+        if digits > best_digits:
+            best, best_digits = m, digits
+    if raw is None:
+        raw = best.group(0) if best else None
+    if value is not None:
+        return raw, value, currency
+    words = _AMOUNT_WORDS.search(doc.text)
+    if words:
+        value = words_to_number(words.group(1))
+        if value is not None:
+            return raw, value, _words_currency(words.group(1))
+    if best:
+        return (raw,) + _figure_value(doc.text, best.group(1), best.start(1), best.end(1))
+    return raw, None, None
+
+
+def _extract_clauses(doc: _Text) -> List[str]:
+    return [m.group(1) for m in islice(_CLAUSE.finditer(doc.text), _MAX_CLAUSES)]
+
+
+@functools.lru_cache(maxsize=4096)  # contracts from the same templates repeat their clause titles
+def clause_category(title: str) -> str:
+    """Normalized category of a clause title ("Phương thức thanh toán" -> "thanh_toan")."""
+    words = " " + " ".join(re.findall(r"\w+", strip_diacritics(title))) + " "
+    for category, _, keywords in CLAUSE_CATEGORIES:
+        if any(f" {keyword} " in words for keyword in keywords):
+            return category
+    return "khac"
+
+
+def segment_clauses(text: str) -> List[Dict]:
+    """Split text into its "Điều N" clauses, as rows for the contract_clauses table.
+
+    A clause runs from its heading line to the next heading, the last one to the
+    end of the text; start_offset/end_offset index into text as written to the
+    contract's .txt. A heading without a title ("Điều 3:") takes the next line
+    as its title. Unlike parsed_json["clauses"] there is no cap on the count.
+    """
+    headings = []
+    last = 0
+    for m in _CLAUSE_HEADING.finditer(text):
+        number = int(m.group(2))
+        if last < number <= last + _CLAUSE_NUMBER_GAP:
+            headings.append((m, number))
+            last = number
+    clauses = []
+    for position, (m, number) in enumerate(headings):
+        end = headings[position + 1][0].start() if position + 1 < len(headings) else len(text)
+        heading = m.group(1).strip()
+        body = text[m.end():end].strip()
+        title = heading[m.end(2) - m.start(1):].strip(" \t.:-–")
+        if not title and body:
+            title, _, rest = body.partition("\n")
+            heading = f"{heading} {title.strip()}"
+            body = rest.strip()
+        clauses.append({
+            "position": position,
+            "number": number,
+            "heading": heading[:_HEADING_CHARS],
+            "category": clause_category(title),
+            "start_offset": m.start(1),
+            "end_offset": end,
+            "excerpt": body[:_EXCERPT_CHARS],
+        })
+    return clauses
+
+
+def _extract_signatures(doc: _Text) -> Dict[str, bool]:
+    """One left-to-right scan over keyword and party mentions, merged by offset.
+
+    Mentions arrive in order of start. A mention whose end lies at or before
+    the current start can precede it, so ends wait in a heap per kind until
+    they do and only the latest one is kept; the current mention pairs with a
+    partner kind when that latest end is within _SIGN_WINDOW. Each mention is
+    handled once, so the cost is linear in the text plus the number of
+    mentions, and the scan stops as soon as both parties are found.
+    Each search resumes one character after the previous start, so overlapping
+    mentions ("Chữ ký tên") are all seen.
+    """
+    text = doc.text
+    pending: Dict[str, List[int]] = {"sign": [], "ben_a": [], "ben_b": []}
+    latest = {"sign": -1, "ben_a": -1, "ben_b": -1}
+    found = {"sign": False, "ben_a": False, "ben_b": False}
+    pos = 0
+    while not (found["ben_a"] and found["ben_b"]):
+        m = _SIGN_KEYWORDS.search(text, pos)
+        if m is None:
+            break
+        kind, start = m.lastgroup, m.start()
+        for partner in _SIGN_PARTNERS[kind]:
+            ends = pending[partner]
+            while ends and ends[0] <= start:
+                latest[partner] = max(latest[partner], heapq.heappop(ends))
+            if latest[partner] >= 0 and start - latest[partner] <= _SIGN_WINDOW:
+                found[kind if kind != "sign" else partner] = True
+        found["sign"] = found["sign"] or kind == "sign"
+        heapq.heappush(pending[kind], m.end())
+        pos = start + 1
     return {
-        "ben_a_present": bool(re.search(pat_a, text, flags=re.IGNORECASE | re.DOTALL)),
-        "ben_b_present": bool(re.search(pat_b, text, flags=re.IGNORECASE | re.DOTALL)),
-        "chu_ky_mention": bool(re.search(sign, text, flags=re.IGNORECASE)),
+        "ben_a_present": found["ben_a"],
+        "ben_b_present": found["ben_b"],
+        "chu_ky_mention": found["sign"],
     }
 
 
 def parse_contract_text(text: str) -> Dict:
-    detected_type = _detect_type(text)
+    doc = _Text(text)
+    detected_type = _detect_type(doc)
+    amount, amount_value, amount_currency = _extract_amount(doc)
+    signed = _extract_effective_date(doc)
+    effective, expiration, duration = _extract_term(doc)
     return {
-        "title": _extract_title(text),
+        "title": _extract_title(doc),
         "type": detected_type.get("type"),
         "type_label": detected_type.get("type_label"),
-        "parties": _extract_parties(text),
-        "effective_date": _extract_effective_date(text),
-        "amount": _extract_amount(text),
-        "clauses": _extract_clauses(text),
-        "signatures": _extract_signatures(text),
-    } 
\ No newline at end of file
+        "parties": _extract_parties(doc),
+        "effective_date": signed,
+        "effective_on": effective.isoformat() if effective else None,
+        "expiration_date": expiration.isoformat() if expiration else None,
+        "duration": duration,
+        "amount": amount,
+        "amount_value": amount_value,
+        "amount_currency": amount_currency,
+        "clauses": _extract_clauses(doc),
+        "signatures": _extract_signatures(doc),
+    }
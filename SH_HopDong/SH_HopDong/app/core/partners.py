@@ -0,0 +1,173 @@
+"""Link contracts to the partners table by matching their party blocks.
+
+Every partner contributes patterns: its tax ID (MST), its name and its aliases
+(Partner.aliases, one per line). All patterns are compiled into one word-level
+Aho-Corasick automaton (app.core.matching), so a party block is scanned once,
+in time linear in its length whatever the number of partners.
+
+Each process keeps one PartnerMatcher that follows the table incrementally:
+partners added or edited since the last sync go into a small delta automaton,
+the old patterns of edited or deleted partners are skipped through a revision
+map, and everything is rebuilt from the table once the delta or the number of
+superseded partners passes REBUILD_AFTER. The table is checked for changes
+(count, max id, max updated_at) at most every SYNC_SECONDS.
+"""
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from app.core.matching import Automaton, normalize
+from app.db import models
+
+SYNC_SECONDS = 2.0
+REBUILD_AFTER = 5000  # delta patterns or superseded partners
+
+# Preference when a block matches several partners: tax ID, then name, then
+# alias, then the longest match
+MATCH_KINDS = ("tax_id", "name", "alias")
+_MIN_TAX_DIGITS = 8  # shorter values would match ordinary numbers in the block
+_MIN_NAME_CHARS = 3
+
+# (partner id, revision, kind index in MATCH_KINDS, pattern length in characters)
+Payload = Tuple[int, int, int, int]
+
+
+def partner_patterns(
+    partner_id: int, revision: int, name: str, tax_id: Optional[str], aliases: Optional[str]
+) -> List[Tuple[List[str], Payload]]:
+    """Patterns of one partner; too short a tax ID or name is left out."""
+    patterns = []
+    candidates = [(0, tax_id), (1, name)] + [(2, alias) for alias in (aliases or "").splitlines()]
+    for kind, value in candidates:
+        words = normalize(value or "")
+        if not words:
+            continue
+        length = sum(len(word) for word in words)
+        if kind == 0 and sum(ch.isdigit() for ch in value) < _MIN_TAX_DIGITS:
+            continue
+        if kind > 0 and length < _MIN_NAME_CHARS:
+            continue
+        patterns.append((words, (partner_id, revision, kind, length)))
+    return patterns
+
+
+class PartnerMatcher:
+    """Matches party blocks against the partners table (see the module docstring)."""
+
+    def __init__(self):
+        self._main = Automaton(())
+        self._delta = Automaton(())
+        self._delta_patterns: List[Tuple[List[str], Payload]] = []
+        self._revisions: Dict[int, int] = {}  # partner id -> revision of its current patterns
+        self._revision = 0
+        self._superseded = 0
+        self._signature: Optional[tuple] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def sync(self, db: Session, force: bool = False) -> None:
+        """Catch up with partners added, edited or deleted since the last sync."""
+        if not force and time.monotonic() - self._checked < SYNC_SECONDS:
+            return
+        # Other threads wait here during a sync instead of matching against a half-built state
+        with self._lock:
+            partner = models.Partner
+            signature = tuple(db.query(func.count(partner.id), func.max(partner.id), func.max(partner.updated_at)).one())
+            if signature != self._signature:
+                previous = self._signature
+                if previous is None:
+                    self._rebuild(db)
+                else:
+                    self._update(db, previous, signature[0])
+                self._signature = signature
+            self._checked = time.monotonic()
+
+    def _columns(self, db: Session):
+        partner = models.Partner
+        return db.query(partner.id, partner.name, partner.tax_id, partner.aliases)
+
+    def _rebuild(self, db: Session) -> None:
+        revisions, patterns = {}, []
+        self._revision += 1
+        for row in self._columns(db).yield_per(2000):
+            revisions[row.id] = self._revision
+            patterns += partner_patterns(row.id, self._revision, row.name, row.tax_id, row.aliases)
+        self._main = Automaton(patterns)
+        self._delta = Automaton(())
+        self._delta_patterns = []
+        self._revisions = revisions
+        self._superseded = 0
+
+    def _update(self, db: Session, previous: tuple, count: int) -> None:
+        _, max_id, max_updated = previous
+        partner = models.Partner
+        changed = or_(partner.id > (max_id or 0), partner.updated_at >= max_updated) if max_updated else partner.id > (max_id or 0)
+        revisions = dict(self._revisions)
+        patterns = list(self._delta_patterns)
+        for row in self._columns(db).filter(changed):
+            self._revision += 1
+            self._superseded += row.id in revisions
+            revisions[row.id] = self._revision
+            patterns += partner_patterns(row.id, self._revision, row.name, row.tax_id, row.aliases)
+        if len(revisions) != count:
+            existing = {partner_id for (partner_id,) in db.query(partner.id)}
+            for partner_id in [p for p in revisions if p not in existing]:
+                del revisions[partner_id]
+                self._superseded += 1
+        if len(patterns) > REBUILD_AFTER or self._superseded > REBUILD_AFTER:
+            self._rebuild(db)
+            return
+        self._delta = Automaton(patterns)
+        self._delta_patterns = patterns
+        self._revisions = revisions
+
+    def match(self, block: str) -> Optional[Tuple[int, str]]:
+        """Best partner for one party block: (partner id, matched by) or None."""
+        words = normalize(block)
+        revisions = self._revisions
+        best = None
+        for automaton in (self._main, self._delta):
+            for _, (partner_id, revision, kind, length) in automaton.search(words):
+                if revisions.get(partner_id) != revision:
+                    continue
+                key = (kind, -length, partner_id)
+                if best is None or key < best:
+                    best = key
+        return (best[2], MATCH_KINDS[best[0]]) if best else None
+
+
+_matcher = PartnerMatcher()
+
+
+def get_matcher(db: Session) -> PartnerMatcher:
+    """The process-wide matcher, synced with the partners table."""
+    _matcher.sync(db)
+    return _matcher
+
+
+def link_contract(db: Session, contract: models.Contract, parties: Optional[Dict[str, str]]) -> Dict[str, int]:
+    """Point the contract's ContractPartner rows at the partners found in its party blocks.
+
+    One link per role (ben_a, ben_b, ben_mua, ben_ban); a role whose block no
+    longer matches loses its link. Does not commit. Returns role -> partner id.
+    """
+    matcher = get_matcher(db)
+    found = {}
+    for role, block in (parties or {}).items():
+        match = matcher.match(block)
+        if match:
+            found[role] = match
+    links = {link.role: link for link in contract.partner_links}
+    for role, link in links.items():
+        if role not in found:
+            contract.partner_links.remove(link)
+    for role, (partner_id, matched_by) in found.items():
+        link = links.get(role)
+        if link is None:
+            contract.partner_links.append(models.ContractPartner(role=role, partner_id=partner_id, matched_by=matched_by))
+        else:
+            link.partner_id, link.matched_by = partner_id, matched_by
+    return {role: partner_id for role, (partner_id, _) in found.items()}
@@ -0,0 +1,169 @@
+"""Image preprocessing before OCR (photos and scanned image files).
+
+Phone photos are often 12+ megapixels at a nominal 72 dpi, with desk or blank
+margins around the page; tesseract works on every one of those pixels. Before
+OCR the image is converted to grayscale and, depending on the enabled steps:
+
+  downscale  resized to settings.ocr_target_dpi (effective resolution, see effective_dpi)
+  crop       cut to the region that contains text, found from ink projections
+  deskew     rotated straight when the text lines are tilted (projection profile)
+  binarize   thresholded to black/white with Otsu's threshold
+
+Everything after the PIL conversion/resize runs as vectorized NumPy on the
+pixel array. Which steps run comes from OCR_PREPROCESS / OCR_IMAGE_PROCESSING
+(the options on the OCR settings page) or OCR_PREPROCESS_STEPS.
+"""
+import math
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+STEPS = ("downscale", "crop", "deskew", "binarize")
+LEVELS = {
+    "none": (),
+    "basic": ("downscale", "crop", "deskew"),
+    "advanced": ("downscale", "crop", "deskew", "binarize"),
+}
+
+# Resolution tags below this are not a scan resolution (phones write 72 or 96)
+_MIN_SCAN_DPI = 150
+# Untagged photos are assumed to show an A4 page over their long side
+_A4_LONG_INCHES = 11.69
+# Rows/columns with text: some ink, but not (nearly) solid dark background
+_INK_MIN = 0.005
+_INK_MAX = 0.6
+_CROP_PAD = 0.02  # share of the long side kept around the text
+_CROP_MIN_GAIN = 0.1  # crop only if it removes at least this share of the pixels
+_DESKEW_ANGLES = np.arange(-3.0, 3.01, 0.25)
+_DESKEW_MIN_ANGLE = 0.3
+_DESKEW_SAMPLE = 200_000  # ink pixels used to score the angles
+# Threshold, text region and skew are estimated at 1/n resolution; all are robust to it
+_SUBSAMPLE = 2
+
+
+def enabled_steps() -> Tuple[str, ...]:
+    if not settings.ocr_preprocess:
+        return ()
+    if settings.ocr_preprocess_steps:
+        steps = {s.strip() for s in settings.ocr_preprocess_steps.split(",")}
+        return tuple(s for s in STEPS if s in steps)
+    return LEVELS.get(settings.ocr_image_processing, LEVELS["basic"])
+
+
+def effective_dpi(image: Image.Image) -> float:
+    """Scan resolution from the dpi tag when it is plausible, otherwise estimated from the size."""
+    try:
+        tagged = float(image.info["dpi"][0])
+    except (KeyError, TypeError, ValueError, IndexError):
+        tagged = 0.0
+    if tagged >= _MIN_SCAN_DPI:
+        return tagged
+    return max(image.size) / _A4_LONG_INCHES
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Gray level that best separates ink from background (maximum between-class variance)."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    omega = np.cumsum(hist) / gray.size
+    mu = np.cumsum(hist * np.arange(256)) / gray.size
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sigma = (mu[-1] * omega - mu) ** 2 / (omega * (1.0 - omega))
+    return int(np.argmax(np.nan_to_num(sigma)))
+
+
+def _text_span(profile: np.ndarray) -> Optional[Tuple[int, int]]:
+    hits = np.flatnonzero((profile > _INK_MIN) & (profile < _INK_MAX))
+    return (int(hits[0]), int(hits[-1]) + 1) if len(hits) else None
+
+
+def content_box(ink: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """(left, top, right, bottom) around the text, or None if cropping would not pay off.
+
+    Columns are found first and rows only within them, so a dark desk next to
+    the page does not make every row look like text.
+    """
+    h, w = ink.shape
+    cols = _text_span(ink.mean(axis=0))
+    if cols is None:
+        return None
+    rows = _text_span(ink[:, cols[0]:cols[1]].mean(axis=1))
+    if rows is None:
+        return None
+    cols = _text_span(ink[rows[0]:rows[1], :].mean(axis=0)) or cols
+    pad = int(_CROP_PAD * max(h, w))
+    left, right = max(cols[0] - pad, 0), min(cols[1] + pad, w)
+    top, bottom = max(rows[0] - pad, 0), min(rows[1] + pad, h)
+    if (right - left) * (bottom - top) > (1.0 - _CROP_MIN_GAIN) * h * w:
+        return None
+    return left, top, right, bottom
+
+
+def skew_angle(ink: np.ndarray) -> float:
+    """Rotation (degrees, PIL convention) that levels the text lines; 0 if unsure.
+
+    For each candidate angle the ink pixels are sheared onto rows and the angle
+    with the sharpest row histogram (largest sum of squares) wins.
+    """
+    ys, xs = np.nonzero(ink[::_SUBSAMPLE, ::_SUBSAMPLE])
+    if len(ys) < 1000:
+        return 0.0
+    step = max(len(ys) // _DESKEW_SAMPLE, 1)
+    ys, xs = ys[::step].astype(np.float64), xs[::step].astype(np.float64)
+    scores = []
+    for angle in _DESKEW_ANGLES:
+        rows = np.rint(ys + xs * np.tan(np.radians(angle))).astype(np.int64)
+        hist = np.bincount(rows - rows.min())
+        scores.append(float(np.dot(hist, hist)))
+    best = float(_DESKEW_ANGLES[int(np.argmax(scores))])
+    return -best if abs(best) >= _DESKEW_MIN_ANGLE else 0.0
+
+
+def prepare_image(image: Image.Image, steps: Optional[Tuple[str, ...]] = None) -> Tuple[Image.Image, int]:
+    """Run the enabled preprocessing steps; returns (grayscale image, its effective dpi).
+
+    A JPEG that is not decoded yet is decoded straight to grayscale at a reduced
+    scale (Image.draft), so an image opened for this call is modified in place.
+    With no steps enabled the image is returned unchanged.
+    """
+    steps = enabled_steps() if steps is None else steps
+    dpi = effective_dpi(image)
+    if not steps:
+        return image, int(round(dpi))
+    downscale = "downscale" in steps and dpi > settings.ocr_target_dpi
+    if downscale and image.format == "JPEG":
+        # libjpeg decodes at 1/2, 1/4 or 1/8 scale, never below the requested size
+        width = image.width
+        scale = settings.ocr_target_dpi / dpi
+        image.draft("L", (math.ceil(image.width * scale), math.ceil(image.height * scale)))
+        dpi *= image.width / width
+        downscale = dpi > settings.ocr_target_dpi
+    gray = image.convert("L") if image.mode != "L" else image
+    # Threshold and text region come from a reduced copy; cropping before resizing
+    # means the resize only touches the pixels that are kept
+    reduced = np.asarray(gray.reduce(_SUBSAMPLE))
+    threshold = otsu_threshold(reduced)
+    if "crop" in steps:
+        box = content_box(reduced <= threshold)
+        if box is not None:
+            left, top, right, bottom = (v * _SUBSAMPLE for v in box)
+            gray = gray.crop((left, top, min(right, gray.width), min(bottom, gray.height)))
+    if downscale:
+        scale = settings.ocr_target_dpi / dpi
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS, reducing_gap=3.0)
+        dpi = settings.ocr_target_dpi
+    pixels = np.asarray(gray)
+    ink = pixels <= threshold
+    if "deskew" in steps:
+        angle = skew_angle(ink)
+        if angle:
+            rotated = Image.fromarray(pixels).rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+            pixels = np.asarray(rotated)
+    if "binarize" in steps:
+        pixels = np.where(pixels > threshold, 255, 0).astype(np.uint8)
+    result = Image.fromarray(np.ascontiguousarray(pixels))
+    result.info["dpi"] = (dpi, dpi)
+    return result, int(round(dpi))
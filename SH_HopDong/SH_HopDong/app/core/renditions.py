@@ -0,0 +1,172 @@
+"""Page thumbnails and previews of the original upload, rendered once and kept on disk.
+
+Every page of a contract has two JPEG renditions (see RENDITIONS): a small
+thumbnail for page strips and a medium-resolution preview for reading. They are
+rendered on first request, or at ingestion for the kinds in RENDITION_EAGER, and
+stored under RENDITION_DIR/<file hash>/v<RENDITION_VERSION>/<kind>-<page>.jpg.
+Because the directory is keyed by the SHA-256 of the original, an entry never
+changes and can be served with a long-lived cache header and a strong ETag;
+re-uploading the same file reuses the renditions. Contracts without a file hash
+are keyed on their id and the path, size and mtime of the original instead, and
+served with a header that makes the browser revalidate (see cache_control).
+"""
+import hashlib
+import os
+import tempfile
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+from app.core.config import settings
+from app.db import models
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+RENDITION_DIR = settings.rendition_dir or os.path.join(PROJECT_ROOT, "renditions")
+
+# Tăng khi thay đổi kích thước/chất lượng (ảnh cũ nằm ở thư mục version cũ)
+RENDITION_VERSION = 1
+# kind -> (width in pixels, JPEG quality)
+RENDITIONS: Dict[str, Tuple[int, int]] = {
+    "thumb": (240, 70),
+    "preview": (1000, 75),
+}
+# Pages taller than this many widths (receipts, long scans) are shrunk to fit
+_MAX_ASPECT = 3
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CONTROL = "no-cache"
+
+
+def _key(contract: models.Contract) -> str:
+    if contract.file_hash:
+        return contract.file_hash
+    # An id alone can be reused (SQLite without AUTOINCREMENT) and would serve another
+    # document's renditions; the original's path, size and mtime tell them apart
+    source = contract.original_path or ""
+    try:
+        stat = os.stat(source)
+        stamp = f"{stat.st_size}-{stat.st_mtime_ns}"
+    except OSError:
+        stamp = "missing"
+    digest = hashlib.sha1(f"{os.path.abspath(source)}|{stamp}".encode("utf-8")).hexdigest()
+    return f"contract-{contract.id}-{digest[:16]}"
+
+
+def rendition_path(contract: models.Contract, page: int, kind: str) -> str:
+    return os.path.join(RENDITION_DIR, _key(contract), f"v{RENDITION_VERSION}", f"{kind}-{page}.jpg")
+
+
+def etag(contract: models.Contract, page: int, kind: str) -> str:
+    key = _key(contract)
+    return f'"{key[:16] if contract.file_hash else key}-v{RENDITION_VERSION}-{kind}-{page}"'
+
+
+def cache_control(contract: models.Contract) -> str:
+    """Long-lived and immutable only when the renditions are keyed by the file hash."""
+    return CACHE_CONTROL if contract.file_hash else REVALIDATE_CONTROL
+
+
+def page_count(path: str) -> int:
+    """Number of pages (PDF) or frames (TIFF) of an original; 0 if it cannot be opened."""
+    try:
+        if path.lower().endswith(".pdf"):
+            with fitz.open(path) as doc:
+                return doc.page_count
+        with Image.open(path) as image:
+            return getattr(image, "n_frames", 1)
+    except Exception:
+        return 0
+
+
+def _fit(width: int, height: int, target: int) -> Tuple[int, int]:
+    """Size for a page scaled to target width; never upscaled, very tall pages capped."""
+    scale = min(target / width, _MAX_ASPECT * target / height, 1.0)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _render_pdf(path: str, pages: Iterable[int], target: int) -> Iterator[Tuple[int, Image.Image]]:
+    with fitz.open(path) as doc:
+        for index in pages:
+            page = doc.load_page(index)
+            zoom = min(target / page.rect.width, _MAX_ASPECT * target / page.rect.height)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+            yield index, Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+
+def _render_image(path: str, pages: Iterable[int], target: int) -> Iterator[Tuple[int, Image.Image]]:
+    with Image.open(path) as image:
+        for index in pages:
+            if index:
+                image.seek(index)
+            size = _fit(image.width, image.height, target)
+            if image.format == "JPEG":
+                # decode at 1/2..1/8 scale straight away, a phone photo is mostly thrown away here
+                image.draft(image.mode, size)
+            frame = image.convert("L" if image.mode in ("1", "L") else "RGB")
+            yield index, frame.resize(_fit(frame.width, frame.height, target), Image.LANCZOS, reducing_gap=3.0)
+
+
+def _render(path: str, pages: Iterable[int], target: int) -> Iterator[Tuple[int, Image.Image]]:
+    if path.lower().endswith(".pdf"):
+        return _render_pdf(path, pages, target)
+    return _render_image(path, pages, target)
+
+
+def _save(image: Image.Image, path: str, quality: int) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, "JPEG", quality=quality, optimize=True)
+        os.replace(tmp, path)  # concurrent requests for the same page just overwrite each other
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def get_rendition(contract: models.Contract, page: int, kind: str) -> Optional[str]:
+    """Path of the cached rendition of a page (0-based), rendering it if needed.
+
+    Returns None if the page does not exist or the original is missing;
+    an unknown kind raises ValueError.
+    """
+    if kind not in RENDITIONS:
+        raise ValueError(f"unknown rendition {kind!r}")
+    path = rendition_path(contract, page, kind)
+    if os.path.exists(path):
+        return path
+    source = contract.original_path
+    if not source or not os.path.exists(source) or not 0 <= page < page_count(source):
+        return None
+    width, quality = RENDITIONS[kind]
+    for _, image in _render(source, [page], width):
+        _save(image, path, quality)
+    return path
+
+
+def render_renditions(contract: models.Contract, kinds: Iterable[str]) -> int:
+    """Render the missing renditions of every page (eager mode); returns how many were written.
+
+    Each kind opens the original once. Errors are logged, never raised: a
+    missing thumbnail is rendered again on first view.
+    """
+    written = 0
+    source = contract.original_path
+    try:
+        count = page_count(source) if source and os.path.exists(source) else 0
+        for kind in kinds:
+            if kind not in RENDITIONS:
+                continue
+            missing = [i for i in range(count) if not os.path.exists(rendition_path(contract, i, kind))]
+            width, quality = RENDITIONS[kind]
+            for index, image in _render(source, missing, width) if missing else ():
+                _save(image, rendition_path(contract, index, kind), quality)
+                written += 1
+    except Exception as e:
+        print(f"Rendition Error for contract {contract.id}: {str(e)}")
+    return written
+
+
+def eager_kinds() -> Tuple[str, ...]:
+    return tuple(k.strip() for k in settings.rendition_eager.split(",") if k.strip() in RENDITIONS)
+
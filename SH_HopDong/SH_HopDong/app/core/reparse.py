@@ -0,0 +1,163 @@
+"""Re-run the parser over stored contracts after the rules change (python -m app.reparse).
+
+Parsing normally happens once, at ingestion, so contracts keep the parsed_json
+of the parser version they were ingested with. This job selects the processed
+contracts whose parser_version is older than PARSER_VERSION (or missing),
+re-parses their stored .txt in a process pool and writes the results back one
+batch per transaction, through the same apply_parsed as ingestion; partner
+links (app.core.partners) and the contract_clauses rows are refreshed along
+with them, which is also how the clause table is backfilled.
+
+Contracts are read in keyset batches (id > last id, ordered by id), so memory
+does not grow with the corpus. Every batch is committed on its own and a
+re-parsed contract no longer matches the filter, so an interrupted run simply
+continues where it stopped when started again. Parsing batch n + 1 overlaps
+with writing batch n.
+"""
+import multiprocessing
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_
+from sqlalchemy.orm import Query, Session, selectinload
+
+from app.core.classifier import head_text
+from app.core.ingest import apply_contract_type, apply_parsed
+from app.core.parser import PARSER_VERSION, parse_contract_text, segment_clauses
+from app.core.partners import link_contract
+from app.db import models
+
+
+@dataclass
+class ReparseResult:
+    parsed: int = 0
+    failed: int = 0  # .txt missing/unreadable or parser error; left as is and retried next run
+    skipped: int = 0  # changed by ingestion while being re-parsed
+    seconds: float = 0.0
+
+
+def stale_contracts(db: Session) -> Query:
+    """Processed contracts whose parsed_json comes from an older parser version."""
+    contract = models.Contract
+    return db.query(contract).filter(
+        contract.status == "processed",
+        or_(contract.parser_version.is_(None), contract.parser_version < PARSER_VERSION),
+    )
+
+
+def _parse_file(item: Tuple[int, str]) -> Tuple[int, Optional[Tuple[dict, List[dict], str]], Optional[str]]:
+    """Runs in a pool process: (contract id, (parse result, clauses, head for the type classifier) or None, error)."""
+    contract_id, path = item
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        return contract_id, (parse_contract_text(text), segment_clauses(text), head_text(text)), None
+    except Exception as e:
+        return contract_id, None, str(e)
+
+
+def _next_batch(db: Session, after_id: int, size: int) -> List[Tuple[int, str]]:
+    rows = (
+        stale_contracts(db)
+        .filter(models.Contract.id > after_id)
+        .order_by(models.Contract.id)
+        .with_entities(models.Contract.id, models.Contract.text_path)
+        .limit(size)
+        .all()
+    )
+    return [(row.id, row.text_path) for row in rows]
+
+
+def _write_batch(
+    db: Session, results: List[Tuple[int, Optional[Tuple[dict, List[dict], str]], Optional[str]]], totals: ReparseResult
+) -> None:
+    parsed: Dict[int, Tuple[dict, List[dict], str]] = {}
+    for contract_id, result, error in results:
+        if result is None:
+            print(f"Reparse Error for contract {contract_id}: {error}")
+            totals.failed += 1
+        else:
+            parsed[contract_id] = result
+    if not parsed:
+        return
+    # Rows are loaded again here, so anything ingestion changed meanwhile is seen
+    batch = (
+        stale_contracts(db)
+        .filter(models.Contract.id.in_(list(parsed)))
+        .options(selectinload(models.Contract.partner_links))
+        .all()
+    )
+    clauses: Dict[int, List[dict]] = {}
+    for contract in batch:
+        result, clauses[contract.id], head = parsed.pop(contract.id)
+        apply_contract_type(db, contract, result, head)
+        link_contract(db, contract, result.get("parties"))
+        apply_parsed(contract, result, (contract.parsed_json or {}).get("ocr_pages"))
+        totals.parsed += 1
+    totals.skipped += len(parsed)
+    _replace_clauses(db, clauses)
+    db.commit()
+    db.expunge_all()
+
+
+def _replace_clauses(db: Session, clauses: Dict[int, List[dict]]) -> None:
+    """Swap the contract_clauses rows of a whole batch in two statements.
+
+    Unlike apply_clauses at ingestion this bypasses the ORM collections: a
+    batch holds around twenty clauses per contract, too many to flush one
+    object at a time.
+    """
+    if not clauses:
+        return
+    table = models.ContractClause
+    db.execute(delete(table).where(table.contract_id.in_(list(clauses))))
+    rows = [dict(clause, contract_id=contract_id) for contract_id, items in clauses.items() for clause in items]
+    if rows:
+        db.execute(insert(table), rows)
+
+
+def reparse_contracts(
+    db: Session,
+    workers: int = 1,
+    batch_size: int = 500,
+    limit: Optional[int] = None,
+    progress: Optional[Callable[[ReparseResult], None]] = None,
+) -> ReparseResult:
+    """Re-parse every stale contract (at most limit); workers <= 1 parses in this process.
+
+    progress is called after each committed batch.
+    """
+    totals = ReparseResult()
+    start = time.perf_counter()
+    remaining = limit if limit is not None else float("inf")
+    pool = multiprocessing.get_context("spawn").Pool(workers) if workers > 1 else None
+    try:
+        last_id = 0
+        pending = None  # batch being parsed by the pool
+        while True:
+            items = _next_batch(db, last_id, int(min(batch_size, remaining))) if remaining > 0 else []
+            if items:
+                last_id = items[-1][0]
+                remaining -= len(items)
+            if pool is not None:
+                submitted = pool.map_async(_parse_file, items, chunksize=max(1, len(items) // (workers * 4))) if items else None
+                if pending is not None:
+                    _write_batch(db, pending.get(), totals)
+                    if progress:
+                        progress(totals)
+                pending = submitted
+                if pending is None:
+                    break
+            else:
+                if not items:
+                    break
+                _write_batch(db, [_parse_file(item) for item in items], totals)
+                if progress:
+                    progress(totals)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    totals.seconds = time.perf_counter() - start
+    return totals
@@ -0,0 +1,131 @@
+"""PDF text-layer quality check.
+
+Decides per page whether the embedded text layer can be used as is ("text"),
+has to be replaced by OCR ("ocr"), or is fine but leaves image regions without
+text that still need OCR ("ocr_regions", e.g. a scanned annex or stamp pasted
+into a typed contract). The score combines the share of well-formed characters
+with the share of words that are valid Vietnamese syllables (or plain ASCII
+words), which catches the usual broken layers: TCVN3/VNI mojibake, unmapped
+glyphs (U+FFFD) and symbol-font garbage.
+
+detect_language tells clearly Vietnamese from clearly English text, which the
+OCR pipeline uses to pick a single tesseract model when lang="auto".
+"""
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+
+from app.core.config import settings
+
+_VN_LOWER = (
+    "aàáảãạăằắẳẵặâầấẩẫậbcdđeèéẻẽẹêềếểễệghiìíỉĩịklmnoòóỏõọôồốổỗộơờớởỡợ"
+    "pqrstuùúủũụưừứửữựvxyỳýỷỹỵfjwz"
+)
+_LETTERS = frozenset(_VN_LOWER + _VN_LOWER.upper())
+_PUNCTUATION = frozenset(".,;:!?()[]-–—/\\%\"'“”‘’…&+=*#@<>$€₫°§_|")
+_TONE_MARKS = frozenset("\u0300\u0301\u0303\u0309\u0323")  # huyền, sắc, ngã, hỏi, nặng
+_SYLLABLE = re.compile(
+    r"(ngh|ng|nh|ch|gh|gi|kh|ph|qu|th|tr|[bcdđghklmnprstvx])?"
+    r"[aăâeêioôơuưy]{1,3}"
+    r"(ch|ng|nh|[cmnpt])?"
+)
+_ASCII_WORD = re.compile(r"[a-z]*[aeiouy][a-z]*")
+_WORD = re.compile(r"[^\W\d_]+")
+# Letters that only occur in Vietnamese (đ, ă, â, ê, ô, ơ, ư and toned vowels)
+_VN_MARKED = frozenset(c for c in _LETTERS if not c.isascii())
+_ENGLISH_WORDS = frozenset(
+    "the of and to in is for that by this with be shall or as are on any party parties agreement "
+    "such will from at which not all its under".split()
+)
+# Below this many letters a text says nothing reliable about its language
+_MIN_LANG_LETTERS = 40
+# Share of letters with Vietnamese marks: typed Vietnamese is around 0.3, English 0
+_VN_MARKED_MIN = 0.08
+_VN_MARKED_MAX_ENGLISH = 0.01
+_ENGLISH_WORDS_MIN = 0.1
+
+# Longer pages are scored on a prefix, the layer is broken or not as a whole
+_SAMPLE_CHARS = 4000
+# An image counts as "already covered" when text blocks cover this share of it
+_COVERED_SHARE = 0.1
+
+
+@dataclass
+class TextLayerAssessment:
+    decision: str  # "text", "ocr" or "ocr_regions"
+    quality: float
+    text: str = ""
+    regions: List[fitz.Rect] = field(default_factory=list)
+
+
+def is_vietnamese_syllable(word: str) -> bool:
+    word = word.lower()
+    if any(c not in _LETTERS for c in word):
+        return False
+    decomposed = unicodedata.normalize("NFD", word)
+    if sum(c in _TONE_MARKS for c in decomposed) > 1:
+        return False
+    base = unicodedata.normalize("NFC", "".join(c for c in decomposed if c not in _TONE_MARKS))
+    return _SYLLABLE.fullmatch(base) is not None
+
+
+def text_quality(text: str) -> float:
+    """Score 0..1: half character well-formedness, half valid-word ratio."""
+    sample = unicodedata.normalize("NFC", text[:_SAMPLE_CHARS])
+    chars = [c for c in sample if not c.isspace()]
+    if not chars:
+        return 0.0
+    good = sum(c in _LETTERS or c.isdigit() or c in _PUNCTUATION for c in chars)
+    words = _WORD.findall(sample)
+    if not words:
+        return round(0.5 * good / len(chars), 3)
+    valid = sum(is_vietnamese_syllable(w) or (w.isascii() and _ASCII_WORD.fullmatch(w.lower()) is not None) for w in words)
+    return round(0.5 * good / len(chars) + 0.5 * valid / len(words), 3)
+
+
+def detect_language(text: str) -> Optional[str]:
+    """'vie' or 'eng' for text that is clearly one language, None if mixed, unmarked or too short."""
+    sample = unicodedata.normalize("NFC", text[:_SAMPLE_CHARS])
+    letters = [c for c in sample if c.isalpha()]
+    if len(letters) < _MIN_LANG_LETTERS:
+        return None
+    marked = sum(c in _VN_MARKED for c in letters) / len(letters)
+    if marked >= _VN_MARKED_MIN:
+        return "vie"
+    if marked <= _VN_MARKED_MAX_ENGLISH:
+        # Tiếng Việt không dấu cũng không có ký tự đánh dấu: cần thêm từ tiếng Anh phổ biến
+        words = _WORD.findall(sample.lower())
+        if words and sum(w in _ENGLISH_WORDS for w in words) / len(words) >= _ENGLISH_WORDS_MIN:
+            return "eng"
+    return None
+
+
+def _uncovered_images(page: "fitz.Page") -> List[fitz.Rect]:
+    """Image regions big enough to matter that have (almost) no text over them."""
+    page_area = abs(page.rect) or 1.0
+    text_blocks = [fitz.Rect(b[:4]) for b in page.get_text("blocks") if b[6] == 0 and b[4].strip()]
+    regions = []
+    for info in page.get_image_info():
+        rect = fitz.Rect(info["bbox"]) & page.rect
+        if rect.is_empty or abs(rect) / page_area < settings.ocr_region_min_area:
+            continue
+        covered = sum(abs(rect & block) for block in text_blocks)
+        if covered / abs(rect) < _COVERED_SHARE and not any(rect in r for r in regions):
+            regions.append(rect)
+    return regions
+
+
+def assess_page(page: "fitz.Page") -> TextLayerAssessment:
+    text = page.get_text().strip()
+    if not text:
+        return TextLayerAssessment("ocr", 0.0)
+    quality = text_quality(text)
+    if quality < settings.text_layer_min_quality:
+        return TextLayerAssessment("ocr", quality, text)
+    regions = _uncovered_images(page)
+    if regions:
+        return TextLayerAssessment("ocr_regions", quality, text, regions)
+    return TextLayerAssessment("text", quality, text)
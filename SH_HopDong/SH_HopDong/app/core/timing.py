@@ -0,0 +1,42 @@
+"""Wall-clock and CPU time accounting per processing stage.
+
+CPU time covers this process plus its finished child processes, so the
+pytesseract backend (one tesseract process per call) is measured as well as
+tesserocr running in-process. On Windows child CPU time is not reported.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+
+def cpu_seconds() -> float:
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+class StageTimer:
+    """Accumulates [wall seconds, CPU seconds] per stage name."""
+
+    def __init__(self):
+        self.totals: Dict[str, List[float]] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, cpu_seconds() - cpu)
+
+    def add(self, name: str, wall: float, cpu: float) -> None:
+        total = self.totals.setdefault(name, [0.0, 0.0])
+        total[0] += wall
+        total[1] += max(cpu, 0.0)
+
+    def merge(self, timings: Optional[Dict[str, List[float]]]) -> None:
+        for name, (wall, cpu) in (timings or {}).items():
+            self.add(name, wall, cpu)
+
+    def to_dict(self) -> Dict[str, List[float]]:
+        return {name: [round(wall, 4), round(cpu, 4)] for name, (wall, cpu) in self.totals.items()}
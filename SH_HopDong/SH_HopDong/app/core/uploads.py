@@ -0,0 +1,143 @@
+"""Streaming upload handling.
+
+Uploads are copied to disk in fixed-size chunks while the SHA-256 is computed in
+the same pass, so memory use does not grow with the file size. The size limit is
+enforced twice: UploadSizeLimitMiddleware rejects oversized request bodies from
+Content-Length (or while the body streams in) before the multipart parser spools
+them, and save_upload stops copying as soon as a single file exceeds the limit.
+The first chunk is sniffed for a known magic number so a renamed or truncated
+file is rejected at upload time instead of failing later in OCR.
+"""
+import hashlib
+import os
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import PlainTextResponse
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# (format, magic prefix at offset 0)
+_SIGNATURES = [
+    ("png", b"\x89PNG\r\n\x1a\n"),
+    ("jpeg", b"\xff\xd8\xff"),
+    ("tiff", b"II*\x00"),
+    ("tiff", b"MM\x00*"),
+    ("tiff", b"II+\x00"),  # BigTIFF
+    ("bmp", b"BM"),
+]
+IMAGE_FORMATS = {"png", "jpeg", "tiff", "bmp"}
+# The PDF header may be preceded by junk, readers accept it within the first 1 KiB
+_PDF_HEADER_WINDOW = 1024
+
+
+class UploadTooLarge(HTTPException):
+    def __init__(self, max_bytes: int):
+        super().__init__(status_code=413, detail=f"Tệp tải lên vượt quá giới hạn {max_bytes // (1024 * 1024)} MB")
+
+
+class UnsupportedUpload(ValueError):
+    pass
+
+
+def max_upload_bytes(max_mb: int) -> Optional[int]:
+    return max_mb * 1024 * 1024 if max_mb > 0 else None
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    """Detect the file format from its first bytes ('pdf', 'png', 'jpeg', 'tiff', 'bmp')."""
+    if b"%PDF-" in head[:_PDF_HEADER_WINDOW]:
+        return "pdf"
+    for name, magic in _SIGNATURES:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+def check_format(ext: str, head: bytes) -> str:
+    """Raise UnsupportedUpload unless the content matches the extension's kind.
+
+    Image extensions accept any supported image format, since PIL opens by content.
+    """
+    kind = sniff_format(head)
+    if ext == ".pdf":
+        ok = kind == "pdf"
+    else:
+        ok = kind in IMAGE_FORMATS
+    if not ok:
+        raise UnsupportedUpload(f"content does not match {ext} (detected: {kind or 'unknown'})")
+    return kind
+
+
+async def save_upload(file: UploadFile, path: str, ext: str, max_bytes: Optional[int] = None) -> Tuple[str, int]:
+    """Stream an upload to path and return (sha256 hex, size in bytes).
+
+    Raises UnsupportedUpload on a bad magic number and UploadTooLarge past max_bytes;
+    in both cases the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f_out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                if size == 0:
+                    check_format(ext, chunk)
+                size += len(chunk)
+                if max_bytes is not None and size > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                digest.update(chunk)
+                f_out.write(chunk)
+        if size == 0:
+            raise UnsupportedUpload("empty file")
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return digest.hexdigest(), size
+
+
+class UploadSizeLimitMiddleware:
+    """ASGI middleware capping the request body size of upload endpoints.
+
+    Requests announcing a larger Content-Length get 413 without the body being read;
+    chunked requests are cut off as soon as the running byte count passes the limit.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int], paths: Iterable[str] = ("/upload",)):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            self.max_bytes is None
+            or scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in self.paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            error = UploadTooLarge(self.max_bytes)
+            response = PlainTextResponse(error.detail, status_code=error.status_code, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parser; FastAPI turns it into a 413 response
+                    raise UploadTooLarge(self.max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
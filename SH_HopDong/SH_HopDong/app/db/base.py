@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.schema import CreateColumn
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
@@ -87,6 +88,29 @@ engine = create_engine(SQLALCHEMY_DATABASE_URL, **get_engine_kwargs())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+def ensure_columns():
+    """Add columns introduced after a table was created (create_all only creates missing tables).
+
+    New columns must be nullable. Missing indexes are created as well, including
+    ones added later to an existing column.
+    """
+    inspector = inspect(engine)
+    keyword = "ADD COLUMN" if engine.dialect.name == "sqlite" else "ADD"
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} {keyword} {ddl}"))
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn, checkfirst=True)
+
 # Dependency to get database session
 def get_db():
     db = SessionLocal()
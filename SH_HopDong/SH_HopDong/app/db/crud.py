@@ -1,5 +1,6 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Query, Session, contains_eager, joinedload
 from datetime import datetime, timedelta
 
 from app.db import models
@@ -16,6 +17,7 @@ def create_contract(db: Session, contract_in: schemas.ContractCreate) -> models.
         status=contract_in.status or "pending",
         expiration_date=contract_in.expiration_date,
         contract_type_id=contract_in.contract_type_id,
+        file_hash=contract_in.file_hash,
     )
     db.add(contract)
     db.commit()
@@ -69,15 +71,94 @@ def count_pending_contracts(db: Session) -> int:
 def count_processed_contracts(db: Session) -> int:
     return db.query(models.Contract).filter(models.Contract.status == "processed").count()
 
-def count_expiring_contracts(db: Session, days: int = 30) -> int:
-    now = datetime.now()
-    soon = now + timedelta(days=days)
+def filter_amount(query: Query, amount_min: Optional[int] = None, amount_max: Optional[int] = None,
+                  currency: Optional[str] = None) -> Query:
+    """Restrict a contract query to a value range (indexed amount_value column)."""
+    if amount_min is not None:
+        query = query.filter(models.Contract.amount_value >= amount_min)
+    if amount_max is not None:
+        query = query.filter(models.Contract.amount_value <= amount_max)
+    if currency:
+        query = query.filter(models.Contract.amount_currency == currency.upper())
+    return query
+
+def filter_partner(query: Query, partner_id: Optional[int] = None) -> Query:
+    """Restrict a contract query to contracts linked to a partner (any role)."""
+    if partner_id is None:
+        return query
+    return query.filter(models.Contract.id.in_(partner_contract_ids(partner_id)))
+
+def partner_contract_ids(partner_id: int):
+    """Subquery of the contract ids linked to a partner, read from the (partner_id, contract_id) index."""
+    link = models.ContractPartner
+    return select(link.contract_id).where(link.partner_id == partner_id).distinct()
+
+def list_clauses(db: Session, category: Optional[str] = None, contract_type_id: Optional[int] = None,
+                 partner_id: Optional[int] = None, limit: int = 500) -> List[models.ContractClause]:
+    """Clauses with their contract loaded, filtered by category and the contract's type/partner.
+
+    Reads only the contract_clauses table (category index) and contracts, no .txt files.
+    """
+    clause = models.ContractClause
+    query = db.query(clause).join(clause.contract).options(contains_eager(clause.contract))
+    if category:
+        query = query.filter(clause.category == category)
+    if contract_type_id:
+        query = query.filter(models.Contract.contract_type_id == contract_type_id)
+    query = filter_partner(query, partner_id)
+    return query.order_by(clause.contract_id.desc(), clause.position).limit(limit).all()
+
+def count_contracts_by_partner(db: Session) -> Dict[int, int]:
+    """partner id -> number of linked contracts."""
+    link = models.ContractPartner
+    rows = db.query(link.partner_id, func.count(func.distinct(link.contract_id))).group_by(link.partner_id).all()
+    return dict(rows)
+
+def contract_value_stats(db: Session, currency: str = "VND") -> List[dict]:
+    """Contracts, valued contracts, total and average value per contract type, aggregated in SQL.
+
+    Only amounts in currency are summed; contracts without a type are grouped under None.
+    """
+    value = case((models.Contract.amount_currency == currency, models.Contract.amount_value))
+    rows = (
+        db.query(
+            models.ContractType.name,
+            func.count(models.Contract.id),
+            func.count(value),
+            func.sum(value),
+            func.avg(value),
+        )
+        .select_from(models.Contract)
+        .outerjoin(models.ContractType, models.Contract.contract_type_id == models.ContractType.id)
+        .group_by(models.ContractType.name)
+        .order_by(func.count(models.Contract.id).desc())
+        .all()
+    )
+    return [
+        {"type": name, "count": count, "valued": valued, "total_value": total, "avg_value": avg}
+        for name, count, valued, total, avg in rows
+    ]
+
+def count_contracts_by_status(db: Session) -> dict:
+    rows = db.query(models.Contract.status, func.count(models.Contract.id)).group_by(models.Contract.status).all()
+    return {status: count for status, count in rows}
+
+def _expiring(db: Session, days: int) -> Query:
+    """Processed contracts expiring from today through today + days (range on the expiration_date index)."""
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    soon = today + timedelta(days=days)
     return db.query(models.Contract).filter(
         models.Contract.status == "processed",
         models.Contract.expiration_date != None,
-        models.Contract.expiration_date >= now,
+        models.Contract.expiration_date >= today,
         models.Contract.expiration_date <= soon
-    ).count() 
+    )
+
+def count_expiring_contracts(db: Session, days: int = 30) -> int:
+    return _expiring(db, days).count()
+
+def list_expiring_contracts(db: Session, days: int = 90, limit: int = 500) -> List[models.Contract]:
+    return _expiring(db, days).order_by(models.Contract.expiration_date).limit(limit).all()
 
 # ContractType CRUD
 
@@ -209,4 +290,23 @@ def delete_tag(db: Session, id: int) -> bool:
         return False
     db.delete(obj)
     db.commit()
-    return True 
\ No newline at end of file
+    return True 
+
+# IngestJob CRUD
+
+def create_ingest_job(db: Session, contract_id: int, payload: Optional[dict] = None, max_attempts: int = 3) -> models.IngestJob:
+    obj = models.IngestJob(
+        contract_id=contract_id,
+        status="queued",
+        payload=payload or {},
+        attempts=0,
+        max_attempts=max_attempts,
+        next_run_at=datetime.now(),
+    )
+    db.add(obj)
+    db.commit()
+    db.refresh(obj)
+    return obj
+
+def get_ingest_job(db: Session, id: int) -> Optional[models.IngestJob]:
+    return db.query(models.IngestJob).filter(models.IngestJob.id == id).first()
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, JSON, ForeignKey, NVARCHAR
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, BigInteger, Boolean, Float, String, Text, DateTime, JSON, ForeignKey, Index, NVARCHAR
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -10,7 +12,9 @@ class ContractType(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(NVARCHAR(100), unique=True, nullable=False)
     description = Column(Text, nullable=True)
+    keywords = Column(Text, nullable=True)  # cụm từ nhận diện loại, mỗi dòng một cụm, có thể kèm trọng số "cụm từ: 3"
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True, default=datetime.now, onupdate=datetime.now)  # app.core.classifier theo dõi thay đổi
 
     # Relationships
     contracts = relationship("Contract", back_populates="contract_type")
@@ -26,7 +30,12 @@ class Partner(Base):
     email = Column(NVARCHAR(255), nullable=True)
     contact_person = Column(NVARCHAR(255), nullable=True)
     notes = Column(Text, nullable=True)
+    aliases = Column(Text, nullable=True)  # tên khác / viết tắt để nhận diện trong hợp đồng, mỗi dòng một tên
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), nullable=True, default=datetime.now, onupdate=datetime.now)  # app.core.partners theo dõi thay đổi
+
+    # Relationships
+    contract_links = relationship("ContractPartner", back_populates="partner", cascade="all, delete-orphan")
 
 class Department(Base):
     __tablename__ = "departments"
@@ -53,8 +62,132 @@ class Contract(Base):
     parsed_json = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     status = Column(NVARCHAR(32), nullable=False, default="pending")
-    expiration_date = Column(DateTime(timezone=True), nullable=True)
+    effective_date = Column(DateTime(timezone=True), nullable=True, index=True)  # ngày hiệu lực (parser: effective_on)
+    expiration_date = Column(DateTime(timezone=True), nullable=True, index=True)
     contract_type_id = Column(Integer, ForeignKey("contract_types.id"), nullable=True)
+    contract_type_source = Column(NVARCHAR(8), nullable=True)  # auto = bộ phân loại chọn (app.core.classifier); NULL = người dùng chọn
+    file_hash = Column(NVARCHAR(64), nullable=True, index=True)  # SHA-256 của file gốc
+    ingest_phase = Column(NVARCHAR(16), nullable=True)  # preview = mới phân tích các trang đầu, complete = đủ cả tài liệu
+    parser_version = Column(Integer, nullable=True, index=True)  # PARSER_VERSION của parsed_json; NULL = trước khi có version
+    amount_value = Column(BigInteger, nullable=True, index=True)  # giá trị hợp đồng đã chuẩn hóa (đơn vị nguyên của amount_currency)
+    amount_currency = Column(NVARCHAR(8), nullable=True)  # VND, USD, EUR
+
+    # Relationships
+    contract_type = relationship("ContractType", back_populates="contracts")
+    jobs = relationship("IngestJob", back_populates="contract", cascade="all, delete-orphan")
+    partner_links = relationship("ContractPartner", back_populates="contract", cascade="all, delete-orphan")
+    clauses = relationship("ContractClause", back_populates="contract", cascade="all, delete-orphan",
+                           order_by="ContractClause.position")
+
+class ContractPartner(Base):
+    """Partner found in a contract's party block (app.core.partners); one row per role."""
+    __tablename__ = "contract_partners"
+    __table_args__ = (
+        # "mọi hợp đồng của đối tác X" chỉ đọc index
+        Index("ix_contract_partners_partner_contract", "partner_id", "contract_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False, index=True)
+    partner_id = Column(Integer, ForeignKey("partners.id"), nullable=False)
+    role = Column(NVARCHAR(16), nullable=False)  # ben_a, ben_b, ben_mua, ben_ban
+    matched_by = Column(NVARCHAR(16), nullable=False)  # tax_id, name, alias
 
     # Relationships
-    contract_type = relationship("ContractType", back_populates="contracts")
\ No newline at end of file
+    contract = relationship("Contract", back_populates="partner_links")
+    partner = relationship("Partner", back_populates="contract_links")
+
+class ContractClause(Base):
+    """One "Điều N" clause of a contract (app.core.parser.segment_clauses)."""
+    __tablename__ = "contract_clauses"
+    __table_args__ = (
+        # "điều khoản thanh toán của mọi hợp đồng ..." lọc theo category rồi nối contracts
+        Index("ix_contract_clauses_category_contract", "category", "contract_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)  # thứ tự trong hợp đồng, từ 0
+    number = Column(Integer, nullable=False)  # N trong "Điều N"
+    heading = Column(NVARCHAR(255), nullable=False)
+    category = Column(NVARCHAR(32), nullable=False)  # thanh_toan, bao_hanh... (parser.CLAUSE_CATEGORIES), khac
+    start_offset = Column(Integer, nullable=False)  # vị trí ký tự trong file .txt
+    end_offset = Column(Integer, nullable=False)
+    excerpt = Column(Text, nullable=True)  # đầu nội dung điều khoản, hiển thị không cần đọc file
+
+    # Relationships
+    contract = relationship("Contract", back_populates="clauses")
+
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, ForeignKey("contracts.id"), nullable=False, index=True)
+    status = Column(NVARCHAR(32), nullable=False, default="queued", index=True)  # queued, running, done, failed, cancelled
+    payload = Column(JSON, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    next_run_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    locked_by = Column(NVARCHAR(100), nullable=True)
+    locked_at = Column(DateTime(timezone=True), nullable=True)
+    last_error = Column(Text, nullable=True)
+    cancel_requested = Column(Boolean, nullable=True, default=False)  # worker dừng giữa các trang
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    contract = relationship("Contract", back_populates="jobs")
+
+class OcrCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(NVARCHAR(200), unique=True, nullable=False)  # file_hash:lang:engine_version
+    file_hash = Column(NVARCHAR(64), nullable=False, index=True)
+    lang = Column(NVARCHAR(50), nullable=False)
+    engine_version = Column(NVARCHAR(50), nullable=False)  # SHA-1 của app.core.ocr.engine_description()
+    text = Column(Text, nullable=False)
+    pages_json = Column(JSON, nullable=True)  # nguồn / DPI / độ tin cậy của từng trang
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hits = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+class OcrCacheStats(Base):
+    __tablename__ = "ocr_cache_stats"
+
+    id = Column(Integer, primary_key=True)
+    hits = Column(BigInteger, nullable=False, default=0)
+    misses = Column(BigInteger, nullable=False, default=0)
+    evictions = Column(BigInteger, nullable=False, default=0)
+
+
+class IngestTiming(Base):
+    """One row per ingest attempt: wall/CPU milliseconds per stage (see app.core.metrics)."""
+    __tablename__ = "ingest_timings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    contract_id = Column(Integer, nullable=True, index=True)  # không FK: số liệu giữ lại khi xóa hợp đồng
+    job_id = Column(Integer, nullable=True)
+    outcome = Column(NVARCHAR(16), nullable=False, index=True)  # processed, retry, failed, cancelled
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    pages = Column(Integer, nullable=False, default=0)
+    bytes = Column(BigInteger, nullable=False, default=0)
+    confidence = Column(Float, nullable=True)  # độ tin cậy OCR trung bình của các trang
+    wall_ms = Column(Integer, nullable=False, default=0)  # toàn bộ lần chạy job
+    cpu_ms = Column(Integer, nullable=False, default=0)
+    upload_ms = Column(Integer, nullable=False, default=0)
+    upload_cpu_ms = Column(Integer, nullable=False, default=0)
+    render_ms = Column(Integer, nullable=False, default=0)  # tổng theo trang; chạy song song thì lớn hơn wall_ms
+    render_cpu_ms = Column(Integer, nullable=False, default=0)
+    ocr_ms = Column(Integer, nullable=False, default=0)
+    ocr_cpu_ms = Column(Integer, nullable=False, default=0)
+    txt_ms = Column(Integer, nullable=False, default=0)
+    txt_cpu_ms = Column(Integer, nullable=False, default=0)
+    docx_ms = Column(Integer, nullable=False, default=0)
+    docx_cpu_ms = Column(Integer, nullable=False, default=0)
+    parse_ms = Column(Integer, nullable=False, default=0)
+    parse_cpu_ms = Column(Integer, nullable=False, default=0)
+    db_ms = Column(Integer, nullable=False, default=0)
+    db_cpu_ms = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), nullable=False, index=True)
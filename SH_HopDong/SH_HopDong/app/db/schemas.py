@@ -5,6 +5,7 @@ from pydantic import BaseModel
 class ContractTypeBase(BaseModel):
     name: str
     description: Optional[str] = None
+    keywords: Optional[str] = None
 class ContractTypeCreate(ContractTypeBase):
     pass
 class ContractType(ContractTypeBase):
@@ -22,6 +23,7 @@ class PartnerBase(BaseModel):
     email: Optional[str] = None
     contact_person: Optional[str] = None
     notes: Optional[str] = None
+    aliases: Optional[str] = None
 class PartnerCreate(PartnerBase):
     pass
 class Partner(PartnerBase):
@@ -61,6 +63,7 @@ class ContractBase(BaseModel):
     status: Optional[str] = "pending"
     expiration_date: Optional[datetime] = None
     contract_type_id: Optional[int] = None
+    file_hash: Optional[str] = None
 
 class ContractCreate(ContractBase):
     pass
@@ -4,21 +4,28 @@ from datetime import datetime, timedelta
 from typing import Optional, List
 
 from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException, Depends, Query
-from fastapi.responses import RedirectResponse, FileResponse, HTMLResponse
+from fastapi.responses import RedirectResponse, FileResponse, HTMLResponse, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.core.ocr import extract_text_from_pdf, extract_text_from_image
-from app.core.parser import parse_contract_text
-from app.db.base import Base, engine, get_db
+from app.core.ingest import ALLOWED_EXTENSIONS, PHASE_PREVIEW, process_preview
+from app.core.jobs import WorkerPool, cancel_job, enqueue_contract
+from app.core.metrics import ingest_overview
+from app.core.ocr import LANG_AUTO
+from app.core.ocr_cache import cache_stats
+from app.core.parser import CLAUSE_CATEGORIES
+from app.core import classifier, renditions
+from app.core.timing import StageTimer
+from app.core.uploads import UploadSizeLimitMiddleware, UnsupportedUpload, max_upload_bytes, save_upload
+from app.db.base import Base, engine, get_db, ensure_columns
 from app.db import crud, schemas
 from app.db import models  # ensure models are imported
 
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import or_
-from docx import Document
 import orjson
 import html
 import re
@@ -51,11 +58,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Middleware để thêm UTF-8 headers
+# Chặn request tải lên quá lớn trước khi body được đọc
+app.add_middleware(UploadSizeLimitMiddleware, max_bytes=max_upload_bytes(settings.max_upload_mb))
+
+# Middleware để thêm UTF-8 headers (chỉ cho nội dung text; ảnh, file tải xuống và JSON giữ nguyên kiểu)
 @app.middleware("http")
 async def add_utf8_headers(request: Request, call_next):
     response = await call_next(request)
-    response.headers["Content-Type"] = "text/html; charset=utf-8"
+    content_type = response.headers.get("content-type", "")
+    if content_type.startswith("text/") and "charset" not in content_type:
+        response.headers["Content-Type"] = f"{content_type}; charset=utf-8"
     return response
 
 app.mount("/static", StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name="static")
@@ -66,9 +78,24 @@ templates.env.globals.update({
     'charset': 'utf-8'
 })
 
+ingest_workers: Optional[WorkerPool] = None
+
 @app.on_event("startup")
 def on_startup():
+    global ingest_workers
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    # Worker xử lý hàng đợi OCR; job đang chạy dở sẽ được nhận lại khi hết lease
+    if settings.ingest_workers > 0:
+        ingest_workers = WorkerPool(settings.ingest_workers)
+        ingest_workers.start()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    global ingest_workers
+    if ingest_workers is not None:
+        ingest_workers.stop()
+        ingest_workers = None
 
 
 @app.get("/")
@@ -115,13 +142,22 @@ def get_contract_types(db: Session = Depends(get_db)):
     return result
 
 @app.get("/api/contracts")
-def get_contracts(contract_type_id: Optional[int] = None, db: Session = Depends(get_db)):
-    """API endpoint to get contracts by type"""
+def get_contracts(
+    contract_type_id: Optional[int] = None,
+    amount_min: Optional[int] = None,
+    amount_max: Optional[int] = None,
+    currency: Optional[str] = None,
+    partner_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """API endpoint to get contracts by type, value range (amount_min/amount_max, currency) and linked partner"""
     try:
         query = db.query(models.Contract).options(joinedload(models.Contract.contract_type))
 
         if contract_type_id:
             query = query.filter(models.Contract.contract_type_id == contract_type_id)
+        query = crud.filter_amount(query, amount_min, amount_max, currency)
+        query = crud.filter_partner(query, partner_id)
 
         contracts = query.order_by(models.Contract.created_at.desc()).all()
 
@@ -132,7 +168,9 @@ def get_contracts(contract_type_id: Optional[int] = None, db: Session = Depends(
                 "original_filename": contract.original_filename,
                 "created_at": contract.created_at.isoformat(),
                 "status": contract.status,
-                "contract_type_name": contract.contract_type.name if contract.contract_type else None
+                "contract_type_name": contract.contract_type.name if contract.contract_type else None,
+                "amount_value": contract.amount_value,
+                "amount_currency": contract.amount_currency,
             })
 
         return result
@@ -140,6 +178,41 @@ def get_contracts(contract_type_id: Optional[int] = None, db: Session = Depends(
         print(f"Error getting contracts: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to get contracts")
 
+CLAUSE_LABELS = {category: label for category, label, _ in CLAUSE_CATEGORIES}
+CLAUSE_LABELS["khac"] = "Khác"
+
+
+@app.get("/api/clauses")
+def get_clauses(
+    category: Optional[str] = None,
+    contract_type_id: Optional[int] = None,
+    partner_id: Optional[int] = None,
+    limit: int = Query(500, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    """Điều khoản theo loại (thanh_toan, bao_hanh...) của mọi hợp đồng, lọc thêm theo loại hợp đồng / đối tác.
+
+    Đọc từ bảng contract_clauses (có sẵn đoạn trích), không mở file .txt.
+    """
+    if category and category not in CLAUSE_LABELS:
+        raise HTTPException(status_code=400, detail=f"category phải là một trong: {', '.join(CLAUSE_LABELS)}")
+    clauses = crud.list_clauses(db, category, contract_type_id, partner_id, limit)
+    return [
+        {
+            "contract_id": clause.contract_id,
+            "original_filename": clause.contract.original_filename,
+            "number": clause.number,
+            "heading": clause.heading,
+            "category": clause.category,
+            "category_label": CLAUSE_LABELS.get(clause.category, clause.category),
+            "start_offset": clause.start_offset,
+            "end_offset": clause.end_offset,
+            "excerpt": clause.excerpt,
+        }
+        for clause in clauses
+    ]
+
+
 @app.get("/api/search-in-contract")
 def search_in_contract(contract_id: int, q: str, db: Session = Depends(get_db)):
     """API endpoint to search within a specific contract"""
@@ -314,6 +387,12 @@ def contract_detail(contract_id: int, request: Request, db: Session = Depends(ge
             print(f"DEBUG - Error reading text file: {text_error}")
             contract_text = ""
 
+        # Số trang để hiển thị ảnh thu nhỏ: lấy từ kết quả OCR (bản xem nhanh chỉ có các trang đầu),
+        # hợp đồng cũ thì đọc file gốc
+        page_total = len(parsed.get("ocr_pages") or []) if contract.ingest_phase != PHASE_PREVIEW else 0
+        if not page_total and contract.original_path and os.path.exists(contract.original_path):
+            page_total = renditions.page_count(contract.original_path)
+
         print("DEBUG - About to render template")
 
         return templates.TemplateResponse("detail.html", {
@@ -324,6 +403,8 @@ def contract_detail(contract_id: int, request: Request, db: Session = Depends(ge
             "parties_json": parties_json,
             "signatures_json": signatures_json,
             "contract_text": contract_text,
+            "page_total": page_total,
+            "clause_labels": CLAUSE_LABELS,
         })
     except HTTPException:
         raise
@@ -334,6 +415,27 @@ def contract_detail(contract_id: int, request: Request, db: Session = Depends(ge
         raise HTTPException(status_code=500, detail=f"Lỗi server: {str(e)}")
 
 
+@app.get("/contracts/{contract_id}/pages/{page}/{kind}")
+def contract_page_image(contract_id: int, page: int, kind: str, request: Request, db: Session = Depends(get_db)):
+    """Ảnh thu nhỏ (thumb) hoặc xem trước (preview) của trang thứ page (bắt đầu từ 1).
+
+    Ảnh được render một lần rồi lưu trên đĩa; trình duyệt được phép cache lâu dài
+    (hợp đồng chưa có file_hash thì luôn hỏi lại) và kiểm tra lại bằng ETag.
+    """
+    if kind not in renditions.RENDITIONS:
+        raise HTTPException(status_code=400, detail="Định dạng không được hỗ trợ")
+    contract = crud.get_contract(db, contract_id)
+    if not contract:
+        raise HTTPException(status_code=404, detail="Hợp đồng không tồn tại")
+    headers = {"Cache-Control": renditions.cache_control(contract), "ETag": renditions.etag(contract, page - 1, kind)}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    path = renditions.get_rendition(contract, page - 1, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Trang không tồn tại")
+    return FileResponse(path=path, media_type="image/jpeg", headers=headers)
+
+
 @app.post("/contracts/{contract_id}/delete")
 def delete_contract(contract_id: int, db: Session = Depends(get_db)):
     ok = crud.delete_contract(db, contract_id)
@@ -349,7 +451,7 @@ def delete_contract(contract_id: int, db: Session = Depends(get_db)):
 async def upload_file(
     request: Request,
     files: List[UploadFile] = File(...),
-    lang: str = Form("vie+eng"),
+    lang: str = Form(LANG_AUTO),
     contract_type_id: Optional[int] = Form(default=None),
     db: Session = Depends(get_db),
 ):
@@ -357,101 +459,118 @@ async def upload_file(
     if not files:
         raise HTTPException(status_code=400, detail="Vui lòng chọn tệp")
 
+    max_bytes = max_upload_bytes(settings.max_upload_mb)
+    rejected = []
     try:
         # contract_type_id đã được truyền trực tiếp từ form
         last_contract = None
+        previewed = False
+        # Chỉ xem nhanh khi tải lên một file (sẽ mở trang chi tiết); nhiều file thì xếp hàng ngay
+        preview = len(files) == 1
         for file in files:
             original_filename = file.filename or "uploaded"
             ext = os.path.splitext(original_filename)[1].lower()
             
             # Kiểm tra định dạng file
-            if ext not in [".pdf", ".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"]:
+            if ext not in ALLOWED_EXTENSIONS:
                 continue  # Bỏ qua file không hợp lệ
             
             uid = uuid.uuid4().hex
             saved_name = f"{uid}{ext}"
             saved_path = os.path.join(UPLOAD_DIR, saved_name)
             
-            # Lưu file gốc
-            with open(saved_path, "wb") as f_out:
-                f_out.write(await file.read())
-            
-            # Xử lý OCR
-            try:
-                if ext in [".pdf"]:
-                    text = extract_text_from_pdf(saved_path, lang=lang)
-                elif ext in [".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff"]:
-                    text = extract_text_from_image(saved_path, lang=lang)
-                else:
-                    text = ""
-            except Exception as e:
-                print(f"OCR Error for {original_filename}: {str(e)}")
-                text = f"Lỗi OCR: {str(e)}"
-            
-            # Tạo file txt
-            txt_path = os.path.join(OUTPUT_DIR, f"{uid}.txt")
-            with open(txt_path, "w", encoding="utf-8") as f_txt:
-                f_txt.write(text)
-            
-            # Tạo file docx
-            docx_path = os.path.join(OUTPUT_DIR, f"{uid}.docx")
-            document = Document()
-            document.add_paragraph(text)
-            document.save(docx_path)
-            
-            # Parse contract
+            # Lưu file gốc theo từng khối, kiểm tra magic bytes ở khối đầu
+            upload_timer = StageTimer()
             try:
-                parsed = parse_contract_text(text)
-            except Exception as e:
-                print(f"Parse Error for {original_filename}: {str(e)}")
-                parsed = {"title": original_filename, "content": text}
+                with upload_timer.stage("upload"):
+                    file_hash, _ = await save_upload(file, saved_path, ext, max_bytes)
+            except UnsupportedUpload as e:
+                print(f"Rejected upload {original_filename}: {str(e)}")
+                rejected.append(original_filename)
+                continue
             
-            if contract_type_id:
-                try:
-                    # Get contract type from database
-                    contract_type_obj = crud.get_contract_type(db, contract_type_id)
-                    if contract_type_obj:
-                        parsed["type"] = str(contract_type_id)
-                        parsed["type_label"] = contract_type_obj.name
-                        parsed["type_description"] = contract_type_obj.description
-                except Exception as e:
-                    print(f"Error getting contract type {contract_type_id}: {str(e)}")
-                    parsed["type"] = str(contract_type_id)
-                    parsed["type_label"] = f"Contract Type {contract_type_id}"
-            
-            # Tạo contract trong database
+            # Tạo contract ở trạng thái pending; OCR, .txt, .docx và parse do worker xử lý
             contract_in = schemas.ContractCreate(
                 original_filename=original_filename,
                 original_path=saved_path,
-                text_path=txt_path,
-                docx_path=docx_path,
-                parsed_json=parsed,
-                status="processed",  # Đổi thành processed ngay
+                text_path=os.path.join(OUTPUT_DIR, f"{uid}.txt"),
+                docx_path=os.path.join(OUTPUT_DIR, f"{uid}.docx"),
+                parsed_json=None,
+                status="pending",
                 expiration_date=None,
-                contract_type_id=contract_type_id
+                contract_type_id=contract_type_id,
+                file_hash=file_hash
             )
-            
-            if parsed.get("expiration_date"):
-                try:
-                    from dateutil import parser as date_parser
-                    contract_in.expiration_date = date_parser.parse(parsed["expiration_date"])
-                except Exception:
-                    contract_in.expiration_date = None
-            
             contract = crud.create_contract(db, contract_in)
-            db.commit()
-            db.refresh(contract)
+            # Giai đoạn 1: OCR và phân tích các trang đầu ngay trong request (tiêu đề, loại, các bên).
+            # Job được tạo sau đó để worker không xử lý song song cùng các trang này.
+            try:
+                if preview:
+                    previewed = await run_in_threadpool(process_preview, db, contract, lang, None, upload_timer)
+            except Exception as e:
+                db.rollback()
+                print(f"Preview Error for {original_filename}: {str(e)}")
+                previewed = False
+            job = enqueue_contract(db, contract, lang=lang, timings=upload_timer.to_dict())
             last_contract = contract
-            print(f"DEBUG - Created contract: {contract.id}, status: {contract.status}")  # Debug log
+            print(f"DEBUG - Queued contract: {contract.id}, job: {job.id}")  # Debug log
             
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Upload Error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Lỗi khi tải lên: {str(e)}")
-    # Sau khi upload thành công, chuyển về trang chủ để thấy thống kê cập nhật
+    if last_contract is None and rejected:
+        raise HTTPException(status_code=400, detail=f"Tệp không đúng định dạng: {', '.join(rejected)}")
+    # Một file đã có bản xem nhanh: mở trang chi tiết; còn lại chuyển về trang chủ để thấy thống kê cập nhật
+    if previewed:
+        return RedirectResponse(url=f"/contracts/{last_contract.id}", status_code=303)
     print("DEBUG - Redirecting to home page")  # Debug log
     return RedirectResponse(url="/", status_code=303)
 
 
+def _job_status(job: models.IngestJob) -> dict:
+    contract = job.contract
+    return {
+        "id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "next_run_at": job.next_run_at.isoformat() if job.next_run_at else None,
+        "last_error": job.last_error,
+        "cancel_requested": bool(job.cancel_requested),
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "contract": {
+            "id": contract.id,
+            "original_filename": contract.original_filename,
+            "status": contract.status,
+            "ingest_phase": contract.ingest_phase,
+            "title": (contract.parsed_json or {}).get("title"),
+        } if contract else None,
+    }
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job_status(job_id: int, db: Session = Depends(get_db)):
+    """Trạng thái xử lý của một job trong hàng đợi tải lên"""
+    job = crud.get_ingest_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_status(job)
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_ingest_job(job_id: int, db: Session = Depends(get_db)):
+    """Hủy job: job đang chờ bị hủy ngay, job đang chạy dừng trước trang kế tiếp"""
+    job = crud.get_ingest_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in ("done", "failed", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    return _job_status(cancel_job(db, job))
+
+
 # Route download cũ - đã được thay thế bằng route mới bên dưới
 # @app.get("/download/{contract_id}/{kind}")
 # def download_file(contract_id: int, kind: str, db: Session = Depends(get_db)):
@@ -669,13 +788,28 @@ def api_search(
         raise HTTPException(status_code=500, detail="Search failed")
 
 @app.post("/types")
-def contract_type_create(request: Request, name: str = Form(...), description: str = Form(""), db: Session = Depends(get_db)):
-    crud.create_contract_type(db, schemas.ContractTypeCreate(name=name, description=description))
+def contract_type_create(request: Request, name: str = Form(...), description: str = Form(""), keywords: str = Form(""),
+                         db: Session = Depends(get_db)):
+    crud.create_contract_type(db, schemas.ContractTypeCreate(name=name, description=description,
+                                                             keywords=keywords.strip() or None))
+    classifier.invalidate()
+    return RedirectResponse(url="/types", status_code=303)
+
+@app.post("/types/{type_id}/keywords")
+def contract_type_keywords(type_id: int, keywords: str = Form(""), db: Session = Depends(get_db)):
+    """Sửa từ khóa nhận diện; hợp đồng tải lên sau đó được phân loại theo từ khóa mới"""
+    contract_type = crud.get_contract_type(db, type_id)
+    if not contract_type:
+        raise HTTPException(status_code=404, detail="Không tìm thấy loại hợp đồng")
+    crud.update_contract_type(db, type_id, schemas.ContractTypeCreate(
+        name=contract_type.name, description=contract_type.description, keywords=keywords.strip() or None))
+    classifier.invalidate()
     return RedirectResponse(url="/types", status_code=303)
 
 @app.post("/types/{type_id}/delete")
 def contract_type_delete(type_id: int, db: Session = Depends(get_db)):
     crud.delete_contract_type(db, type_id)
+    classifier.invalidate()
     return RedirectResponse(url="/types", status_code=303)
 
 @app.get("/categories")
@@ -686,7 +820,12 @@ def categories_page(request: Request):
 @app.get("/partners")
 def partner_list(request: Request, db: Session = Depends(get_db)):
     partners = crud.list_partners(db)
-    return templates.TemplateResponse("partners.html", {"request": request, "partners": partners})
+    contract_counts = crud.count_contracts_by_partner(db)
+    return templates.TemplateResponse("partners.html", {
+        "request": request,
+        "partners": partners,
+        "contract_counts": contract_counts,
+    })
 
 @app.post("/partners")
 def partner_create(
@@ -699,6 +838,7 @@ def partner_create(
     email: str = Form(""),
     contact_person: str = Form(""),
     notes: str = Form(""),
+    aliases: str = Form(""),
     db: Session = Depends(get_db)
 ):
     partner_data = schemas.PartnerCreate(
@@ -709,7 +849,8 @@ def partner_create(
         phone=phone if phone else None,
         email=email if email else None,
         contact_person=contact_person if contact_person else None,
-        notes=notes if notes else None
+        notes=notes if notes else None,
+        aliases=aliases.strip() if aliases.strip() else None
     )
     crud.create_partner(db, partner_data)
     return RedirectResponse(url="/partners", status_code=303)
@@ -752,19 +893,46 @@ def tag_delete(tag_id: int, db: Session = Depends(get_db)):
     return RedirectResponse(url="/tags", status_code=303) 
 
 # Báo cáo
+STATUS_LABELS = {"processed": "Đã xử lý", "pending": "Chờ xử lý", "expired": "Hết hạn"}
+
+
+def format_vnd(value: Optional[float]) -> Optional[str]:
+    """1250000000 -> "1,25 tỷ", 500000000 -> "500 triệu", 850000 -> "850.000 đ"."""
+    if value is None:
+        return None
+    for scale, unit in ((10**9, "tỷ"), (10**6, "triệu")):
+        if value >= scale:
+            return f"{value / scale:.2f}".rstrip("0").rstrip(".").replace(".", ",") + f" {unit}"
+    return f"{round(value):,}".replace(",", ".") + " đ"
+
+
 @app.get("/reports/contract-stats")
 def contract_stats_report(request: Request, db: Session = Depends(get_db)):
-    # TODO: Implement actual statistics calculation
+    # Số lượng, tổng và trung bình giá trị (VND) theo loại được tính bằng SQL trên cột amount_value
+    rows = crud.contract_value_stats(db, currency="VND")
+    total = sum(r["count"] for r in rows) or 1
     contract_stats = [
-        {"type": "Lao động", "count": 15, "percentage": 30.0, "avg_value": "500 triệu"},
-        {"type": "Dịch vụ", "count": 25, "percentage": 50.0, "avg_value": "200 triệu"},
-        {"type": "Mua bán", "count": 10, "percentage": 20.0, "avg_value": "1 tỷ"}
+        {
+            "type": r["type"] or "Chưa phân loại",
+            "count": r["count"],
+            "percentage": 100.0 * r["count"] / total,
+            "valued": r["valued"],
+            "total_value": format_vnd(r["total_value"]),
+            "avg_value": format_vnd(r["avg_value"]),
+        }
+        for r in rows
     ]
-    
-    type_labels = ["Lao động", "Dịch vụ", "Mua bán"]
-    type_data = [15, 25, 10]
-    status_labels = ["Đã xử lý", "Chờ xử lý", "Hết hạn", "Khác"]
-    status_data = [35, 10, 3, 2]
+
+    type_labels = [s["type"] for s in contract_stats]
+    type_data = [s["count"] for s in contract_stats]
+    by_status = crud.count_contracts_by_status(db)
+    status_labels = [STATUS_LABELS[s] for s in STATUS_LABELS if s in by_status]
+    status_data = [by_status[s] for s in STATUS_LABELS if s in by_status]
+    other = sum(count for status, count in by_status.items() if status not in STATUS_LABELS)
+    if other:
+        status_labels.append("Khác")
+        status_data.append(other)
+    # TODO: hợp đồng chưa gắn với phòng ban, biểu đồ này vẫn là dữ liệu mẫu
     dept_labels = ["Kinh doanh", "Nhân sự", "Kế toán", "Kỹ thuật"]
     dept_data = [20, 15, 10, 5]
     
@@ -779,34 +947,37 @@ def contract_stats_report(request: Request, db: Session = Depends(get_db)):
         "dept_data": dept_data
     })
 
+def _party_name(block: Optional[str]) -> Optional[str]:
+    """ "BÊN B: CÔNG TY XYZ\nĐịa chỉ: ..." -> "CÔNG TY XYZ" """
+    if not block:
+        return None
+    first = block.splitlines()[0]
+    return (first.split(":", 1)[1] if ":" in first else first).strip() or None
+
+
 @app.get("/reports/expiring")
 def expiring_report(request: Request, db: Session = Depends(get_db)):
-    # TODO: Implement actual expiring contracts calculation
-    expiring_contracts = [
-        {
-            "id": 1,
-            "original_filename": "hop_dong_abc.pdf",
-            "partner_name": "Công ty ABC",
-            "expiration_date": datetime.now() + timedelta(days=25),
-            "days_left": 25,
-            "status": "processed"
-        },
-        {
-            "id": 2,
-            "original_filename": "hop_dong_xyz.pdf",
-            "partner_name": "Công ty XYZ",
-            "expiration_date": datetime.now() + timedelta(days=45),
-            "days_left": 45,
-            "status": "processed"
-        }
-    ]
-    
+    # Hợp đồng hết hạn trong 90 ngày tới: truy vấn theo khoảng trên chỉ mục expiration_date
+    today = datetime.now().date()
+    expiring_contracts = []
+    for c in crud.list_expiring_contracts(db, days=90):
+        parties = (c.parsed_json or {}).get("parties") or {}
+        expiring_contracts.append({
+            "id": c.id,
+            "original_filename": c.original_filename,
+            "partner_name": _party_name(parties.get("ben_b") or parties.get("ben_ban")),
+            "expiration_date": c.expiration_date,
+            "days_left": (c.expiration_date.date() - today).days,
+            "status": c.status,
+        })
+    days = [c["days_left"] for c in expiring_contracts]
+
     return templates.TemplateResponse("reports/expiring.html", {
         "request": request,
         "expiring_contracts": expiring_contracts,
-        "urgent_count": 1,
-        "warning_count": 1,
-        "info_count": 0
+        "urgent_count": sum(1 for d in days if d <= 30),
+        "warning_count": sum(1 for d in days if 30 < d <= 60),
+        "info_count": sum(1 for d in days if d > 60)
     })
 
 @app.get("/reports/legal-risk")
@@ -924,31 +1095,33 @@ def ocr_settings(request: Request, db: Session = Depends(get_db)):
         "primary_language": "vie+eng",
         "secondary_language": "",
         "ocr_quality": "balanced",
-        "image_processing": "basic",
-        "enable_preprocessing": True,
+        "image_processing": settings.ocr_image_processing,
+        "enable_preprocessing": settings.ocr_preprocess,
         "enable_postprocessing": True,
-        "enable_confidence_check": True,
+        "enable_confidence_check": settings.ocr_confidence_check,
         "enable_auto_correction": False,
-        "confidence_threshold": 70,
-        "timeout_seconds": 300
-    }
-    
-    ocr_stats = {
-        "today_processed": 25,
-        "today_success": 23,
-        "today_failed": 2,
-        "month_total": 450,
-        "month_success_rate": 95.6,
-        "avg_processing_time": 2.3,
-        "accuracy_rate": 92.8
+        "confidence_threshold": settings.ocr_confidence_threshold,
+        "timeout_seconds": settings.ocr_timeout_seconds,
+        "page_timeout_seconds": settings.ocr_page_timeout_seconds
     }
     
     return templates.TemplateResponse("settings/ocr.html", {
         "request": request,
         "ocr_config": ocr_config,
-        "ocr_stats": ocr_stats
+        "ocr_stats": ingest_overview(db),
+        "cache_stats": cache_stats(db)
     })
 
+@app.get("/api/ocr/cache")
+def ocr_cache_stats(db: Session = Depends(get_db)):
+    """Thống kê cache kết quả OCR (hit/miss, dung lượng)"""
+    return cache_stats(db)
+
+@app.get("/api/ocr/stats")
+def ocr_ingest_stats(db: Session = Depends(get_db)):
+    """Thống kê xử lý: số lượng theo ngày/tháng, tỷ lệ thành công, độ trễ và thời gian từng bước"""
+    return ingest_overview(db)
+
 @app.get("/settings/automation")
 def automation_settings(request: Request, db: Session = Depends(get_db)):
     # TODO: Implement actual automation settings
@@ -0,0 +1,52 @@
+"""Phân tích lại các hợp đồng đã lưu sau khi parser thay đổi (tăng PARSER_VERSION).
+
+Chỉ xử lý hợp đồng có parser_version cũ hơn; dừng giữa chừng thì chạy lại lệnh
+để tiếp tục.
+
+    python -m app.reparse                 # số tiến trình = số CPU
+    python -m app.reparse -n 1 --batch 200
+    python -m app.reparse --dry-run       # chỉ đếm số hợp đồng cần phân tích lại
+"""
+import argparse
+import os
+
+from app.core.parser import PARSER_VERSION
+from app.core.reparse import ReparseResult, reparse_contracts, stale_contracts
+from app.db.base import Base, SessionLocal, engine, ensure_columns
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Re-parse stored contracts with the current parser")
+    ap.add_argument("-n", "--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--batch", type=int, default=500, help="hợp đồng mỗi transaction")
+    ap.add_argument("--limit", type=int, default=None, help="tối đa số hợp đồng trong lần chạy này")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    db = SessionLocal()
+    try:
+        stale = stale_contracts(db).count()
+        print(f"Parser version {PARSER_VERSION}: {stale} contract(s) to re-parse")
+        if args.dry_run or not stale:
+            return
+
+        def progress(totals: ReparseResult) -> None:
+            print(f"  {totals.parsed + totals.failed + totals.skipped}/{stale} "
+                  f"(parsed {totals.parsed}, failed {totals.failed}, skipped {totals.skipped})")
+
+        try:
+            totals = reparse_contracts(db, workers=args.workers, batch_size=args.batch, limit=args.limit,
+                                       progress=progress)
+        except KeyboardInterrupt:
+            print("Interrupted; committed batches are kept, run again to continue")
+            return
+        print(f"Done in {totals.seconds:.1f}s: parsed {totals.parsed}, failed {totals.failed}, "
+              f"skipped {totals.skipped}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""Chạy worker xử lý hàng đợi tải lên độc lập với web server.
+
+    python -m app.worker            # 1 worker trong tiến trình hiện tại
+    python -m app.worker -n 4       # 4 tiến trình worker
+"""
+import argparse
+
+from app.core.jobs import WorkerPool, run_worker
+from app.db.base import Base, engine, ensure_columns
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Ingest queue worker")
+    ap.add_argument("-n", "--workers", type=int, default=1)
+    args = ap.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    if args.workers <= 1:
+        try:
+            run_worker()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    pool = WorkerPool(args.workers)
+    pool.start()
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Bộ hợp đồng tiếng Việt tổng hợp (có dấu) kèm ground truth, tạo hoàn toàn offline
+bằng fitz + PIL, dùng cho các benchmark OCR.
+
+Mỗi trang là một trong hai loại:
+  text - trang PDF có text layer (chữ thật, font hỗ trợ tiếng Việt)
+  scan - cùng nội dung được render thành ảnh xám, thêm nhiễu giống bản scan
+         (xoay nhẹ, mờ, nhiễu hạt, nén JPEG) rồi chèn lại thành trang chỉ có ảnh
+
+Nội dung là tiếng Việt ("vie"), tiếng Anh ("eng") hoặc trộn theo trang ("mixed",
+như hợp đồng có phụ lục tiếng Anh). Cùng seed luôn sinh ra cùng nội dung, nên kết
+quả giữa các lần chạy so sánh được.
+"""
+import os
+import random
+import unicodedata
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+from PIL import Image, ImageFilter
+
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    r"C:\Windows\Fonts\arial.ttf",
+    r"C:\Windows\Fonts\times.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial.ttf",
+]
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size("a4")
+MARGIN = 64
+FONT_SIZE = 11
+LINE_HEIGHT = 17
+
+HEADINGS = [
+    "Đối tượng của hợp đồng",
+    "Giá trị hợp đồng và phương thức thanh toán",
+    "Thời hạn thực hiện hợp đồng",
+    "Quyền và nghĩa vụ của Bên A",
+    "Quyền và nghĩa vụ của Bên B",
+    "Bảo hành và bảo trì",
+    "Phạt vi phạm và bồi thường thiệt hại",
+    "Bất khả kháng",
+    "Giải quyết tranh chấp",
+    "Điều khoản chung",
+]
+SENTENCES = [
+    "Bên A đồng ý bán và Bên B đồng ý mua hàng hóa theo danh mục đính kèm hợp đồng này.",
+    "Tổng giá trị hợp đồng là {amount} đồng, đã bao gồm thuế giá trị gia tăng.",
+    "Bên B thanh toán cho Bên A bằng hình thức chuyển khoản trong vòng {days} ngày kể từ ngày nhận hóa đơn.",
+    "Hợp đồng có hiệu lực từ ngày {date} và kéo dài trong thời hạn {months} tháng.",
+    "Hàng hóa phải được giao đúng số lượng, chất lượng và quy cách đã thỏa thuận.",
+    "Mọi sửa đổi, bổ sung hợp đồng phải được lập thành văn bản và có chữ ký của hai bên.",
+    "Trường hợp một bên vi phạm nghĩa vụ, bên đó phải chịu phạt {percent}% giá trị phần vi phạm.",
+    "Các tranh chấp phát sinh trước hết được giải quyết bằng thương lượng, hòa giải.",
+    "Nếu không thương lượng được, tranh chấp sẽ được đưa ra Tòa án nhân dân có thẩm quyền.",
+    "Bên A có trách nhiệm bảo hành sản phẩm trong thời gian {months} tháng kể từ ngày bàn giao.",
+    "Đại diện Bên A là ông {name}, chức vụ Giám đốc, theo giấy ủy quyền số {number}/UQ.",
+    "Đại diện Bên B là bà {name}, chức vụ Trưởng phòng Hành chính – Nhân sự.",
+    "Địa chỉ giao hàng: số {number} đường Nguyễn Thị Minh Khai, phường Đa Kao, Quận 1, TP. Hồ Chí Minh.",
+    "Hợp đồng được lập thành {copies} bản có giá trị pháp lý như nhau, mỗi bên giữ {half} bản.",
+    "Sự kiện bất khả kháng bao gồm thiên tai, hỏa hoạn, dịch bệnh và các trường hợp khác theo luật định.",
+]
+EN_HEADINGS = [
+    "Subject of the Contract",
+    "Contract Value and Payment Terms",
+    "Term of Performance",
+    "Rights and Obligations of Party A",
+    "Rights and Obligations of Party B",
+    "Warranty and Maintenance",
+    "Penalties and Compensation for Damages",
+    "Force Majeure",
+    "Dispute Resolution",
+    "General Provisions",
+]
+EN_SENTENCES = [
+    "Party A agrees to sell and Party B agrees to purchase the goods listed in the appendix to this contract.",
+    "The total contract value is {amount} VND, including value added tax.",
+    "Party B shall pay Party A by bank transfer within {days} days of receiving the invoice.",
+    "This contract takes effect on {date} and remains in force for a period of {months} months.",
+    "The goods shall be delivered in the agreed quantity, quality and specifications.",
+    "Any amendment to this contract shall be made in writing and signed by both parties.",
+    "If either party breaches its obligations, that party shall pay a penalty of {percent}% of the breached value.",
+    "Any dispute arising from this contract shall first be settled by negotiation and conciliation.",
+    "If the parties fail to reach an agreement, the dispute shall be referred to the competent court.",
+    "Party A shall provide a warranty for the products for {months} months from the date of handover.",
+    "Party A is represented by Mr. {name}, Director, under power of attorney No. {number}/UQ.",
+    "Party B is represented by Ms. {name}, Head of the Administration and Human Resources Department.",
+    "Delivery address: No. {number} Nguyen Thi Minh Khai Street, Da Kao Ward, District 1, Ho Chi Minh City.",
+    "This contract is made in {copies} copies of equal legal validity, each party keeping {half} copies.",
+    "Force majeure events include natural disasters, fire, epidemics and other cases provided by law.",
+]
+LANGUAGES = ("vie", "eng", "mixed")
+SURNAMES = ["Nguyễn", "Trần", "Lê", "Phạm", "Hoàng", "Huỳnh", "Phan", "Vũ", "Võ", "Đặng", "Bùi", "Đỗ"]
+MIDDLE = ["Văn", "Thị", "Hữu", "Minh", "Thanh", "Quốc", "Ngọc", "Đức"]
+GIVEN = ["An", "Bình", "Cường", "Dũng", "Hạnh", "Hương", "Khánh", "Lan", "Phúc", "Quân", "Thảo", "Tuấn", "Yến"]
+
+
+@dataclass
+class SyntheticDocument:
+    path: str
+    truth: List[str]  # ground truth theo từng trang
+    kinds: List[str]  # "text" hoặc "scan" theo từng trang
+    images: List[str] = field(default_factory=list)  # file ảnh rời (nếu có)
+    languages: List[str] = field(default_factory=list)  # "vie" hoặc "eng" theo từng trang
+
+
+def find_font(font: Optional[str] = None) -> str:
+    for path in [font, os.getenv("BENCH_FONT")] + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    raise SystemExit("Không tìm thấy font hỗ trợ tiếng Việt; chỉ định bằng --font hoặc BENCH_FONT")
+
+
+def normalize(text: str) -> str:
+    """Chuẩn hóa để so sánh: NFC và gộp khoảng trắng."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def _sentence(rng: random.Random, sentences: List[str] = SENTENCES) -> str:
+    copies = rng.choice([2, 4, 6])
+    return rng.choice(sentences).format(
+        amount=f"{rng.randint(10, 9999) * 1_000_000:,}".replace(",", "."),
+        days=rng.choice([7, 10, 15, 30, 45]),
+        date=f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2020, 2026)}",
+        months=rng.choice([3, 6, 12, 24, 36]),
+        percent=rng.choice([5, 8, 10, 12]),
+        name=f"{rng.choice(SURNAMES)} {rng.choice(MIDDLE)} {rng.choice(GIVEN)}",
+        number=rng.randint(1, 999),
+        copies=copies,
+        half=copies // 2,
+    )
+
+
+def _wrap(text: str, font: fitz.Font, width: float, advances: dict) -> List[str]:
+    # Font.text_length mã hóa lại từng ký tự qua MuPDF, nên cache độ rộng theo ký tự
+    def text_width(s: str) -> float:
+        total = 0.0
+        for c in s:
+            w = advances.get(c)
+            if w is None:
+                w = advances[c] = font.glyph_advance(ord(c)) * FONT_SIZE
+            total += w
+        return total
+
+    lines, current = [], ""
+    for word in text.split():
+        candidate = f"{current} {word}".strip()
+        if current and text_width(candidate) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+
+def contract_lines(rng: random.Random, pages: int, font: fitz.Font, language: str = "vie") -> List[List[str]]:
+    """Sinh nội dung hợp đồng ("vie" hoặc "eng"), đã ngắt dòng và chia trang."""
+    width = PAGE_WIDTH - 2 * MARGIN
+    per_page = int((PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT)
+    number = f"{rng.randint(1, 999)}/{rng.randint(2020, 2026)}/HĐMB"
+    if language == "eng":
+        lines = ["SOCIALIST REPUBLIC OF VIETNAM", "Independence – Freedom – Happiness", f"SALE AND PURCHASE CONTRACT No. {number}"]
+        headings, sentences, article_label = EN_HEADINGS, EN_SENTENCES, "Article"
+    else:
+        lines = ["CỘNG HÒA XÃ HỘI CHỦ NGHĨA VIỆT NAM", "Độc lập – Tự do – Hạnh phúc", f"HỢP ĐỒNG MUA BÁN HÀNG HÓA Số {number}"]
+        headings, sentences, article_label = HEADINGS, SENTENCES, "Điều"
+    article = 0
+    advances: dict = {}
+    while len(lines) < pages * per_page:
+        article += 1
+        lines.append(f"{article_label} {article}. {headings[(article - 1) % len(headings)]}")
+        for _ in range(rng.randint(2, 5)):
+            lines.extend(_wrap(_sentence(rng, sentences), font, width, advances))
+    return [lines[i * per_page:(i + 1) * per_page] for i in range(pages)]
+
+
+def _party_lines(rng: random.Random) -> List[str]:
+    lines = [
+        f"Hôm nay, ngày {rng.randint(1, 28)} tháng {rng.randint(1, 12)} năm {rng.randint(2020, 2026)}, "
+        "tại TP. Hồ Chí Minh, chúng tôi gồm:",
+        "",
+    ]
+    for label, role in (("BÊN A", "BÊN BÁN"), ("BÊN B", "BÊN MUA")):
+        lines += [
+            f"{label} ({role}): CÔNG TY TNHH {rng.choice(SURNAMES).upper()} {rng.choice(GIVEN).upper()}",
+            f"Địa chỉ: số {rng.randint(1, 999)} đường Lê Lợi, phường Bến Nghé, Quận 1, TP. Hồ Chí Minh",
+            f"Mã số thuế: 03{rng.randint(10_000_000, 99_999_999)}",
+            f"Đại diện: ông/bà {rng.choice(SURNAMES)} {rng.choice(MIDDLE)} {rng.choice(GIVEN)} – Giám đốc",
+            "",
+        ]
+    return lines
+
+
+def contract_text(rng: random.Random, pages: int, font: fitz.Font, language: str = "vie") -> str:
+    """Toàn văn một hợp đồng giống kết quả OCR: các trang nối bằng dòng trống (như join_pages),
+    khối thông tin các bên sau tiêu đề và khối chữ ký ở cuối."""
+    content, _ = _content(rng, pages, font, language)
+    first = content[0]
+    content[0] = first[:3] + [""] + _party_lines(rng) + first[3:]
+    content[-1] = content[-1] + ["", "ĐẠI DIỆN BÊN A                    ĐẠI DIỆN BÊN B", "(Ký tên, đóng dấu)          (Ký tên, đóng dấu)"]
+    return "\n\n".join("\n".join(lines) for lines in content)
+
+
+def _content(rng: random.Random, pages: int, font: fitz.Font, language: str):
+    """(dòng theo trang, ngôn ngữ theo trang); "mixed" chọn ngẫu nhiên ngôn ngữ từng trang."""
+    if language not in LANGUAGES:
+        raise ValueError(f"language must be one of {LANGUAGES}")
+    if language != "mixed":
+        return contract_lines(rng, pages, font, language), [language] * pages
+    languages = [rng.choice(["vie", "eng"]) for _ in range(pages)]
+    streams = {lang: contract_lines(rng, pages, font, lang) for lang in ("vie", "eng")}
+    return [streams[lang][i] for i, lang in enumerate(languages)], languages
+
+
+def _text_page(doc: fitz.Document, lines: List[str], font: fitz.Font) -> fitz.Page:
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    writer = fitz.TextWriter(page.rect)  # nhanh hơn nhiều so với page.insert_text từng dòng
+    y = MARGIN + FONT_SIZE
+    for line in lines:
+        writer.append((MARGIN, y), line, font=font, fontsize=FONT_SIZE)
+        y += LINE_HEIGHT
+    writer.write_text(page)
+    return page
+
+
+def degrade(image: Image.Image, rng: random.Random, noise: int) -> Image.Image:
+    """Làm ảnh trông như bản scan. noise: 0 = sạch, 1 = nhẹ, 2 = nặng."""
+    if noise <= 0:
+        return image
+    image = image.rotate(rng.uniform(-0.6, 0.6) * noise, resample=Image.BICUBIC, fillcolor=255)
+    image = image.filter(ImageFilter.GaussianBlur(0.4 * noise))
+    # nhiễu hạt sinh ở 1/4 độ phân giải rồi phóng to: trông giống hạt scan mà nhanh hơn 16 lần
+    grain = Image.effect_noise((image.width // 4 + 1, image.height // 4 + 1), 12 * noise)
+    grain = grain.resize((image.width // 4 * 4 + 4, image.height // 4 * 4 + 4), Image.NEAREST).crop((0, 0) + image.size)
+    image = Image.blend(image, grain, 0.12 * noise)
+    buf = BytesIO()
+    image.save(buf, "JPEG", quality=85 - 15 * noise)
+    return Image.open(BytesIO(buf.getvalue())).convert("L")
+
+
+def render_scan(lines: List[str], font: fitz.Font, rng: random.Random, noise: int, dpi: int = 200) -> Image.Image:
+    with fitz.open() as tmp:
+        pix = _text_page(tmp, lines, font).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+        image = Image.frombytes("L", (pix.width, pix.height), pix.samples)
+    image.info["dpi"] = (dpi, dpi)
+    return degrade(image, rng, noise)
+
+
+def build_contract_pdf(
+    path: str,
+    pages: int,
+    scan_ratio: float = 0.5,
+    noise: int = 1,
+    seed: int = 0,
+    font: Optional[str] = None,
+    language: str = "vie",
+) -> SyntheticDocument:
+    """Tạo PDF hợp đồng gồm trang text layer và trang scan (tỉ lệ scan_ratio)."""
+    vn_font = fitz.Font(fontfile=find_font(font))
+    rng = random.Random(seed)
+    content, languages = _content(rng, pages, vn_font, language)
+    kinds = ["scan" if rng.random() < scan_ratio else "text" for _ in range(pages)]
+    out = fitz.open()
+    for lines, kind in zip(content, kinds):
+        if kind == "text":
+            _text_page(out, lines, vn_font)
+            continue
+        image = render_scan(lines, vn_font, rng, noise)
+        buf = BytesIO()
+        image.save(buf, "JPEG", quality=90)  # máy scan thường nhúng JPEG; PNG chậm và nặng hơn nhiều
+        page = out.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page.insert_image(page.rect, stream=buf.getvalue())
+    out.save(path, garbage=1, deflate=True)
+    out.close()
+    return SyntheticDocument(path=path, truth=["\n".join(lines) for lines in content], kinds=kinds, languages=languages)
+
+
+def build_scan_images(
+    directory: str,
+    count: int,
+    noise: int = 1,
+    seed: int = 0,
+    font: Optional[str] = None,
+    fmt: str = "png",
+    language: str = "vie",
+) -> SyntheticDocument:
+    """Tạo count ảnh scan rời (png/jpg) hoặc một TIFF nhiều trang (fmt="tiff")."""
+    vn_font = fitz.Font(fontfile=find_font(font))
+    rng = random.Random(seed)
+    content, languages = _content(rng, count, vn_font, language)
+    images = [render_scan(lines, vn_font, rng, noise) for lines in content]
+    doc = SyntheticDocument(path=directory, truth=["\n".join(lines) for lines in content], kinds=["scan"] * count,
+                            languages=languages)
+    if fmt == "tiff":
+        path = os.path.join(directory, "scan.tif")
+        images[0].save(path, save_all=True, append_images=images[1:], dpi=(200, 200), compression="tiff_lzw")
+        doc.images.append(path)
+        return doc
+    for i, image in enumerate(images):
+        path = os.path.join(directory, f"scan_{i + 1:03d}.{fmt}")
+        image.save(path, dpi=(200, 200), **({"quality": 90} if fmt == "jpg" else {}))
+        doc.images.append(path)
+    return doc
+
+
+def photograph(page: Image.Image, rng: random.Random, size=(3024, 4032)) -> Image.Image:
+    """Giả lập ảnh chụp điện thoại: trang hơi nghiêng nằm trên mặt bàn tối, 12 MP, thẻ 72 dpi."""
+    page = page.rotate(rng.uniform(-2.5, 2.5), resample=Image.BICUBIC, expand=True, fillcolor=255)
+    left, top = rng.randint(150, 400), rng.randint(100, 300)
+    desk = Image.new("L", (page.width + left + rng.randint(150, 400), page.height + top + rng.randint(100, 300)),
+                     rng.randint(50, 90))
+    desk.paste(page, (left, top))
+    photo = desk.resize(size, Image.BICUBIC)
+    photo.info["dpi"] = (72, 72)
+    return photo
+
+
+def build_phone_photos(
+    directory: str,
+    count: int,
+    noise: int = 1,
+    seed: int = 0,
+    font: Optional[str] = None,
+    language: str = "vie",
+) -> SyntheticDocument:
+    """Tạo count ảnh JPEG chụp hợp đồng bằng điện thoại (xem photograph)."""
+    vn_font = fitz.Font(fontfile=find_font(font))
+    rng = random.Random(seed)
+    content, languages = _content(rng, count, vn_font, language)
+    doc = SyntheticDocument(path=directory, truth=["\n".join(lines) for lines in content], kinds=["scan"] * count,
+                            languages=languages)
+    for i, lines in enumerate(content):
+        path = os.path.join(directory, f"photo_{i + 1:03d}.jpg")
+        photograph(render_scan(lines, vn_font, rng, noise), rng).convert("RGB").save(path, quality=88, dpi=(72, 72))
+        doc.images.append(path)
+    return doc
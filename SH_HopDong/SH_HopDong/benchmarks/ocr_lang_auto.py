@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark chọn model OCR tự động (lang="auto") so với một model kết hợp cố định.
+
+Mỗi kịch bản là một PDF tổng hợp (benchmarks.corpus) với nội dung tiếng Việt,
+tiếng Anh hoặc trộn theo trang, và một tỉ lệ trang scan. Cùng một file được OCR
+bằng --baseline (mặc định vie+eng) và bằng "auto". Với mỗi chế độ in số trang OCR
+mỗi giây (chỉ tính trang scan, trang text layer như nhau ở cả hai chế độ), tăng
+tốc so với baseline, độ chính xác ký tự trên các trang scan và số trang theo model
+đã dùng. Mỗi chế độ chạy --repeat lần, lấy lần nhanh nhất (lần đầu còn nạp model).
+
+Thoát với mã 1 nếu ở kịch bản nào độ chính xác của auto thấp hơn baseline quá
+--max-accuracy-drop.
+
+    python -m benchmarks.ocr_lang_auto --pages 10 --languages vie eng mixed --scan-ratios 1 0.5
+    python -m benchmarks.ocr_lang_auto --pages 20 --out lang.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Dict, List
+
+from benchmarks.corpus import LANGUAGES, SyntheticDocument, build_contract_pdf
+from benchmarks.ocr_throughput import char_accuracy, collect_meta
+
+
+def run_mode(doc: SyntheticDocument, lang: str, workers, repeat: int) -> dict:
+    from app.core import ocr
+
+    seconds, pages = None, None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        result = ocr.extract_pages_from_pdf(doc.path, lang=lang, workers=workers)
+        elapsed = time.perf_counter() - start
+        if seconds is None or elapsed < seconds:
+            seconds, pages = elapsed, result
+    scanned = [i for i, kind in enumerate(doc.kinds) if kind == "scan"]
+    accuracies = {i: char_accuracy(doc.truth[i], pages[i].text) for i in scanned}
+    by_language: Dict[str, List[float]] = {}
+    for i, accuracy in accuracies.items():
+        by_language.setdefault(doc.languages[i], []).append(accuracy)
+    return {
+        "mode": lang,
+        "seconds": round(seconds, 3),
+        "ocr_pages": len(scanned),
+        "ocr_pages_per_sec": round(len(scanned) / seconds, 3) if seconds and scanned else None,
+        "char_accuracy": round(sum(accuracies.values()) / len(accuracies), 4) if accuracies else None,
+        "char_accuracy_by_language": {k: round(sum(v) / len(v), 4) for k, v in by_language.items()},
+        "models": dict(Counter(pages[i].lang or "-" for i in scanned)),
+    }
+
+
+def _fmt(value, pattern: str = "{}") -> str:
+    return "-" if value is None else pattern.format(value)
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'scenario':<16} {'mode':<8} {'ocr pages':>9} {'pages/s':>8} {'speedup':>8} {'acc':>7} {'Δacc':>8}  models")
+    for r in results:
+        rows = [(r["baseline"], "-", "-"), (r["auto"], _fmt(r["speedup"], "{:.2f}x"), _fmt(r["accuracy_delta"], "{:+.4f}"))]
+        for run, speedup, delta in rows:
+            models = ", ".join(f"{k}:{v}" for k, v in sorted(run["models"].items()))
+            print(f"{r['name']:<16} {run['mode']:<8} {run['ocr_pages']:>9} {_fmt(run['ocr_pages_per_sec']):>8} "
+                  f"{speedup:>8} {_fmt(run['char_accuracy']):>7} {delta:>8}  {models}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=10, help="số trang mỗi PDF")
+    ap.add_argument("--languages", nargs="*", default=list(LANGUAGES), choices=LANGUAGES)
+    ap.add_argument("--scan-ratios", type=float, nargs="*", default=[1.0, 0.5],
+                    help="tỉ lệ trang scan; 1 = chỉ có ảnh, auto phải dò ngôn ngữ từng trang")
+    ap.add_argument("--noise", type=int, default=1, choices=[0, 1, 2])
+    ap.add_argument("--baseline", default="vie+eng", help="model cố định để so sánh")
+    ap.add_argument("--repeat", type=int, default=2)
+    ap.add_argument("--workers", type=int, default=None, help="mặc định theo OCR_WORKERS")
+    ap.add_argument("--max-accuracy-drop", type=float, default=0.005)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--font", default=None, help="font TTF hỗ trợ tiếng Việt")
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    from app.core.ocr import LANG_AUTO, shutdown_pool
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for language in args.languages:
+            for ratio in args.scan_ratios:
+                name = f"{language}-scan{int(ratio * 100)}"
+                doc = build_contract_pdf(os.path.join(tmp, f"{name}.pdf"), args.pages, scan_ratio=ratio,
+                                         noise=args.noise, seed=args.seed, font=args.font, language=language)
+                base = run_mode(doc, args.baseline, args.workers, args.repeat)
+                auto = run_mode(doc, LANG_AUTO, args.workers, args.repeat)
+                speedup = delta = None
+                if base["ocr_pages_per_sec"] and auto["ocr_pages_per_sec"]:
+                    speedup = auto["ocr_pages_per_sec"] / base["ocr_pages_per_sec"]
+                if base["char_accuracy"] is not None and auto["char_accuracy"] is not None:
+                    delta = auto["char_accuracy"] - base["char_accuracy"]
+                results.append({
+                    "name": name,
+                    "baseline": base,
+                    "auto": auto,
+                    "speedup": round(speedup, 3) if speedup else None,
+                    "accuracy_delta": round(delta, 4) if delta is not None else None,
+                })
+                print(f"{name}: {results[-1]['speedup']}x", file=sys.stderr)
+    shutdown_pool()
+
+    print_results(results)
+    regressions = [r["name"] for r in results if r["accuracy_delta"] is not None and r["accuracy_delta"] < -args.max_accuracy_drop]
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if regressions:
+        print(f"độ chính xác giảm quá {args.max_accuracy_drop}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Đo tốc độ OCR (trang/giây) của extract_text_from_pdf theo số worker.
+
+Chạy từ thư mục gốc dự án:
+    python -m benchmarks.ocr_parallel --pages 40 --workers 1 2 4 8 16
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import fitz  # PyMuPDF
+
+from app.core import ocr
+
+SAMPLE_LINES = [
+    "HOP DONG MUA BAN HANG HOA",
+    "Dieu 1. Doi tuong cua hop dong",
+    "Ben A dong y ban va Ben B dong y mua hang hoa theo danh muc dinh kem.",
+    "Dieu 2. Gia tri hop dong va phuong thuc thanh toan",
+    "Tong gia tri hop dong: 1.250.000.000 VND",
+]
+
+
+def build_scanned_pdf(path: str, pages: int) -> None:
+    """Tạo PDF chỉ gồm ảnh (không có text layer) để buộc đi qua nhánh OCR."""
+    src = fitz.open()
+    out = fitz.open()
+    for i in range(pages):
+        page = src.new_page()
+        y = 72
+        for line in [f"Trang {i + 1}"] + SAMPLE_LINES:
+            page.insert_text((72, y), line, fontsize=12)
+            y += 24
+        pix = page.get_pixmap(dpi=150)
+        scan = out.new_page(width=page.rect.width, height=page.rect.height)
+        scan.insert_image(scan.rect, stream=pix.tobytes("png"))
+    out.save(path)
+    out.close()
+    src.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--pages", type=int, default=40)
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    ap.add_argument("--lang", default=None)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "scan.pdf")
+        build_scanned_pdf(pdf_path, args.pages)
+
+        baseline = None
+        print(f"{'workers':>8} {'seconds':>10} {'pages/s':>10} {'speedup':>8}  output")
+        for workers in args.workers:
+            start = time.perf_counter()
+            text = ocr.extract_text_from_pdf(pdf_path, lang=args.lang, workers=workers)
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = (text, elapsed)
+            same = "giống" if text == baseline[0] else "KHÁC"
+            print(f"{workers:>8} {elapsed:>10.2f} {args.pages / elapsed:>10.2f} {baseline[1] / elapsed:>7.2f}x  {same}")
+        ocr.shutdown_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark tiền xử lý ảnh trước OCR (app.core.preprocess) trên ảnh chụp điện thoại tổng hợp.
+
+Mỗi ảnh (12 MP, trang nghiêng trên nền bàn tối, benchmarks.corpus.photograph) được
+OCR bằng extract_text_from_image hai lần: tắt tiền xử lý và bật với các bước
+--steps. In theo từng ảnh: số pixel trước/sau, thời gian tiền xử lý, tổng thời
+gian OCR mỗi chế độ, thời gian tiết kiệm và độ chính xác ký tự; cuối cùng là
+trung bình.
+
+    python -m benchmarks.ocr_preprocess --images 5
+    python -m benchmarks.ocr_preprocess --images 5 --steps downscale,crop,deskew,binarize --out prep.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from PIL import Image
+
+from benchmarks.corpus import build_phone_photos
+from benchmarks.ocr_throughput import char_accuracy, collect_meta
+
+
+def ocr_once(path: str, lang: str, preprocess: bool, steps: str) -> dict:
+    from app.core import ocr
+    from app.core.config import settings
+
+    settings.ocr_preprocess = preprocess
+    settings.ocr_preprocess_steps = steps
+    start = time.perf_counter()
+    text = ocr.extract_text_from_image(path, lang=lang)
+    return {"seconds": time.perf_counter() - start, "text": text}
+
+
+def prep_stats(path: str, steps: str) -> dict:
+    from app.core.preprocess import prepare_image
+
+    with Image.open(path) as image:
+        pixels = image.width * image.height
+        start = time.perf_counter()
+        prepared, dpi = prepare_image(image, tuple(steps.split(",")))
+        seconds = time.perf_counter() - start
+    return {"pixels": pixels, "pixels_after": prepared.width * prepared.height, "dpi_after": dpi, "prep_ms": 1000 * seconds}
+
+
+def mean(values: List[float]) -> Optional[float]:
+    return sum(values) / len(values) if values else None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--images", type=int, default=5)
+    ap.add_argument("--steps", default="downscale,crop,deskew", help="các bước bật khi so sánh")
+    ap.add_argument("--noise", type=int, default=1, choices=[0, 1, 2])
+    ap.add_argument("--lang", default="vie")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--font", default=None, help="font TTF hỗ trợ tiếng Việt")
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        doc = build_phone_photos(tmp, args.images, noise=args.noise, seed=args.seed, font=args.font)
+        for path, truth in zip(doc.images, doc.truth):
+            off = ocr_once(path, args.lang, False, "")
+            on = ocr_once(path, args.lang, True, args.steps)
+            row = prep_stats(path, args.steps)
+            row.update({
+                "image": os.path.basename(path),
+                "off_ms": round(1000 * off["seconds"], 1),
+                "on_ms": round(1000 * on["seconds"], 1),
+                "saved_ms": round(1000 * (off["seconds"] - on["seconds"]), 1),
+                "accuracy_off": round(char_accuracy(truth, off["text"]), 4),
+                "accuracy_on": round(char_accuracy(truth, on["text"]), 4),
+            })
+            row["prep_ms"] = round(row["prep_ms"], 1)
+            rows.append(row)
+            print(f"{row['image']}: {row['saved_ms']} ms", file=sys.stderr)
+
+    print(f"{'image':<14} {'MP':>5} {'MP sau':>7} {'prep ms':>8} {'tắt ms':>9} {'bật ms':>9} {'tiết kiệm':>10} {'acc tắt':>8} {'acc bật':>8}")
+    for r in rows:
+        print(f"{r['image']:<14} {r['pixels'] / 1e6:>5.1f} {r['pixels_after'] / 1e6:>7.1f} {r['prep_ms']:>8} "
+              f"{r['off_ms']:>9} {r['on_ms']:>9} {r['saved_ms']:>10} {r['accuracy_off']:>8} {r['accuracy_on']:>8}")
+    summary = {key: round(mean([r[key] for r in rows]), 4) for key in
+               ("prep_ms", "off_ms", "on_ms", "saved_ms", "accuracy_off", "accuracy_on")} if rows else {}
+    if rows:
+        print(f"trung bình: tiết kiệm {summary['saved_ms']} ms/ảnh ({summary['saved_ms'] / summary['off_ms'] * 100:.1f}%), "
+              f"tiền xử lý {summary['prep_ms']} ms, độ chính xác {summary['accuracy_off']} -> {summary['accuracy_on']}")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "images": rows, "summary": summary}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+
+
+if __name__ == "__main__":
+    main()
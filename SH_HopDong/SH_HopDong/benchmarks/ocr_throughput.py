@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Benchmark thông lượng OCR trên bộ hợp đồng tiếng Việt tổng hợp (benchmarks.corpus).
+
+Các kịch bản:
+  pdf-<N>p     extract_text_from_pdf trên PDF N trang (trộn trang text layer và trang scan)
+  images-<N>   extract_text_from_image trên N ảnh scan rời (PNG)
+  tiff-<N>     extract_text_from_image trên một TIFF N trang
+
+Mỗi kịch bản chạy trong tiến trình con riêng để peak RSS không bị lẫn. Kết quả:
+trang/giây, độ trễ p50/p95 mỗi trang (mỗi trang mẫu được OCR như một tài liệu 1 trang),
+peak RSS (tiến trình chính và tiến trình con như tesseract/pool worker) và độ chính
+xác ký tự so với ground truth (difflib ratio sau khi chuẩn hóa NFC + khoảng trắng).
+
+    python -m benchmarks.ocr_throughput --pages 1 10 50 200 --images 5 --out bench.json
+    python -m benchmarks.ocr_throughput --pages 10 --out new.json --compare bench.json
+    python -m benchmarks.ocr_throughput --diff bench.json new.json
+"""
+import argparse
+import difflib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from benchmarks.corpus import build_contract_pdf, build_scan_images, normalize
+
+# (tên, hướng tốt hơn): +1 = càng lớn càng tốt, -1 = càng nhỏ càng tốt
+METRICS = [
+    ("pages_per_sec", 1),
+    ("p50_ms", -1),
+    ("p95_ms", -1),
+    ("char_accuracy", 1),
+    ("peak_rss_mb", -1),
+    ("peak_rss_children_mb", -1),
+]
+
+
+def peak_rss_mb(who: str = "self") -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    return round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def char_accuracy(truth: str, text: str) -> float:
+    return difflib.SequenceMatcher(None, normalize(truth), normalize(text), autojunk=False).ratio()
+
+
+def sample_indexes(count: int, limit: int) -> List[int]:
+    if limit <= 0 or limit >= count:
+        return list(range(count))
+    step = count / limit
+    return sorted({int(i * step) for i in range(limit)})
+
+
+# ---------------------------------------------------------------- tiến trình con
+
+def _summary(name: str, pages: int, seconds: float, latencies: List[float], accuracies: List[float], **extra) -> dict:
+    result = {
+        "name": name,
+        "pages": pages,
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(pages / seconds, 3) if seconds else None,
+        "p50_ms": round(1000 * percentile(latencies, 50), 1) if latencies else None,
+        "p95_ms": round(1000 * percentile(latencies, 95), 1) if latencies else None,
+        "latency_samples": len(latencies),
+        "char_accuracy": round(sum(accuracies) / len(accuracies), 4) if accuracies else None,
+    }
+    result.update(extra)
+    result["peak_rss_mb"] = peak_rss_mb("self")
+    result["peak_rss_children_mb"] = peak_rss_mb("children")
+    return result
+
+
+def run_pdf(spec: dict) -> dict:
+    import fitz  # PyMuPDF
+    from app.core import ocr
+
+    path, truth, kinds = spec["path"], spec["truth"], spec["kinds"]
+    start = time.perf_counter()
+    ocr.extract_text_from_pdf(path, lang=spec["lang"], workers=spec["workers"])
+    seconds = time.perf_counter() - start
+
+    # Độ trễ/độ chính xác: OCR từng trang mẫu như một tài liệu 1 trang
+    latencies, accuracies, by_kind = [], [], {}
+    with tempfile.TemporaryDirectory() as tmp, fitz.open(path) as src:
+        for index in sample_indexes(len(truth), spec["latency_pages"]):
+            single = os.path.join(tmp, f"page_{index}.pdf")
+            with fitz.open() as one:
+                one.insert_pdf(src, from_page=index, to_page=index)
+                one.save(single)
+            page_start = time.perf_counter()
+            text = ocr.extract_text_from_pdf(single, lang=spec["lang"], workers=1)
+            latencies.append(time.perf_counter() - page_start)
+            accuracy = char_accuracy(truth[index], text)
+            accuracies.append(accuracy)
+            by_kind.setdefault(kinds[index], []).append(accuracy)
+    ocr.shutdown_pool()
+    return _summary(
+        spec["name"], len(truth), seconds, latencies, accuracies,
+        scan_pages=kinds.count("scan"),
+        text_pages=kinds.count("text"),
+        char_accuracy_by_kind={k: round(sum(v) / len(v), 4) for k, v in by_kind.items()},
+    )
+
+
+def run_images(spec: dict) -> dict:
+    from app.core import ocr
+
+    latencies, accuracies = [], []
+    start = time.perf_counter()
+    for path, truth in zip(spec["images"], spec["truth"]):
+        image_start = time.perf_counter()
+        text = ocr.extract_text_from_image(path, lang=spec["lang"])
+        latencies.append(time.perf_counter() - image_start)
+        accuracies.append(char_accuracy(truth, text))
+    return _summary(spec["name"], len(spec["truth"]), time.perf_counter() - start, latencies, accuracies)
+
+
+def run_tiff(spec: dict) -> dict:
+    from app.core import ocr
+
+    start = time.perf_counter()
+    text = ocr.extract_text_from_image(spec["images"][0], lang=spec["lang"])
+    seconds = time.perf_counter() - start
+    ocr.shutdown_pool()
+    return _summary(spec["name"], len(spec["truth"]), seconds, [], [char_accuracy("\n".join(spec["truth"]), text)])
+
+
+RUNNERS = {"pdf": run_pdf, "images": run_images, "tiff": run_tiff}
+
+
+# ---------------------------------------------------------------- tiến trình chính
+
+def run_child(spec: dict, tmp: str) -> dict:
+    spec_path = os.path.join(tmp, f"{spec['name']}.json")
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+    cmd = [sys.executable, "-m", "benchmarks.ocr_throughput", "--run-spec", spec_path]
+    out = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
+    if out.returncode != 0:
+        raise SystemExit(f"{spec['name']} lỗi:\n{out.stderr}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def collect_meta(args) -> dict:
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare", "diff", "run_spec")},
+    }
+    try:
+        meta["git_commit"] = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        meta["git_commit"] = None
+    try:
+        from app.core.config import settings
+        from app.core.ocr import engine_description
+        meta["engine_version"] = engine_description()
+        meta["ocr_settings"] = {
+            "backend": settings.ocr_backend,
+            "workers": settings.ocr_workers,
+            "confidence_check": settings.ocr_confidence_check,
+            "low_dpi": settings.ocr_low_dpi,
+            "high_dpi": settings.ocr_high_dpi,
+        }
+    except Exception as e:
+        meta["engine_version"] = f"unavailable: {e}"
+    return meta
+
+
+def print_results(results: List[dict]) -> None:
+    print(f"{'scenario':<12} {'pages':>6} {'pages/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'acc':>7} {'RSS MB':>8} {'child MB':>9}")
+    for r in results:
+        cells = [r.get(k) for k in ("pages_per_sec", "p50_ms", "p95_ms", "char_accuracy", "peak_rss_mb", "peak_rss_children_mb")]
+        cells = ["-" if c is None else c for c in cells]
+        print(f"{r['name']:<12} {r['pages']:>6} {cells[0]:>9} {cells[1]:>9} {cells[2]:>9} {cells[3]:>7} {cells[4]:>8} {cells[5]:>9}")
+
+
+def compare(old: dict, new: dict) -> None:
+    """In chênh lệch từng chỉ số giữa hai file kết quả (theo tên kịch bản)."""
+    old_by_name: Dict[str, dict] = {r["name"]: r for r in old["results"]}
+    print(f"so sánh {old['meta'].get('git_commit')} ({old['meta'].get('timestamp')}) -> "
+          f"{new['meta'].get('git_commit')} ({new['meta'].get('timestamp')})")
+    print(f"{'scenario':<12} {'metric':<22} {'old':>10} {'new':>10} {'change':>9}")
+    for r in new["results"]:
+        base = old_by_name.get(r["name"])
+        if base is None:
+            print(f"{r['name']:<12} (không có trong file cũ)")
+            continue
+        for metric, direction in METRICS:
+            a, b = base.get(metric), r.get(metric)
+            if a is None or b is None:
+                continue
+            change = (b - a) / a * 100 if a else 0.0
+            mark = "" if abs(change) < 5 else (" +" if change * direction > 0 else " -")
+            print(f"{r['name']:<12} {metric:<22} {a:>10} {b:>10} {change:>+8.1f}%{mark}")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, nargs="*", default=[1, 10, 50], help="số trang của từng PDF (1-200)")
+    ap.add_argument("--scan-ratio", type=float, default=0.5, help="tỉ lệ trang scan (không có text layer)")
+    ap.add_argument("--noise", type=int, default=1, choices=[0, 1, 2], help="mức nhiễu của trang scan")
+    ap.add_argument("--images", type=int, default=5, help="số ảnh rời cho extract_text_from_image (0 = bỏ qua)")
+    ap.add_argument("--tiff-pages", type=int, default=0, help="số trang của TIFF nhiều trang (0 = bỏ qua)")
+    ap.add_argument("--latency-pages", type=int, default=20, help="số trang mẫu đo độ trễ mỗi PDF (0 = tất cả)")
+    ap.add_argument("--workers", type=int, default=None, help="mặc định theo OCR_WORKERS")
+    ap.add_argument("--lang", default=None)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--font", default=None, help="font TTF hỗ trợ tiếng Việt")
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    ap.add_argument("--compare", default=None, help="file JSON của lần chạy trước để so sánh")
+    ap.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="chỉ so sánh hai file kết quả")
+    ap.add_argument("--run-spec", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_spec:
+        with open(args.run_spec, "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        print(json.dumps(RUNNERS[spec["kind"]](spec), ensure_ascii=False))
+        return
+
+    if args.diff:
+        with open(args.diff[0], "r", encoding="utf-8") as f_old, open(args.diff[1], "r", encoding="utf-8") as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        return
+
+    common = {"lang": args.lang, "workers": args.workers, "latency_pages": args.latency_pages}
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            if not 1 <= pages <= 200:
+                raise SystemExit("--pages phải trong khoảng 1-200")
+            doc = build_contract_pdf(os.path.join(tmp, f"contract_{pages}.pdf"), pages,
+                                     scan_ratio=args.scan_ratio, noise=args.noise, seed=args.seed + pages, font=args.font)
+            spec = dict(common, kind="pdf", name=f"pdf-{pages}p", path=doc.path, truth=doc.truth, kinds=doc.kinds)
+            results.append(run_child(spec, tmp))
+            print(f"{spec['name']}: {results[-1]['pages_per_sec']} trang/s", file=sys.stderr)
+        if args.images:
+            image_dir = os.path.join(tmp, "images")
+            os.makedirs(image_dir)
+            doc = build_scan_images(image_dir, args.images, noise=args.noise, seed=args.seed, font=args.font)
+            results.append(run_child(dict(common, kind="images", name=f"images-{args.images}",
+                                          images=doc.images, truth=doc.truth), tmp))
+        if args.tiff_pages:
+            tiff_dir = os.path.join(tmp, "tiff")
+            os.makedirs(tiff_dir)
+            doc = build_scan_images(tiff_dir, args.tiff_pages, noise=args.noise, seed=args.seed, font=args.font, fmt="tiff")
+            results.append(run_child(dict(common, kind="tiff", name=f"tiff-{args.tiff_pages}",
+                                          images=doc.images, truth=doc.truth), tmp))
+
+    report = {"meta": collect_meta(args), "results": results}
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
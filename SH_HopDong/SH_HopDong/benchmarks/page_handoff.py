@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+So sánh cách chuyển trang PDF đã render sang tesseract:
+
+  png  - cách cũ: pixmap RGB -> PNG -> PIL decode -> pytesseract ghi file tạm PNG
+  raw  - cách mới: pixmap xám -> PIL view trên buffer (không copy) -> file tạm PPM
+
+Mỗi chế độ chạy trong một tiến trình riêng để đo peak RSS độc lập.
+Mặc định chỉ đo phần chuyển giao (đến khi file tạm được ghi xong); thêm --ocr
+để gọi tesseract thật.
+
+    python -m benchmarks.page_handoff --pages 10 --dpi 300
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image
+import pytesseract
+
+from benchmarks.ocr_parallel import build_scanned_pdf
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def handoff_png(page, dpi, consume):
+    pix = page.get_pixmap(dpi=dpi)
+    image = Image.open(BytesIO(pix.tobytes("png")))
+    if image.mode not in ("L", "RGB"):
+        image = image.convert("RGB")
+    return consume(image)
+
+
+def handoff_raw(page, dpi, consume):
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    image = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    image.format = "PPM"
+    try:
+        return consume(image)
+    finally:
+        del image
+        del pix
+
+
+def write_temp(image):
+    # Giống hệt bước pytesseract làm trước khi gọi tesseract
+    with pytesseract.pytesseract.save(image) as (_, input_file):
+        return os.path.getsize(input_file)
+
+
+def run_mode(mode, pdf_path, dpi, ocr):
+    handoff = handoff_png if mode == "png" else handoff_raw
+    consume = (lambda image: pytesseract.image_to_string(image)) if ocr else write_temp
+    times = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            start = time.perf_counter()
+            handoff(page, dpi, consume)
+            times.append(time.perf_counter() - start)
+    return {
+        "mode": mode,
+        "pages": len(times),
+        "ms_per_page": round(1000 * sum(times) / len(times), 1),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=10)
+    ap.add_argument("--dpi", type=int, default=300)
+    ap.add_argument("--ocr", action="store_true", help="gọi tesseract thật thay vì chỉ ghi file tạm")
+    ap.add_argument("--mode", choices=["png", "raw"], help=argparse.SUPPRESS)
+    ap.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.pdf, args.dpi, args.ocr)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "scan.pdf")
+        build_scanned_pdf(pdf_path, args.pages)
+        print(f"{'mode':>6} {'ms/page':>10} {'peak RSS MB':>12}")
+        for mode in ("png", "raw"):
+            cmd = [sys.executable, "-m", "benchmarks.page_handoff", "--mode", mode, "--pdf", pdf_path, "--dpi", str(args.dpi)]
+            if args.ocr:
+                cmd.append("--ocr")
+            out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:>6} {result['ms_per_page']:>10} {str(result['peak_rss_mb']):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark parse_contract_text: bản một lượt quét (app.core.parser) so với bản
+cũ (benchmarks.parser_legacy) trên các hợp đồng tổng hợp cỡ thật.
+
+Mỗi cỡ (--pages) gồm --docs văn bản từ benchmarks.corpus.contract_text (khối các
+bên, hàng chục điều khoản, khối chữ ký; trang nối như kết quả OCR). Mỗi bản chạy
+--repeat lần trên cả nhóm, lấy lần nhanh nhất. In ms/văn bản, tốc độ MB/s và số
+văn bản có kết quả giống hệt bản cũ (trên các khóa bản cũ có); --fuzz kiểm tra thêm N văn bản ngẫu nhiên
+ghép từ các mẫu dễ nhầm (dấu cách trong "B Ê N A", xuống dòng giữa nhãn...).
+Các trường bản cũ không có (amount_value...) được kiểm tra trên các mẫu FIELD_CASES.
+
+Thoát với mã 1 nếu có văn bản cho kết quả khác bản cũ hoặc mẫu FIELD_CASES sai.
+
+    python -m benchmarks.parser_speed --pages 2 10 40 100 --docs 20
+    python -m benchmarks.parser_speed --pages 40 --fuzz 20000 --out parser.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import warnings
+from typing import Callable, List
+
+import fitz  # PyMuPDF
+
+from benchmarks.corpus import LANGUAGES, contract_text, find_font
+from benchmarks.ocr_throughput import collect_meta
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", SyntaxWarning)  # bản cũ giữ nguyên chuỗi "\s" không raw
+    from benchmarks import parser_legacy
+
+FUZZ_TOKENS = [
+    "Bên", "BÊN", "Ben", "B Ê N", "ÊN", "A", "B", "Mua", "Bán", "Ban", "HỢP ĐỒNG", "H Ợ P ĐỒNG", "Hop dong",
+    "MUA BÁN", "thuê", "NDA", "lao động", "Giá trị hợp đồng:", "Tổng\ngiá trị", "1.000.000", "12.345.678,90 VNĐ",
+    "25,5", "đồng", "VND", "ngày 12 tháng 3 năm 2024", "12/03/2024", "Điều 1.", "điều 22", "Đại diện", "Ký tên",
+    "Đóng dấu", "x" * 130, " ", "\n", "\n\n", "\r\n", "\x0c", ":", ",",
+]
+CAN_CU = "HỢP ĐỒNG MUA BÁN\nCăn cứ Bộ luật Dân sự số 91/2015/QH13 ngày 24 tháng 11 năm 2015;\n" \
+         "Căn cứ Luật Thương mại có hiệu lực từ ngày 01/01/2006;\n"
+# (văn bản, các trường mong đợi) cho các trường chỉ bản mới có
+FIELD_CASES = [
+    # số điều trong tiêu đề điều khoản không phải giá trị hợp đồng
+    ("Điều 2. Giá trị hợp đồng và phương thức thanh toán\nGiá trị hợp đồng: 1.250.000.000 VNĐ",
+     {"amount": "2", "amount_value": 1_250_000_000, "amount_currency": "VND"}),
+    ("Điều 4: GIÁ TRỊ HỢP ĐỒNG VÀ THANH TOÁN\nĐơn giá theo Phụ lục 1 (Bằng chữ: Năm trăm triệu đồng)",
+     {"amount_value": 500_000_000, "amount_currency": "VND"}),
+    ("Bên A thanh toán 30% giá trị hợp đồng trong 10 ngày\nTổng cộng: 2.000.000 đồng", {"amount_value": 2_000_000}),
+    ("Tổng giá trị: 1250000000 VNĐ", {"amount_value": 1_250_000_000}),
+    ("Giá trị hợp đồng: 1,5 tỷ đồng", {"amount_value": 1_500_000_000, "amount_currency": "VND"}),
+    ("Giá trị hợp đồng: 50.000 USD", {"amount_value": 50_000, "amount_currency": "USD"}),
+    ("Giá trị hợp đồng: 12.345.678,90 VNĐ", {"amount_value": 12_345_679}),
+    # đơn vị tiền đứng trước số; không có đơn vị thì không mặc định là VND
+    ("Giá trị hợp đồng: USD 25,000", {"amount_value": 25_000, "amount_currency": "USD"}),
+    ("Tổng giá trị: US$ 25.000 (đã gồm thuế)", {"amount_value": 25_000, "amount_currency": "USD"}),
+    ("Giá trị hợp đồng: 1.250.000", {"amount_value": 1_250_000, "amount_currency": None}),
+    # ngày ký chứ không phải ngày của văn bản luật ở dòng "Căn cứ"
+    (CAN_CU + "Hôm nay, ngày 05 tháng 03 năm 2024, tại Hà Nội, chúng tôi gồm:\nĐiều 5. Thời hạn hợp đồng là 12 tháng",
+     {"effective_on": "2024-03-05", "expiration_date": "2025-03-04", "duration": "P12M"}),
+    (CAN_CU + "Hợp đồng được lập tại Hà Nội ngày 10/04/2024.\nThời hạn 2 năm",
+     {"effective_on": "2024-04-10", "expiration_date": "2026-04-09"}),
+    # ngày đầu tiên không có nhãn: không đủ chắc để tính ngày hết hạn
+    (CAN_CU + "Hà Nội, ngày 05 tháng 03 năm 2024\nThời hạn hợp đồng: 12 tháng",
+     {"effective_on": "2024-03-05", "expiration_date": None}),
+    (CAN_CU + "Hợp đồng có hiệu lực từ ngày 01/06/2024 đến hết ngày 31/05/2025",
+     {"effective_on": "2024-06-01", "expiration_date": "2025-05-31"}),
+    ("Ngày hết hạn: 30/06/2025", {"effective_on": None, "expiration_date": "2025-06-30"}),
+    # ngày không có ở kỳ sau: hết hạn vào cuối tháng đó
+    ("Hợp đồng có hiệu lực từ ngày 29/02/2024. Thời hạn hợp đồng: 1 năm",
+     {"effective_on": "2024-02-29", "expiration_date": "2025-02-28", "duration": "P1Y"}),
+    ("Hợp đồng có hiệu lực từ ngày 31/01/2024, thời hạn 1 tháng", {"expiration_date": "2024-02-29"}),
+    ("Hợp đồng có hiệu lực từ ngày 01/03/2023, thời hạn 12 tháng", {"expiration_date": "2024-02-29"}),
+    # thời hạn nằm sau phần đầu văn bản, giữa các điều khoản khác
+    (CAN_CU + "Điều 1. Nội dung\n" * 60 + "Điều 6. Thời hạn hợp đồng: từ ngày 01/07/2024 đến ngày 30/06/2025",
+     {"effective_on": "2024-07-01", "expiration_date": "2025-06-30", "duration": None}),
+]
+
+
+def fuzz_text(rng: random.Random) -> str:
+    return "".join(rng.choice(FUZZ_TOKENS) + rng.choice(["", " ", "\n"]) for _ in range(rng.randint(0, 150)))
+
+
+def best_time(parse: Callable[[str], dict], texts: List[str], repeat: int) -> float:
+    best = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        for text in texts:
+            parse(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def mismatches(texts: List[str]) -> List[int]:
+    from app.core.parser import parse_contract_text
+
+    bad = []
+    for i, text in enumerate(texts):
+        old, new = parser_legacy.parse_contract_text(text), parse_contract_text(text)
+        # so cả thứ tự khóa: parsed_json được lưu nguyên dạng; bỏ qua các khóa bản cũ
+        # không có (amount_value, amount_currency...)
+        new = {key: value for key, value in new.items() if key in old}
+        if json.dumps(old, ensure_ascii=False) != json.dumps(new, ensure_ascii=False):
+            bad.append(i)
+    return bad
+
+
+def field_mismatches() -> List[str]:
+    from app.core.parser import parse_contract_text
+
+    bad = []
+    for text, expected in FIELD_CASES:
+        parsed = parse_contract_text(text)
+        got = {key: parsed.get(key) for key in expected}
+        if got != expected:
+            bad.append(f"{text[:60]!r}: {got} != {expected}")
+    return bad
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, nargs="*", default=[2, 10, 40, 100], help="số trang mỗi văn bản")
+    ap.add_argument("--docs", type=int, default=20, help="số văn bản mỗi cỡ")
+    ap.add_argument("--language", default="vie", choices=LANGUAGES)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--fuzz", type=int, default=5000, help="số văn bản ngẫu nhiên để so kết quả (0 = bỏ qua)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--font", default=None, help="font TTF hỗ trợ tiếng Việt")
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    from app.core.parser import parse_contract_text
+
+    font = fitz.Font(fontfile=find_font(args.font))
+    rng = random.Random(args.seed)
+    results, failed = [], 0
+    print(f"{'pages':>6} {'docs':>5} {'KB/doc':>8} {'cũ ms':>9} {'mới ms':>9} {'cũ MB/s':>8} {'mới MB/s':>8} "
+          f"{'speedup':>8} {'giống':>7}")
+    for pages in args.pages:
+        texts = [contract_text(rng, pages, font, args.language) for _ in range(args.docs)]
+        size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+        old = best_time(parser_legacy.parse_contract_text, texts, args.repeat)
+        new = best_time(parse_contract_text, texts, args.repeat)
+        bad = mismatches(texts)
+        failed += len(bad)
+        row = {
+            "pages": pages,
+            "docs": len(texts),
+            "kb_per_doc": round(size_mb * 1000 / len(texts), 1),
+            "legacy_ms_per_doc": round(1000 * old / len(texts), 3),
+            "ms_per_doc": round(1000 * new / len(texts), 3),
+            "legacy_mb_per_sec": round(size_mb / old, 2),
+            "mb_per_sec": round(size_mb / new, 2),
+            "speedup": round(old / new, 2),
+            "identical": len(texts) - len(bad),
+        }
+        results.append(row)
+        print(f"{pages:>6} {row['docs']:>5} {row['kb_per_doc']:>8} {row['legacy_ms_per_doc']:>9} {row['ms_per_doc']:>9} "
+              f"{row['legacy_mb_per_sec']:>8} {row['mb_per_sec']:>8} {row['speedup']:>7}x {row['identical']:>7}")
+
+    fuzz = None
+    if args.fuzz > 0:
+        texts = [fuzz_text(rng) for _ in range(args.fuzz)]
+        bad = mismatches(texts)
+        failed += len(bad)
+        fuzz = {"texts": len(texts), "identical": len(texts) - len(bad), "examples": [texts[i] for i in bad[:5]]}
+        print(f"fuzz: {fuzz['identical']}/{fuzz['texts']} giống bản cũ")
+        for example in fuzz["examples"]:
+            print(f"  khác: {example[:200]!r}")
+
+    wrong = field_mismatches()
+    print(f"FIELD_CASES: {len(FIELD_CASES) - len(wrong)}/{len(FIELD_CASES)} đúng")
+    for example in wrong:
+        print(f"  sai: {example}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "results": results, "fuzz": fuzz,
+                       "field_cases_wrong": wrong}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if failed or wrong:
+        print(f"{failed} văn bản cho kết quả khác bản cũ, {len(wrong)} mẫu FIELD_CASES sai")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
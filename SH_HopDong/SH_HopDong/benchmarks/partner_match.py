@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Benchmark nhận diện đối tác trong khối các bên (app.core.partners): automaton
+Aho-Corasick theo từ so với cách dò lần lượt từng đối tác (mỗi tên/MST/tên khác
+là một lần tìm chuỗi con).
+
+Tạo --partners đối tác tổng hợp (tên công ty, MST 10 số, tên viết tắt) trong một
+CSDL SQLite tạm, rồi đo:
+  build     dựng automaton từ bảng (lần sync đầu)
+  add       thêm --add đối tác rồi sync lại (chỉ dựng automaton delta)
+  edit      sửa tên một đối tác rồi sync lại
+  match     µs mỗi khối "Bên A/B" (--blocks khối: đủ tên + MST, chữ thường không
+            dấu như OCR, chỉ tên viết tắt, công ty không có trong bảng)
+
+Thoát với mã 1 nếu có khối nhận sai đối tác.
+
+    python -m benchmarks.partner_match
+    python -m benchmarks.partner_match --partners 50000 100000 --blocks 5000 --out partners.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+from benchmarks.ocr_throughput import collect_meta
+
+PREFIXES = ["Công ty TNHH", "Công ty Cổ phần", "Công ty TNHH MTV", "Doanh nghiệp tư nhân", "Tập đoàn"]
+SYLLABLES = ["An", "Bình", "Cường", "Đạt", "Đông", "Gia", "Hải", "Hòa", "Hưng", "Khang", "Kim", "Lâm", "Long",
+             "Minh", "Nam", "Ngọc", "Nhật", "Phát", "Phú", "Quang", "Sơn", "Tâm", "Tân", "Thành", "Thịnh", "Tiến",
+             "Trí", "Trung", "Tường", "Việt", "Vinh", "Xuân", "Á", "Âu", "Bảo", "Hoàng", "Lộc", "Mai", "Phong", "Thái"]
+TRADES = ["Thương mại", "Dịch vụ", "Xây dựng", "Vận tải", "Công nghệ", "Đầu tư", "Sản xuất", "Xuất nhập khẩu"]
+UNKNOWN = ["Zeta", "Omega", "Kappa", "Sigma", "Delta"]
+
+
+def make_partners(rng: random.Random, count: int) -> List[Tuple[str, str, str]]:
+    """(tên, MST, tên viết tắt) không trùng nhau."""
+    names, aliases, taxes, partners = set(), set(), set(), []
+    while len(partners) < count:
+        words = [rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))]
+        name = f"{rng.choice(PREFIXES)} {rng.choice(TRADES)} {' '.join(words)}"
+        alias = "".join(w[0] for w in words).upper() + " " + words[-1] + f" {rng.randint(1, 99)}"
+        tax = f"{rng.randint(100000000, 9999999999):010d}"
+        if name in names or alias in aliases or tax in taxes:
+            continue
+        names.add(name)
+        aliases.add(alias)
+        taxes.add(tax)
+        partners.append((name, tax, alias))
+    return partners
+
+
+def _ocr(text: str) -> str:
+    from app.core.parser import strip_diacritics
+
+    return strip_diacritics(text)
+
+
+def make_blocks(rng: random.Random, partners: List[Tuple[str, str, str]], count: int) -> List[Tuple[str, Optional[int]]]:
+    """(khối "Bên A", id đối tác đúng hoặc None); id = vị trí trong partners + 1."""
+    blocks = []
+    for i in range(count):
+        index = rng.randrange(len(partners))
+        name, tax, alias = partners[index]
+        role = rng.choice(["BÊN A", "BÊN B", "Bên mua", "Bên bán"])
+        kind = i % 4
+        if kind == 0:
+            text = f"{role}: {name.upper()}\nĐịa chỉ: số {rng.randint(1, 300)} đường Láng, Hà Nội\nMã số thuế: {tax}\n" \
+                   f"Đại diện: Ông Nguyễn Văn {rng.choice(SYLLABLES)} - Giám đốc"
+        elif kind == 1:
+            text = f"{_ocr(role)} : {_ocr(name)}\ndia chi: so {rng.randint(1, 300)} nguyen trai, tp hcm\ndai dien: ba tran thi an"
+        elif kind == 2:
+            text = f"{role} ({alias})\nĐịa chỉ: Khu công nghiệp {rng.choice(SYLLABLES)}\nĐiện thoại: 024 3{rng.randint(1000000, 9999999)}"
+        else:
+            text = f"{role}: Công ty TNHH {rng.choice(UNKNOWN)} {rng.choice(UNKNOWN)}\nMã số thuế: 12345\nĐại diện: Ông A"
+            blocks.append((text, None))
+            continue
+        blocks.append((text, index + 1))
+    return blocks
+
+
+def naive_match(patterns: List[Tuple[str, int, int, int]], block: str) -> Optional[int]:
+    """Dò từng mẫu bằng tìm chuỗi con trên văn bản đã chuẩn hóa (cùng thứ tự ưu tiên)."""
+    from app.core.matching import normalize
+
+    text = " " + " ".join(normalize(block)) + " "
+    best = None
+    for pattern, partner_id, kind, length in patterns:
+        if pattern in text:
+            key = (kind, -length, partner_id)
+            if best is None or key < best:
+                best = key
+    return best[2] if best else None
+
+
+def run(count: int, blocks_count: int, add: int, rng: random.Random) -> Dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+
+    from app.core import partners as linking
+    from app.db import models
+    from app.db.base import Base
+
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine)
+        rows = make_partners(rng, count + add)
+        with Session(engine) as db:
+            db.bulk_insert_mappings(models.Partner, [
+                {"id": i + 1, "name": name, "tax_id": tax, "aliases": alias, "partner_type": "Khách hàng"}
+                for i, (name, tax, alias) in enumerate(rows[:count])
+            ])
+            db.commit()
+
+            matcher = linking.PartnerMatcher()
+            start = time.perf_counter()
+            matcher.sync(db, force=True)
+            build = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for i, (name, tax, alias) in enumerate(rows[count:]):
+                db.add(models.Partner(id=count + i + 1, name=name, tax_id=tax, aliases=alias))
+            db.commit()
+            commit_add = time.perf_counter() - start
+            start = time.perf_counter()
+            matcher.sync(db, force=True)
+            added = time.perf_counter() - start
+
+            # Sửa tên đối tác 1: tên cũ không còn khớp, tên mới khớp
+            first = db.get(models.Partner, 1)
+            old_name, first.name = first.name, first.name + " Hoàng Gia"
+            rows[0] = (first.name, rows[0][1], rows[0][2])
+            db.commit()
+            start = time.perf_counter()
+            matcher.sync(db, force=True)
+            edited = time.perf_counter() - start
+
+        automaton = matcher._main
+        blocks = make_blocks(rng, rows, blocks_count)
+        start = time.perf_counter()
+        found = [matcher.match(text) for text, _ in blocks]
+        elapsed = time.perf_counter() - start
+        wrong = sum((match[0] if match else None) != expected for match, (_, expected) in zip(found, blocks))
+        renamed = matcher.match(f"BÊN A: {rows[0][0]}")
+        stale = matcher.match(f"BÊN A: {old_name}")
+        wrong += (renamed or (None,))[0] != 1 or (stale is not None and stale[0] == 1 and stale[1] == "name")
+
+        patterns = []
+        for i, (name, tax, alias) in enumerate(rows):
+            for words, (partner_id, _, kind, length) in linking.partner_patterns(i + 1, 0, name, tax, alias):
+                patterns.append((" " + " ".join(words) + " ", partner_id, kind, length))
+        sample = blocks[:max(1, min(200, len(blocks)))]
+        start = time.perf_counter()
+        naive = [naive_match(patterns, text) for text, _ in sample]
+        naive_elapsed = time.perf_counter() - start
+        wrong += sum(n != (m[0] if m else None) for n, m in zip(naive, found))
+
+        return {
+            "partners": count,
+            "patterns": automaton.size + matcher._delta.size,
+            "states": len(automaton.fail),
+            "build_ms": round(1000 * build, 1),
+            "add": add,
+            "add_commit_ms": round(1000 * commit_add, 1),
+            "add_sync_ms": round(1000 * added, 1),
+            "edit_sync_ms": round(1000 * edited, 1),
+            "blocks": len(blocks),
+            "us_per_block": round(1e6 * elapsed / len(blocks), 1),
+            "naive_us_per_block": round(1e6 * naive_elapsed / len(sample), 1),
+            "speedup": round((naive_elapsed / len(sample)) / (elapsed / len(blocks)), 1),
+            "wrong": wrong,
+        }
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--partners", type=int, nargs="*", default=[1000, 10_000, 50_000], help="số đối tác trong bảng")
+    ap.add_argument("--blocks", type=int, default=2000, help="số khối các bên cần nhận diện")
+    ap.add_argument("--add", type=int, default=100, help="số đối tác thêm sau lần dựng đầu")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    results, failed = [], 0
+    print(f"{'partners':>9} {'states':>9} {'build ms':>9} {'add ms':>7} {'edit ms':>8} {'µs/khối':>8} "
+          f"{'dò µs':>9} {'speedup':>8} {'sai':>4}")
+    for count in args.partners:
+        row = run(count, args.blocks, args.add, rng)
+        failed += row["wrong"]
+        results.append(row)
+        print(f"{row['partners']:>9} {row['states']:>9} {row['build_ms']:>9} {row['add_sync_ms']:>7} "
+              f"{row['edit_sync_ms']:>8} {row['us_per_block']:>8} {row['naive_us_per_block']:>9} "
+              f"{row['speedup']:>7}x {row['wrong']:>4}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if failed:
+        print(f"{failed} khối nhận sai đối tác")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
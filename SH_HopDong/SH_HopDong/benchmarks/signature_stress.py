@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Stress test nhận diện chữ ký (_extract_signatures): bản quét từ khóa + gộp theo vị
+trí (app.core.parser) so với bản regex cửa sổ DOTALL cũ (benchmarks.parser_legacy)
+trên văn bản lớn, kể cả văn bản "xấu" cho bản cũ.
+
+Các loại văn bản (--cases), mỗi loại ở từng cỡ --sizes (ký tự):
+  keywords  "Đại diện", "Ký tên"... lặp lại, không có "Bên A/B" trong vòng 120 ký tự
+  parties   "Bên A", "BÊN B" lặp lại, không có từ khóa chữ ký
+  dense     từ khóa và bên xen kẽ, cách nhau hơn 120 ký tự (không cặp nào khớp)
+  ocr       chữ thường như kết quả OCR, khối chữ ký chỉ ở cuối văn bản
+
+In ms mỗi lần chạy, tốc độ MB/s và hệ số tăng thời gian so với cỡ trước (tuyến tính
+thì hệ số xấp xỉ tỉ lệ cỡ). Thoát với mã 1 nếu kết quả khác bản cũ.
+
+    python -m benchmarks.signature_stress
+    python -m benchmarks.signature_stress --sizes 10000 100000 1000000 --cases keywords dense --out sign.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import warnings
+from typing import Callable, Dict, List
+
+from benchmarks.ocr_throughput import collect_meta
+
+with warnings.catch_warnings():
+    warnings.simplefilter("ignore", SyntaxWarning)  # bản cũ giữ nguyên chuỗi "\s" không raw
+    from benchmarks import parser_legacy
+
+KEYWORDS = ["Đại diện", "Ký tên", "Chữ ký", "Đóng dấu", "Dai dien", "ky ten"]
+PARTIES = ["Bên A", "BÊN B", "Ben A", "bên b"]
+WORDS = ["hợp", "đồng", "các", "điều", "khoản", "thanh", "toán", "giao", "hàng", "trách", "nhiệm", "thời", "hạn",
+         "quy", "định", "theo", "pháp", "luật", "Việt", "Nam", "1.000.000", "ngày", "tháng"]
+
+
+def _repeat(rng: random.Random, size: int, tokens: List[str], gap: int) -> str:
+    parts, length = [], 0
+    while length < size:
+        part = rng.choice(tokens) + " " + "x" * gap + "\n"
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def _ocr(rng: random.Random, size: int) -> str:
+    parts, length = [], 0
+    while length < size:
+        line = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 14))) + "\n"
+        parts.append(line)
+        length += len(line)
+    footer = "\nĐẠI DIỆN BÊN A                ĐẠI DIỆN BÊN B\n(Ký tên, đóng dấu)\n"
+    return "".join(parts)[:max(size - len(footer), 0)] + footer
+
+
+def make_text(case: str, size: int, rng: random.Random) -> str:
+    if case == "keywords":
+        return _repeat(rng, size, KEYWORDS, 0)
+    if case == "parties":
+        return _repeat(rng, size, PARTIES, 0)
+    if case == "dense":
+        return _repeat(rng, size, KEYWORDS + PARTIES, 130)
+    return _ocr(rng, size)
+
+
+CASES = ("keywords", "parties", "dense", "ocr")
+
+
+def best_time(detect: Callable[[str], Dict[str, bool]], text: str, repeat: int) -> float:
+    best = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        detect(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="*", default=[10_000, 100_000, 1_000_000], help="cỡ văn bản (ký tự)")
+    ap.add_argument("--cases", nargs="*", default=list(CASES), choices=CASES)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    from app.core.parser import _Text, _extract_signatures
+
+    def detect(text: str) -> Dict[str, bool]:
+        return _extract_signatures(_Text(text))
+
+    rng = random.Random(args.seed)
+    results, failed = [], 0
+    print(f"{'case':<9} {'chars':>9} {'cũ ms':>10} {'mới ms':>9} {'cũ MB/s':>8} {'mới MB/s':>9} "
+          f"{'tăng cũ':>8} {'tăng mới':>9} {'speedup':>8} {'giống':>6}")
+    for case in args.cases:
+        previous = None
+        for size in sorted(args.sizes):
+            text = make_text(case, size, rng)
+            mb = len(text.encode("utf-8")) / 1e6
+            old = best_time(parser_legacy._extract_signatures, text, args.repeat)
+            new = best_time(detect, text, args.repeat)
+            same = parser_legacy._extract_signatures(text) == detect(text)
+            failed += not same
+            row = {
+                "case": case,
+                "chars": len(text),
+                "legacy_ms": round(1000 * old, 3),
+                "ms": round(1000 * new, 3),
+                "legacy_mb_per_sec": round(mb / old, 2),
+                "mb_per_sec": round(mb / new, 2),
+                # thời gian tăng bao nhiêu lần so với cỡ trước
+                "legacy_growth": round(old / previous["legacy"], 1) if previous else None,
+                "growth": round(new / previous["new"], 1) if previous else None,
+                "speedup": round(old / new, 2),
+                "identical": same,
+            }
+            previous = {"legacy": old, "new": new}
+            results.append(row)
+            print(f"{case:<9} {row['chars']:>9} {row['legacy_ms']:>10} {row['ms']:>9} {row['legacy_mb_per_sec']:>8} "
+                  f"{row['mb_per_sec']:>9} {row['legacy_growth'] or '-':>8} {row['growth'] or '-':>9} "
+                  f"{row['speedup']:>7}x {'có' if same else 'KHÁC':>6}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if failed:
+        print(f"{failed} văn bản cho kết quả khác bản cũ")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Benchmark phân loại hợp đồng theo bảng contract_types (app.core.classifier):
+một lượt quét automaton trên phần đầu văn bản so với cách dò lần lượt từng cụm
+từ của từng loại, khi số loại tăng dần.
+
+Các loại gồm danh sách thật của update_contract_types_simple.py (TYPES, kèm vài
+từ khóa KEYWORDS) cộng thêm loại tổng hợp cho đủ --types. Mỗi cỡ đo thời gian dựng bộ phân loại và µs
+mỗi văn bản trên --docs phần đầu hợp đồng (benchmarks.corpus), rồi kiểm tra các
+tiêu đề mẫu (SAMPLES) vẫn được xếp đúng loại khi có thêm loại tổng hợp.
+
+Thoát với mã 1 nếu có tiêu đề mẫu bị xếp sai.
+
+    python -m benchmarks.type_classifier
+    python -m benchmarks.type_classifier --types 40 1000 10000 --docs 200 --out types.json
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from typing import List, Optional, Tuple
+
+import fitz  # PyMuPDF
+
+from benchmarks.corpus import contract_text, find_font
+from benchmarks.ocr_throughput import collect_meta
+
+TYPES = [
+    ("Mua bán", "Hợp đồng mua bán hàng hóa, sản phẩm, dịch vụ"),
+    ("Cung cấp", "Hợp đồng cung cấp nguyên vật liệu, thiết bị"),
+    ("Phân phối", "Hợp đồng phân phối, đại lý bán hàng"),
+    ("Gia công", "Hợp đồng gia công sản xuất, chế tạo"),
+    ("Vận chuyển", "Hợp đồng vận chuyển, logistics"),
+    ("Dịch vụ", "Hợp đồng cung cấp dịch vụ chuyên nghiệp"),
+    ("Tư vấn", "Hợp đồng tư vấn, hỗ trợ kỹ thuật"),
+    ("Bảo trì", "Hợp đồng bảo trì, sửa chữa thiết bị"),
+    ("IT/Phần mềm", "Hợp đồng phát triển phần mềm, IT"),
+    ("Lao động", "Hợp đồng lao động, thuê mướn nhân viên"),
+    ("Thuê mặt bằng", "Hợp đồng thuê văn phòng, mặt bằng kinh doanh"),
+    ("Thuê nhà", "Hợp đồng thuê nhà ở, căn hộ"),
+    ("Thuê kho", "Hợp đồng thuê kho bãi, nhà xưởng"),
+    ("Mua bán BĐS", "Hợp đồng mua bán bất động sản"),
+    ("Vay vốn", "Hợp đồng vay vốn, tín dụng"),
+    ("Nhượng quyền", "Hợp đồng nhượng quyền thương mại (franchise)"),
+    ("Bảo mật (NDA)", "Thỏa thuận bảo mật thông tin"),
+    ("Ghi nhớ (MOU)", "Biên bản ghi nhớ, thỏa thuận sơ bộ"),
+    ("Khác", "Các loại hợp đồng khác"),
+]
+# Từ khóa cấu hình thêm (cột keywords): "nhà xưởng" còn khớp cả "Thuê nhà"
+KEYWORDS = {"Thuê kho": "nhà xưởng: 4\nkho bãi"}
+# (tiêu đề, loại đúng hoặc None)
+SAMPLES = [
+    ("HỢP ĐỒNG MUA BÁN HÀNG HÓA", "Mua bán"),
+    ("HỢP ĐỒNG MUA BÁN BẤT ĐỘNG SẢN", "Mua bán BĐS"),
+    ("HỢP ĐỒNG LAO ĐỘNG", "Lao động"),
+    ("HỢP ĐỒNG THUÊ NHÀ Ở", "Thuê nhà"),
+    ("HỢP ĐỒNG THUÊ VĂN PHÒNG", "Thuê mặt bằng"),
+    ("HỢP ĐỒNG THUÊ NHÀ XƯỞNG", "Thuê kho"),
+    ("THỎA THUẬN BẢO MẬT THÔNG TIN", "Bảo mật (NDA)"),
+    ("BIÊN BẢN GHI NHỚ", "Ghi nhớ (MOU)"),
+    ("HỢP ĐỒNG PHÁT TRIỂN PHẦN MỀM", "IT/Phần mềm"),
+    ("HOP DONG VAN CHUYEN", "Vận chuyển"),
+    ("HỢP ĐỒNG DỊCH VỤ BẢO TRÌ THIẾT BỊ", "Bảo trì"),
+    ("HỢP ĐỒNG", None),
+]
+SAMPLE_BODY = "\nSố: 12/2024/HĐ\nCăn cứ Bộ luật Dân sự 2015\nHôm nay chúng tôi gồm:\nBÊN A: Công ty TNHH Minh Phát\n" \
+              "BÊN B: Công ty cổ phần dịch vụ An Bình\n"
+# Từ của loại tổng hợp: không phải tiếng Việt, để không trùng (sau khi bỏ dấu) cụm từ của TYPES
+SYLLABLES = ["zan", "kwo", "brix", "jel", "vox", "quil", "fen", "dro", "wyn", "plax", "gorb", "zet", "yul", "krin",
+             "mox", "tww", "fryx", "jub", "snel", "vrak"]
+
+
+def make_types(rng: random.Random, count: int) -> List[Tuple[int, str, Optional[str], Optional[str]]]:
+    """TYPES rồi các loại tổng hợp tên ngẫu nhiên (không trùng cụm từ thật)."""
+    rows = [(i + 1, name, description, KEYWORDS.get(name)) for i, (name, description) in enumerate(TYPES)]
+    seen = set()
+    while len(rows) < count:
+        name = "Loại " + " ".join(rng.choice(SYLLABLES) for _ in range(4))
+        if name in seen:
+            continue
+        seen.add(name)
+        description = "Hợp đồng " + " ".join(rng.choice(SYLLABLES) for _ in range(2)) + ", " + rng.choice(SYLLABLES) + " " \
+                      + rng.choice(SYLLABLES)
+        rows.append((len(rows) + 1, name, description, "\n".join(rng.choice(SYLLABLES) + " " + rng.choice(SYLLABLES)
+                                                                   for _ in range(2))))
+    return rows
+
+
+def naive_classify(phrases: List[Tuple[str, int, float]], head: str) -> Optional[int]:
+    """Dò từng cụm từ bằng tìm chuỗi con (không gộp cụm chồng nhau): để so thời gian."""
+    from app.core.matching import normalize
+
+    text = " " + " ".join(normalize(head)) + " "
+    scores = {}
+    for phrase, type_id, weight in phrases:
+        if phrase in text:
+            scores[type_id] = scores.get(type_id, 0.0) + weight
+    return max(scores, key=scores.get) if scores else None
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--types", type=int, nargs="*", default=[len(TYPES), 200, 2000, 10_000], help="số loại hợp đồng")
+    ap.add_argument("--docs", type=int, default=100, help="số văn bản đo thời gian")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--font", default=None, help="font TTF hỗ trợ tiếng Việt")
+    ap.add_argument("--out", default=None, help="ghi kết quả JSON")
+    args = ap.parse_args()
+
+    from app.core.classifier import TypeClassifier, head_text, type_phrases
+
+    rng = random.Random(args.seed)
+    font = fitz.Font(fontfile=find_font(args.font))
+    heads = [head_text(contract_text(rng, 2, font, "vie")) for _ in range(args.docs)]
+    results, failed = [], 0
+    print(f"{'types':>7} {'phrases':>8} {'build ms':>9} {'µs/văn bản':>11} {'dò µs':>10} {'speedup':>8} {'mẫu đúng':>9}")
+    for count in args.types:
+        rows = make_types(rng, count)
+        start = time.perf_counter()
+        classifier = TypeClassifier(rows)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for head in heads:
+            classifier.classify(head, head.splitlines()[0] if head else None)
+        elapsed = time.perf_counter() - start
+
+        phrases = [(" " + " ".join(words) + " ", type_id, weight)
+                   for type_id, name, description, keywords in rows
+                   for words, weight in type_phrases(name, description, keywords)]
+        start = time.perf_counter()
+        for head in heads:
+            naive_classify(phrases, head)
+        naive = time.perf_counter() - start
+
+        names = {type_id: name for type_id, name, _, _ in rows}
+        correct = 0
+        for title, expected in SAMPLES:
+            match = classifier.classify(title + SAMPLE_BODY, title)
+            correct += (names[match.type_id] if match else None) == expected
+        failed += len(SAMPLES) - correct
+        row = {
+            "types": len(rows),
+            "phrases": len(classifier.targets),
+            "build_ms": round(1000 * build, 1),
+            "us_per_doc": round(1e6 * elapsed / len(heads), 1),
+            "naive_us_per_doc": round(1e6 * naive / len(heads), 1),
+            "speedup": round(naive / elapsed, 1),
+            "samples_correct": correct,
+        }
+        results.append(row)
+        print(f"{row['types']:>7} {row['phrases']:>8} {row['build_ms']:>9} {row['us_per_doc']:>11} "
+              f"{row['naive_us_per_doc']:>10} {row['speedup']:>7}x {correct:>5}/{len(SAMPLES)}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": collect_meta(args), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"đã ghi {args.out}")
+    if failed:
+        print(f"{failed} tiêu đề mẫu bị xếp sai loại")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()